@@ -1,14 +1,28 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, current_app, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from models.post import Post
 from models.user import User
-from models.profile import Profile
 from models import db
+from sqlalchemy.orm import joinedload
+from services.cache import get_cache
+from api.serializers import POST_AUTHOR_CARD, POST_FIELDS, post_author_card, serialize_post, serialize_user
+from utils.conditional import conditional, current_etag, versions_stamp
+from utils.single_flight import single_flight
 
 feed_bp = Blueprint('feed', __name__)
  
+def feed_stamp():
+    # Any post added, removed, edited or liked, or any author card (name, title, avatar) changed
+    return versions_stamp('posts', 'authors')
+
+def user_feed_stamp(user_id):
+    # The same versions: deleting or renaming the user bumps 'authors' (user_id is in the ETag)
+    return versions_stamp('posts', 'authors')
+
 @feed_bp.route('/feed', methods=['GET'])
 @jwt_required()
+@conditional(feed_stamp)
+@single_flight(defaults={'page': 1, 'per_page': 10})
 def get_feed():
     """Get personalized feed for the current user"""
     email = get_jwt_identity()
@@ -18,93 +32,74 @@ def get_feed():
     
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 10, type=int)
+    try:
+        selection = POST_FIELDS.select(request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    # For now, return all posts. In a full implementation, this would be filtered
-    # based on user connections, interests, etc.
-    posts = Post.query.order_by(Post.created_at.desc()).paginate(
-        page=page, per_page=per_page, error_out=False
-    )
-    
-    posts_data = []
-    for post in posts.items:
-        post_user = User.query.get(post.user_id)
-        profile = Profile.query.filter_by(user_id=post.user_id).first() if post_user else None
+    def build_page():
+        # For now, return all posts. In a full implementation, this would be filtered
+        # based on user connections, interests, etc.
+        query = Post.query.order_by(Post.created_at.desc())
+        if selection:
+            query = query.options(*selection.options)
+        with_authors = not selection or 'user' in selection
+        if with_authors:
+            # Authors and their profiles joined into the page query (the count query leaves them out)
+            query = query.options(POST_AUTHOR_CARD)
+        posts = query.paginate(page=page, per_page=per_page, error_out=False)
         
-        # Get media URL with full path
-        media_url = post.media_url
-        if media_url:
-            media_url = request.host_url.rstrip('/') + media_url
-            
-        posts_data.append({
-            'id': post.id,
-            'content': post.content,
-            'media_url': media_url,
-            'imageUrl': media_url,  # For compatibility
-            'user_id': post.user_id,
-            'created_at': post.created_at.isoformat(),
-            'likes_count': post.likes_count if hasattr(post, 'likes_count') else 0,
-            'comments_count': post.comments_count if hasattr(post, 'comments_count') else 0,
-            'user': {
-                'id': post_user.id,
-                'name': post_user.name,
-                'username': post_user.username,
-                'avatar_url': profile.avatar_url if profile else None,
-                'title': profile.title if profile else None,
-                'location': profile.location if profile else None
-            } if post_user else None
-        })
+        media_base = request.host_url.rstrip('/')
+        posts_data = [
+            serialize_post(post, *(post_author_card(post) if with_authors else (None, None)), media_base,
+                           media_key=True, selection=selection)
+            for post in posts.items
+        ]
+        
+        return {
+            'posts': posts_data,
+            'total': posts.total,
+            'pages': posts.pages,
+            'current_page': page,
+            'per_page': per_page
+        }
     
-    return jsonify({
-        'posts': posts_data,
-        'total': posts.total,
-        'pages': posts.pages,
-        'current_page': page,
-        'per_page': per_page
-    }), 200
+    # The feed is the same for everyone; pages are dropped when posts change or an author edits their profile,
+    # and the ETag in the key keeps a page cached before the latest change from going out under its ETag
+    payload = get_cache().get_or_set(
+        f'feed:{page}:{per_page}:{selection.name if selection else "all"}:{request.host_url}:{current_etag()}', build_page,
+        ttl=current_app.config['CACHE_FEED_TTL_SECONDS'], tags=('posts', 'authors')
+    )
+    return jsonify(payload), 200
 
 @feed_bp.route('/feed/user/<int:user_id>', methods=['GET'])
 @jwt_required()
+@conditional(user_feed_stamp)
 def get_user_feed(user_id):
     """Get posts from a specific user"""
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 10, type=int)
+    try:
+        selection = POST_FIELDS.select(request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    # Check if user exists
-    user = User.query.get(user_id)
+    # Check if user exists (their profile comes in the same query)
+    user = User.query.options(joinedload(User.profile)).get(user_id)
     if not user:
         return jsonify({'error': 'User not found'}), 404
     
-    posts = Post.query.filter_by(user_id=user_id).order_by(Post.created_at.desc()).paginate(
-        page=page, per_page=per_page, error_out=False
-    )
+    query = Post.query.filter_by(user_id=user_id).order_by(Post.created_at.desc())
+    if selection:
+        query = query.options(*selection.options)
+    posts = query.paginate(page=page, per_page=per_page, error_out=False)
     
-    posts_data = []
-    for post in posts.items:
-        profile = Profile.query.filter_by(user_id=user_id).first()
-        
-        # Get media URL with full path
-        media_url = post.media_url
-        if media_url:
-            media_url = request.host_url.rstrip('/') + media_url
-            
-        posts_data.append({
-            'id': post.id,
-            'content': post.content,
-            'media_url': media_url,
-            'imageUrl': media_url,  # For compatibility
-            'user_id': post.user_id,
-            'created_at': post.created_at.isoformat(),
-            'likes_count': post.likes_count if hasattr(post, 'likes_count') else 0,
-            'comments_count': post.comments_count if hasattr(post, 'comments_count') else 0,
-            'user': {
-                'id': user.id,
-                'name': user.name,
-                'username': user.username,
-                'avatar_url': profile.avatar_url if profile else None,
-                'title': profile.title if profile else None,
-                'location': profile.location if profile else None
-            }
-        })
+    profile = user.profile if not selection or 'user' in selection else None
+    
+    media_base = request.host_url.rstrip('/')
+    posts_data = [
+        serialize_post(post, user, profile, media_base, media_key=True, selection=selection) for post in posts.items
+    ]
     
     return jsonify({
         'posts': posts_data,
@@ -112,9 +107,5 @@ def get_user_feed(user_id):
         'pages': posts.pages,
         'current_page': page,
         'per_page': per_page,
-        'user': {
-            'id': user.id,
-            'name': user.name,
-            'username': user.username
-        }
+        'user': serialize_user(user)
     }), 200 
\ No newline at end of file
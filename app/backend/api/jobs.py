@@ -1,76 +1,168 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from models.job import Job, JobApplication
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import load_only
+from models.job import Job, JobApplication, JobApplicationCount, APPLICATION_STATUSES
 from models.user import User
+from models.profile import Profile, Skill, Experience
 from models import db
+from services.job_recommender import job_index
+from services.cache import get_cache
+from api.serializers import JOB_FIELDS, serialize_job
+from services.job_dedup import duplicate_index, minhash
+from utils.pagination import encode_cursor, decode_cursor, page_limit
+from utils.conditional import conditional, current_etag, versions_stamp
+from utils.single_flight import single_flight
+from datetime import datetime, timedelta, timezone
 
 jobs_bp = Blueprint('jobs', __name__)
+
+def bump_application_counts(job_id, deltas):
+    """Apply {status: delta} to a job's status counters in a single UPDATE"""
+    deltas = {status: delta for status, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    JobApplicationCount.query.filter(
+        JobApplicationCount.job_id == job_id,
+        JobApplicationCount.status.in_(deltas)
+    ).update({
+        JobApplicationCount.total: JobApplicationCount.total + db.case(deltas, value=JobApplicationCount.status, else_=0)
+    }, synchronize_session=False)
+
+def get_application_counts(job_id):
+    counts = {status: 0 for status in APPLICATION_STATUSES}
+    for row in JobApplicationCount.query.filter_by(job_id=job_id):
+        counts[row.status] = row.total
+    return counts
+
+def get_owned_job(job_id):
+    """Return (job, error_response) for a job the current user posted"""
+    email = get_jwt_identity()
+    user = User.query.filter_by(email=email).first()
+    if not user:
+        return None, (jsonify({'error': 'User not found'}), 404)
+    job = Job.query.get(job_id)
+    if not job:
+        return None, (jsonify({'error': 'Job not found'}), 404)
+    if job.posted_by != user.id:
+        return None, (jsonify({'error': 'Access denied'}), 403)
+    return job, None
  
+def jobs_stamp():
+    # Jobs added, edited or closed, a poster renamed, or the next listing to expire passing its expiry
+    # (an index seek on ix_jobs_is_active_expires_at), which hides it before the sweeper runs
+    next_expiry = db.select(db.func.min(Job.expires_at)).filter_by(is_active=True).where(
+        Job.expires_at > datetime.utcnow()
+    ).scalar_subquery()
+    return versions_stamp('jobs', 'authors', extra=(next_expiry,))
+
+def job_stamp(job_id):
+    return db.session.query(Job.updated_at, Job.is_active, User.name, User.username).outerjoin(
+        User, User.id == Job.posted_by
+    ).filter(Job.id == job_id).first()
+
 @jobs_bp.route('/jobs', methods=['GET'])
 @jwt_required()
+@conditional(jobs_stamp)
+@single_flight(defaults={'page': 1, 'per_page': 10})
 def get_jobs():
     """Get all active job listings"""
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 10, type=int)
+    try:
+        selection = JOB_FIELDS.select(request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    jobs = Job.query.filter_by(is_active=True).order_by(Job.created_at.desc()).paginate(
-        page=page, per_page=per_page, error_out=False
-    )
+    def build_page():
+        # Hide listings that expired since the last sweep (jobs_stamp moves the ETag as they do)
+        not_expired = db.or_(Job.expires_at.is_(None), Job.expires_at > datetime.utcnow())
+        query = Job.query.filter_by(is_active=True).filter(not_expired).order_by(Job.created_at.desc())
+        if selection:
+            query = query.options(*selection.options)
+        jobs = query.paginate(page=page, per_page=per_page, error_out=False)
+        
+        poster_ids = {job.posted_by for job in jobs.items} if not selection or 'posted_by' in selection else ()
+        posters = {
+            u.id: u
+            for u in User.query.options(load_only(User.id, User.name, User.username)).filter(User.id.in_(poster_ids))
+        } if poster_ids else {}
+        
+        jobs_data = []
+        for job in jobs.items:
+            jobs_data.append(serialize_job(job, posters.get(job.posted_by), selection))
+        
+        return {
+            'jobs': jobs_data,
+            'total': jobs.total,
+            'pages': jobs.pages,
+            'current_page': page,
+            'per_page': per_page
+        }
     
-    jobs_data = []
-    for job in jobs.items:
-        posted_by_user = User.query.get(job.posted_by)
-        jobs_data.append({
-            'id': job.id,
-            'title': job.title,
-            'company': job.company,
-            'location': job.location,
-            'description': job.description,
-            'requirements': job.requirements,
-            'salary_range': job.salary_range,
-            'job_type': job.job_type,
-            'created_at': job.created_at.isoformat(),
-            'posted_by': {
-                'id': posted_by_user.id,
-                'name': posted_by_user.name,
-                'username': posted_by_user.username
-            } if posted_by_user else None
-        })
-    
-    return jsonify({
-        'jobs': jobs_data,
-        'total': jobs.total,
-        'pages': jobs.pages,
-        'current_page': page,
-        'per_page': per_page
-    }), 200
+    fields = selection.name if selection else 'all'
+    payload = get_cache().get_or_set(f'jobs:page:{page}:{per_page}:{fields}:{current_etag()}', build_page,
+                                     ttl=current_app.config['CACHE_JOBS_TTL_SECONDS'], tags=('jobs',))
+    return jsonify(payload), 200
 
 @jobs_bp.route('/jobs/<int:job_id>', methods=['GET'])
 @jwt_required()
+@conditional(job_stamp)
 def get_job(job_id):
     """Get a specific job listing"""
-    job = Job.query.get(job_id)
-    if not job:
-        return jsonify({'error': 'Job not found'}), 404
+    cache = get_cache()
+    key = f'jobs:{job_id}:{current_etag()}'
+    job_data = cache.get(key)
+    if job_data is None:
+        job = Job.query.get(job_id)
+        if not job:
+            return jsonify({'error': 'Job not found'}), 404
+        
+        posted_by_user = User.query.get(job.posted_by)
+        job_data = serialize_job(job, posted_by_user)
+        cache.set(key, job_data, current_app.config['CACHE_JOBS_TTL_SECONDS'], tags=('jobs',))
     
-    posted_by_user = User.query.get(job.posted_by)
+    return jsonify(job_data), 200
+
+@jobs_bp.route('/jobs/recommended', methods=['GET'])
+@jwt_required()
+def get_recommended_jobs():
+    """Rank active job listings by fit with the current user's skills and experience"""
+    email = get_jwt_identity()
+    user = User.query.filter_by(email=email).first()
+    if not user:
+        return jsonify({'error': 'User not found'}), 404
     
-    return jsonify({
-        'id': job.id,
-        'title': job.title,
-        'company': job.company,
-        'location': job.location,
-        'description': job.description,
-        'requirements': job.requirements,
-        'salary_range': job.salary_range,
-        'job_type': job.job_type,
-        'created_at': job.created_at.isoformat(),
-        'posted_by': {
-            'id': posted_by_user.id,
-            'name': posted_by_user.name,
-            'username': posted_by_user.username
-        } if posted_by_user else None
-    }), 200
+    limit = max(1, min(request.args.get('limit', 10, type=int), 50))
+    
+    skills = [name for (name,) in Skill.query.with_entities(Skill.name).filter_by(user_id=user.id)]
+    titles = [title for (title,) in Experience.query.with_entities(Experience.title).filter_by(user_id=user.id)]
+    if not skills and not titles:
+        return jsonify({
+            'jobs': [],
+            'message': 'Add skills or experience to your profile to get recommendations'
+        }), 200
+    
+    # Skip jobs the user posted or already applied to
+    applied_ids = [job_id for (job_id,) in JobApplication.query.with_entities(JobApplication.job_id).filter_by(user_id=user.id)]
+    own_ids = [job_id for (job_id,) in Job.query.with_entities(Job.id).filter_by(posted_by=user.id)]
+    
+    # Over-fetch a little: the index can lag behind deactivations made by other workers
+    ranked = job_index.recommend(skills, titles, limit=limit * 2, exclude_ids=applied_ids + own_ids)
+    scores = dict(ranked)
+    jobs = Job.query.filter(Job.id.in_(scores), Job.is_active == True).all() if scores else []  # noqa: E712
+    jobs.sort(key=lambda job: scores[job.id], reverse=True)
+    jobs = jobs[:limit]
+    
+    posters = {u.id: u for u in User.query.filter(User.id.in_({job.posted_by for job in jobs})).all()} if jobs else {}
+    
+    jobs_data = []
+    for job in jobs:
+        job_data = serialize_job(job, posters.get(job.posted_by))
+        job_data['score'] = round(scores[job.id], 4)
+        jobs_data.append(job_data)
+    
+    return jsonify({'jobs': jobs_data}), 200
 
 @jobs_bp.route('/jobs/<int:job_id>/apply', methods=['POST'])
 @jwt_required()
@@ -85,17 +177,9 @@ def apply_for_job(job_id):
     if not job:
         return jsonify({'error': 'Job not found'}), 404
     
-    if not job.is_active:
+    if not job.is_active or (job.expires_at and job.expires_at <= datetime.utcnow()):
         return jsonify({'error': 'This job is no longer active'}), 400
     
-    # Check if user already applied
-    existing_application = JobApplication.query.filter_by(
-        job_id=job_id, user_id=user.id
-    ).first()
-    
-    if existing_application:
-        return jsonify({'error': 'You have already applied for this job'}), 400
-    
     data = request.get_json()
     cover_letter = data.get('cover_letter') if data else None
     
@@ -106,7 +190,14 @@ def apply_for_job(job_id):
     )
     
     db.session.add(application)
-    db.session.commit()
+    try:
+        db.session.flush()
+        bump_application_counts(job_id, {'applied': 1})
+        db.session.commit()
+    except IntegrityError:
+        # The (job_id, user_id) unique constraint caught a repeat or concurrent apply
+        db.session.rollback()
+        return jsonify({'error': 'You have already applied for this job'}), 400
     
     return jsonify({
         'message': 'Application submitted successfully',
@@ -130,6 +221,32 @@ def create_job():
         if not data.get(field):
             return jsonify({'error': f'{field} is required'}), 400
     
+    if data.get('expires_at'):
+        try:
+            expires_at = datetime.fromisoformat(data['expires_at'])
+        except (TypeError, ValueError):
+            return jsonify({'error': 'expires_at must be an ISO 8601 date or datetime'}), 400
+        if expires_at.tzinfo:
+            expires_at = expires_at.astimezone(timezone.utc).replace(tzinfo=None)
+        if expires_at <= datetime.utcnow():
+            return jsonify({'error': 'expires_at must be in the future'}), 400
+    else:
+        expires_at = datetime.utcnow() + timedelta(days=current_app.config['JOB_DEFAULT_TTL_DAYS'])
+    
+    # Near-duplicate check against listings still open (JOB_DUPLICATE_POLICY: flag, reject or off)
+    policy = current_app.config['JOB_DUPLICATE_POLICY']
+    duplicates = []
+    signature = None
+    if policy != 'off':
+        signature = minhash(data['description'], data.get('requirements'))
+        duplicate_index.ensure_fresh()
+        duplicates = duplicate_index.query_live(signature, threshold=current_app.config['JOB_DUPLICATE_THRESHOLD'])
+        if duplicates and policy == 'reject':
+            return jsonify({
+                'error': 'A very similar job listing already exists',
+                'duplicates': [{'job_id': job_id, 'similarity': round(sim, 2)} for job_id, sim in duplicates]
+            }), 409
+    
     job = Job(
         title=data['title'],
         company=data['company'],
@@ -138,13 +255,138 @@ def create_job():
         location=data.get('location'),
         requirements=data.get('requirements'),
         salary_range=data.get('salary_range'),
-        job_type=data.get('job_type')
+        job_type=data.get('job_type'),
+        expires_at=expires_at
     )
     
     db.session.add(job)
+    db.session.flush()
+    db.session.add_all([JobApplicationCount(job_id=job.id, status=status) for status in APPLICATION_STATUSES])
     db.session.commit()
+    get_cache().invalidate('jobs')
+    job_index.add_job(job)
+    if signature is not None:
+        duplicate_index.add(job.id, signature)
     
-    return jsonify({
+    response = {
         'message': 'Job created successfully',
         'job_id': job.id
-    }), 201 
\ No newline at end of file
+    }
+    if duplicates:
+        response['possible_duplicates'] = [{'job_id': job_id, 'similarity': round(sim, 2)} for job_id, sim in duplicates]
+    return jsonify(response), 201
+
+@jobs_bp.route('/jobs/<int:job_id>/applications', methods=['GET'])
+@jwt_required()
+def get_job_applications(job_id):
+    """List applicants for a job the current user posted (newest first, cursor paginated)"""
+    job, error = get_owned_job(job_id)
+    if error:
+        return error
+    
+    limit = page_limit(request.args.get('limit', type=int))
+    status = request.args.get('status')
+    cursor = request.args.get('cursor')
+    
+    query = JobApplication.query.filter_by(job_id=job.id)
+    if status:
+        if status not in APPLICATION_STATUSES:
+            return jsonify({'error': f'status must be one of: {", ".join(APPLICATION_STATUSES)}'}), 400
+        query = query.filter(JobApplication.status == status)
+    if cursor:
+        try:
+            (last_id,) = decode_cursor(cursor, int)
+        except ValueError:
+            return jsonify({'error': 'Invalid cursor'}), 400
+        query = query.filter(JobApplication.id < last_id)
+    
+    applications = query.order_by(JobApplication.id.desc()).limit(limit + 1).all()
+    has_more = len(applications) > limit
+    applications = applications[:limit]
+    
+    # Load every applicant and their profile in one query
+    applicants = {}
+    user_ids = {application.user_id for application in applications}
+    if user_ids:
+        rows = db.session.query(User, Profile).outerjoin(Profile, Profile.user_id == User.id).filter(User.id.in_(user_ids))
+        applicants = {applicant.id: (applicant, profile) for applicant, profile in rows}
+    
+    applications_data = []
+    for application in applications:
+        applicant, profile = applicants.get(application.user_id, (None, None))
+        applications_data.append({
+            'id': application.id,
+            'status': application.status,
+            'applied_at': application.applied_at.isoformat() if application.applied_at else None,
+            'cover_letter': application.cover_letter,
+            'applicant': {
+                'id': applicant.id,
+                'name': applicant.name,
+                'username': applicant.username,
+                'email': applicant.email,
+                'avatar_url': profile.avatar_url if profile else None,
+                'title': profile.title if profile else None,
+                'location': profile.location if profile else None
+            } if applicant else None
+        })
+    
+    return jsonify({
+        'applications': applications_data,
+        'next_cursor': encode_cursor(applications[-1].id) if has_more else None
+    }), 200
+
+@jobs_bp.route('/jobs/<int:job_id>/applications', methods=['PATCH'])
+@jwt_required()
+def update_application_statuses(job_id):
+    """Move many applications of a job the current user posted to a new status"""
+    job, error = get_owned_job(job_id)
+    if error:
+        return error
+    
+    data = request.get_json() or {}
+    status = data.get('status')
+    application_ids = data.get('application_ids')
+    
+    if status not in APPLICATION_STATUSES:
+        return jsonify({'error': f'status must be one of: {", ".join(APPLICATION_STATUSES)}'}), 400
+    if not isinstance(application_ids, list) or not application_ids \
+            or not all(isinstance(i, int) for i in application_ids):
+        return jsonify({'error': 'application_ids must be a non-empty list of ids'}), 400
+    if len(application_ids) > 500:
+        return jsonify({'error': 'At most 500 applications can be updated at once'}), 400
+    
+    # Lock the affected rows and tally the statuses they are leaving here (PostgreSQL rejects FOR UPDATE with GROUP BY)
+    locked = db.session.query(JobApplication.id, JobApplication.status).filter(
+        JobApplication.job_id == job.id,
+        JobApplication.id.in_(set(application_ids)),
+        JobApplication.status != status
+    ).with_for_update().all()
+    
+    deltas = {}
+    for _, old_status in locked:
+        if old_status:
+            deltas[old_status] = deltas.get(old_status, 0) - 1
+    
+    updated = JobApplication.query.filter(JobApplication.id.in_([app_id for app_id, _ in locked])).update(
+        {JobApplication.status: status}, synchronize_session=False
+    ) if locked else 0
+    
+    deltas[status] = deltas.get(status, 0) + updated
+    bump_application_counts(job.id, deltas)
+    db.session.commit()
+    
+    return jsonify({
+        'message': 'Applications updated successfully',
+        'updated': updated,
+        'counts': get_application_counts(job.id)
+    }), 200
+
+@jobs_bp.route('/jobs/<int:job_id>/applications/counts', methods=['GET'])
+@jwt_required()
+def get_job_application_counts(job_id):
+    """Per-status applicant counts for a job the current user posted"""
+    job, error = get_owned_job(job_id)
+    if error:
+        return error
+    
+    return jsonify({'job_id': job.id, 'counts': get_application_counts(job.id)}), 200
@@ -1,35 +1,94 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, current_app, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from models.message import Conversation, Message
+from models.message import Conversation, Message, UserUnreadCount, PREVIEW_LENGTH
+from sqlalchemy.exc import IntegrityError
 from models.user import User
 from models import db
+from services.message_events import get_broker
+from services import message_archive, message_search
+from utils.pagination import encode_cursor, decode_cursor, page_limit
+from utils.streaming import batched, keyset_batches, stream_response, STREAM_BATCH_SIZE
+from api.serializers import serialize_message
 from datetime import datetime
+from itertools import chain
+import json
+import time
 
 messaging_bp = Blueprint('messaging', __name__)
+
+def publish_event(user_ids, event_type, data):
+    """Best-effort fan-out to the users' event channels; delivery must never fail a write"""
+    broker = get_broker()
+    for user_id in user_ids:
+        try:
+            broker.publish(user_id, event_type, data)
+        except Exception:
+            current_app.logger.exception('Failed to publish %s event to user %s', event_type, user_id)
+
+def unread_column(conversation, user_id):
+    """The conversation's unread counter column for one of its participants"""
+    return Conversation.user1_unread_count if conversation.user1_id == user_id else Conversation.user2_unread_count
+
+def unread_count_for(conversation, user_id):
+    return conversation.user1_unread_count if conversation.user1_id == user_id else conversation.user2_unread_count
+
+def bump_unread_total(user_id, delta):
+    """Add delta (clamped at zero) to a user's unread total, creating the row on first use"""
+    total = UserUnreadCount.total
+    new_total = total + delta if delta > 0 else db.case((total > -delta, total + delta), else_=0)
+    updated = UserUnreadCount.query.filter_by(user_id=user_id).update(
+        {total: new_total}, synchronize_session=False
+    )
+    if updated or delta <= 0:
+        return
+    try:
+        with db.session.begin_nested():
+            db.session.add(UserUnreadCount(user_id=user_id, total=delta))
+    except IntegrityError:
+        # Another request created the row first
+        UserUnreadCount.query.filter_by(user_id=user_id).update({total: total + delta}, synchronize_session=False)
  
 @messaging_bp.route('/messages/conversations', methods=['GET'])
 @jwt_required()
 def get_conversations():
-    """Get all conversations for the current user"""
+    """Get the current user's conversations, most recently active first (cursor paginated)"""
     email = get_jwt_identity()
     user = User.query.filter_by(email=email).first()
     if not user:
         return jsonify({'error': 'User not found'}), 404
     
-    # Get conversations where user is either user1 or user2
-    conversations = Conversation.query.filter(
-        db.or_(Conversation.user1_id == user.id, Conversation.user2_id == user.id)
-    ).order_by(Conversation.updated_at.desc()).all()
+    limit = page_limit(request.args.get('limit', type=int), default=50)
+    cursor = request.args.get('cursor')
+    
+    after_cursor = None
+    if cursor:
+        try:
+            last_updated_at, last_id = decode_cursor(cursor, datetime, int)
+        except ValueError:
+            return jsonify({'error': 'Invalid cursor'}), 400
+        after_cursor = db.or_(
+            Conversation.updated_at < last_updated_at,
+            db.and_(Conversation.updated_at == last_updated_at, Conversation.id < last_id)
+        )
+    
+    # One index range scan per participant column, merged here, instead of an OR over both
+    conversations = []
+    for column in (Conversation.user1_id, Conversation.user2_id):
+        query = Conversation.query.filter(column == user.id)
+        if after_cursor is not None:
+            query = query.filter(after_cursor)
+        conversations.extend(query.order_by(Conversation.updated_at.desc(), Conversation.id.desc()).limit(limit + 1))
+    conversations.sort(key=lambda conv: (conv.updated_at, conv.id), reverse=True)
+    has_more = len(conversations) > limit
+    conversations = conversations[:limit]
+    
+    # Resolve every other participant with a single query
+    other_ids = {conv.user2_id if conv.user1_id == user.id else conv.user1_id for conv in conversations}
+    other_users = {u.id: u for u in User.query.filter(User.id.in_(other_ids))} if other_ids else {}
     
     conversations_data = []
     for conv in conversations:
-        # Get the other user in the conversation
-        other_user_id = conv.user2_id if conv.user1_id == user.id else conv.user1_id
-        other_user = User.query.get(other_user_id)
-        
-        # Get the latest message
-        latest_message = Message.query.filter_by(conversation_id=conv.id).order_by(Message.created_at.desc()).first()
-        
+        other_user = other_users.get(conv.user2_id if conv.user1_id == user.id else conv.user1_id)
         conversations_data.append({
             'id': conv.id,
             'other_user': {
@@ -38,20 +97,26 @@ def get_conversations():
                 'username': other_user.username
             } if other_user else None,
             'latest_message': {
-                'content': latest_message.content,
-                'created_at': latest_message.created_at.isoformat(),
-                'sender_id': latest_message.sender_id
-            } if latest_message else None,
+                'id': conv.last_message_id,
+                'content': conv.last_message_preview,
+                'created_at': conv.last_message_at.isoformat(),
+                'sender_id': conv.last_sender_id
+            } if conv.last_message_id else None,
+            'unread_count': unread_count_for(conv, user.id),
             'created_at': conv.created_at.isoformat(),
             'updated_at': conv.updated_at.isoformat()
         })
     
-    return jsonify({'conversations': conversations_data}), 200
+    last = conversations[-1] if conversations else None
+    return jsonify({
+        'conversations': conversations_data,
+        'next_cursor': encode_cursor(last.updated_at, last.id) if has_more else None
+    }), 200
 
 @messaging_bp.route('/messages/<int:conversation_id>', methods=['GET'])
 @jwt_required()
 def get_messages(conversation_id):
-    """Get all messages in a conversation"""
+    """Get a window of messages in a conversation (latest 50 by default, cursor paginated)"""
     email = get_jwt_identity()
     user = User.query.filter_by(email=email).first()
     if not user:
@@ -65,25 +130,89 @@ def get_messages(conversation_id):
     if conversation.user1_id != user.id and conversation.user2_id != user.id:
         return jsonify({'error': 'Access denied'}), 403
     
-    messages = Message.query.filter_by(conversation_id=conversation_id).order_by(Message.created_at.asc()).all()
+    limit = page_limit(request.args.get('limit', type=int), default=50, maximum=200)
+    before = request.args.get('before')
+    after = request.args.get('after')
+    if before and after:
+        return jsonify({'error': 'Use either before or after, not both'}), 400
+    try:
+        cursor = decode_cursor(before or after, datetime, int) if (before or after) else None
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor'}), 400
     
-    messages_data = []
-    for msg in messages:
-        sender = User.query.get(msg.sender_id)
-        messages_data.append({
-            'id': msg.id,
-            'content': msg.content,
-            'sender_id': msg.sender_id,
-            'sender': {
-                'id': sender.id,
-                'name': sender.name,
-                'username': sender.username
-            } if sender else None,
-            'created_at': msg.created_at.isoformat(),
-            'is_read': msg.is_read
-        })
+    # Old history lives in compressed archive blocks; windows continue into them transparently
+    query = Message.query.filter_by(conversation_id=conversation_id)
+    if after:
+        # Newer than the cursor, oldest first (used to poll for new messages)
+        messages = message_archive.archived_after(conversation_id, cursor, limit + 1)
+        if len(messages) <= limit:
+            query = query.filter(db.or_(
+                Message.created_at > cursor[0],
+                db.and_(Message.created_at == cursor[0], Message.id > cursor[1])
+            ))
+            messages += query.order_by(Message.created_at.asc(), Message.id.asc()).limit(limit + 1 - len(messages)).all()
+        has_more_newer = len(messages) > limit
+        messages = messages[:limit]
+        has_more_older = bool(messages)
+    else:
+        # The latest window, or the window older than the `before` cursor
+        if before:
+            query = query.filter(db.or_(
+                Message.created_at < cursor[0],
+                db.and_(Message.created_at == cursor[0], Message.id < cursor[1])
+            ))
+        messages = query.order_by(Message.created_at.desc(), Message.id.desc()).limit(limit + 1).all()
+        if len(messages) <= limit:
+            boundary = (messages[-1].created_at, messages[-1].id) if messages else cursor
+            messages += message_archive.archived_before(conversation_id, boundary, limit + 1 - len(messages))
+        has_more_older = len(messages) > limit
+        messages = messages[:limit][::-1]
+        has_more_newer = bool(before)
     
-    return jsonify({'messages': messages_data}), 200
+    # Every sender is one of the two participants
+    other_id = conversation.user2_id if conversation.user1_id == user.id else conversation.user1_id
+    participants = {user.id: user}
+    other_user = User.query.get(other_id)
+    if other_user:
+        participants[other_id] = other_user
+    
+    messages_data = [serialize_message(msg, participants.get(msg.sender_id)) for msg in messages]
+    
+    first, last = (messages[0], messages[-1]) if messages else (None, None)
+    return jsonify({
+        'messages': messages_data,
+        # Pass as ?before= to scroll back; None once the start of the conversation is reached
+        'before_cursor': encode_cursor(first.created_at, first.id) if has_more_older else None,
+        # Pass as ?after= to fetch newer messages; always set so clients can keep polling
+        'after_cursor': encode_cursor(last.created_at, last.id) if last else after,
+        'has_more_newer': has_more_newer
+    }), 200
+
+@messaging_bp.route('/messages/<int:conversation_id>/export', methods=['GET'])
+@jwt_required()
+def export_messages(conversation_id):
+    """Stream a conversation's whole history, archived blocks included, oldest first (?format=ndjson for lines)"""
+    email = get_jwt_identity()
+    user = User.query.filter_by(email=email).first()
+    if not user:
+        return jsonify({'error': 'User not found'}), 404
+    
+    conversation = Conversation.query.get(conversation_id)
+    if not conversation:
+        return jsonify({'error': 'Conversation not found'}), 404
+    if conversation.user1_id != user.id and conversation.user2_id != user.id:
+        return jsonify({'error': 'Access denied'}), 403
+    
+    other_id = conversation.user2_id if conversation.user1_id == user.id else conversation.user1_id
+    participants = {user.id: user, other_id: User.query.get(other_id)}
+    
+    def serialize_batch(messages):
+        return [serialize_message(msg, participants.get(msg.sender_id)) for msg in messages]
+    
+    # Archiving only ever takes the oldest messages, so history is the blocks followed by the live rows
+    live = keyset_batches(Message.query.filter_by(conversation_id=conversation_id), (Message.created_at, Message.id))
+    batches = chain(batched(message_archive.iter_archived(conversation_id), STREAM_BATCH_SIZE), live)
+    return stream_response(batches, serialize_batch, 'messages', extra={'conversation_id': conversation_id})
 
 @messaging_bp.route('/messages/<int:conversation_id>', methods=['POST'])
 @jwt_required()
@@ -118,19 +247,38 @@ def send_message(conversation_id):
     )
     
     db.session.add(message)
+    db.session.flush()
     
-    # Update conversation's updated_at timestamp
-    conversation.updated_at = datetime.utcnow()
+    # Keep the conversation's latest-message summary current for the inbox
+    conversation.last_message_id = message.id
+    conversation.last_message_preview = message.content[:PREVIEW_LENGTH]
+    conversation.last_sender_id = user.id
+    conversation.last_message_at = message.created_at
+    conversation.updated_at = message.created_at
     
-    db.session.commit()
+    # Unread badges for the recipient, in the same transaction
+    recipient_id = conversation.user2_id if conversation.user1_id == user.id else conversation.user1_id
+    column = unread_column(conversation, recipient_id)
+    setattr(conversation, column.key, column + 1)
+    bump_unread_total(recipient_id, 1)
     
-    return jsonify({
+    # Searchable by both participants as soon as the message commits
+    message_search.index_message(message, (conversation.user1_id, conversation.user2_id))
+    
+    message_data = {
         'id': message.id,
         'content': message.content,
         'sender_id': message.sender_id,
         'created_at': message.created_at.isoformat(),
         'is_read': message.is_read
-    }), 201
+    }
+    participants = [conversation.user1_id, conversation.user2_id]
+    
+    db.session.commit()
+    
+    publish_event(participants, 'message', dict(message_data, conversation_id=conversation_id))
+    
+    return jsonify(message_data), 201
 
 @messaging_bp.route('/messages/conversations', methods=['POST'])
 @jwt_required()
@@ -154,13 +302,9 @@ def create_conversation():
     if other_user.id == user.id:
         return jsonify({'error': 'Cannot create conversation with yourself'}), 400
     
-    # Check if conversation already exists
-    existing_conversation = Conversation.query.filter(
-        db.or_(
-            db.and_(Conversation.user1_id == user.id, Conversation.user2_id == other_user.id),
-            db.and_(Conversation.user1_id == other_user.id, Conversation.user2_id == user.id)
-        )
-    ).first()
+    # Participants are stored low id first, so the pair is one unique index lookup
+    low_id, high_id = sorted((user.id, other_user.id))
+    existing_conversation = Conversation.query.filter_by(user1_id=low_id, user2_id=high_id).first()
     
     if existing_conversation:
         return jsonify({
@@ -169,14 +313,227 @@ def create_conversation():
         }), 200
     
     conversation = Conversation(
-        user1_id=user.id,
-        user2_id=other_user.id
+        user1_id=low_id,
+        user2_id=high_id
     )
     
     db.session.add(conversation)
-    db.session.commit()
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # A concurrent request created the same pair first
+        db.session.rollback()
+        existing_conversation = Conversation.query.filter_by(user1_id=low_id, user2_id=high_id).first()
+        return jsonify({
+            'message': 'Conversation already exists',
+            'conversation_id': existing_conversation.id
+        }), 200
     
     return jsonify({
         'message': 'Conversation created successfully',
         'conversation_id': conversation.id
-    }), 201 
\ No newline at end of file
+    }), 201
+
+@messaging_bp.route('/messages/<int:conversation_id>/read', methods=['POST'])
+@jwt_required()
+def mark_read(conversation_id):
+    """Mark every message received in a conversation up to up_to_id (default: all) as read"""
+    email = get_jwt_identity()
+    user = User.query.filter_by(email=email).first()
+    if not user:
+        return jsonify({'error': 'User not found'}), 404
+    
+    conversation = Conversation.query.get(conversation_id)
+    if not conversation:
+        return jsonify({'error': 'Conversation not found'}), 404
+    
+    if conversation.user1_id != user.id and conversation.user2_id != user.id:
+        return jsonify({'error': 'Access denied'}), 403
+    
+    data = request.get_json(silent=True) or {}
+    up_to_id = data.get('up_to_id', conversation.last_message_id)
+    if up_to_id is None:
+        return jsonify({'conversation_id': conversation_id, 'marked': 0, 'unread_count': 0}), 200
+    if not isinstance(up_to_id, int):
+        return jsonify({'error': 'up_to_id must be a message id'}), 400
+    
+    marked = Message.query.filter(
+        Message.conversation_id == conversation_id,
+        Message.sender_id != user.id,
+        Message.id <= up_to_id,
+        Message.is_read == False  # noqa: E712
+    ).update({Message.is_read: True}, synchronize_session=False)
+    
+    if marked:
+        column = unread_column(conversation, user.id)
+        setattr(conversation, column.key, db.case((column > marked, column - marked), else_=0))
+        # Reading is not activity: pin updated_at (the inbox order) against its onupdate
+        conversation.updated_at = Conversation.updated_at
+        bump_unread_total(user.id, -marked)
+    other_id = conversation.user2_id if conversation.user1_id == user.id else conversation.user1_id
+    db.session.commit()
+    
+    if marked:
+        # Read receipt for the sender
+        publish_event([other_id], 'read', {'conversation_id': conversation_id, 'reader_id': user.id, 'up_to_id': up_to_id})
+    
+    return jsonify({
+        'conversation_id': conversation_id,
+        'marked': marked,
+        'unread_count': unread_count_for(conversation, user.id)
+    }), 200
+
+@messaging_bp.route('/messages/unread', methods=['GET'])
+@jwt_required()
+def get_unread_count():
+    """Total unread messages for the current user's badge"""
+    email = get_jwt_identity()
+    user = User.query.filter_by(email=email).first()
+    if not user:
+        return jsonify({'error': 'User not found'}), 404
+    
+    counter = UserUnreadCount.query.get(user.id)
+    return jsonify({'unread_count': counter.total if counter else 0}), 200
+
+@messaging_bp.route('/messages/search', methods=['GET'])
+@jwt_required()
+def search_messages():
+    """Search the current user's messages; hits contain every query term, best matches first"""
+    email = get_jwt_identity()
+    user = User.query.filter_by(email=email).first()
+    if not user:
+        return jsonify({'error': 'User not found'}), 404
+    
+    query = (request.args.get('q') or '').strip()
+    if not query:
+        return jsonify({'error': 'Search query is required'}), 400
+    
+    limit = page_limit(request.args.get('limit', type=int))
+    cursor = request.args.get('cursor')
+    try:
+        after = decode_cursor(cursor, int, int) if cursor else None
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor'}), 400
+    
+    hits = message_search.search(user.id, query, limit=limit + 1, after=after)
+    has_more = len(hits) > limit
+    hits = hits[:limit]
+    
+    # Hydrate hits, their conversations and the other participants with one query each
+    message_ids = [message_id for message_id, _ in hits]
+    messages = {msg.id: msg for msg in Message.query.filter(Message.id.in_(message_ids))} if message_ids else {}
+    conversation_ids = {msg.conversation_id for msg in messages.values()}
+    conversations = {conv.id: conv for conv in Conversation.query.filter(Conversation.id.in_(conversation_ids))} if conversation_ids else {}
+    other_ids = {conv.user2_id if conv.user1_id == user.id else conv.user1_id for conv in conversations.values()}
+    other_users = {u.id: u for u in User.query.filter(User.id.in_(other_ids))} if other_ids else {}
+    
+    results = []
+    for message_id, score in hits:
+        msg = messages.get(message_id)
+        conv = conversations.get(msg.conversation_id) if msg else None
+        if not conv:
+            continue
+        other_user = other_users.get(conv.user2_id if conv.user1_id == user.id else conv.user1_id)
+        results.append({
+            'id': msg.id,
+            'content': msg.content,
+            'sender_id': msg.sender_id,
+            'created_at': msg.created_at.isoformat(),
+            'score': score,
+            'conversation': {
+                'id': conv.id,
+                'other_user': {
+                    'id': other_user.id,
+                    'name': other_user.name,
+                    'username': other_user.username
+                } if other_user else None
+            },
+            # Pass to GET /messages/<conversation_id> as ?before= or ?after= to load the surrounding messages
+            'context_cursor': encode_cursor(msg.created_at, msg.id)
+        })
+    
+    return jsonify({
+        'results': results,
+        'terms': message_search.search_terms(query)[:message_search.MAX_QUERY_TERMS],
+        'next_cursor': encode_cursor(hits[-1][1], hits[-1][0]) if has_more else None
+    }), 200
+
+def parse_last_event_id(value):
+    try:
+        return int(value) if value else None
+    except ValueError:
+        return None
+
+@messaging_bp.route('/messages/stream', methods=['GET'])
+@jwt_required(locations=['headers', 'query_string'])
+def stream_events():
+    """
+    Server-sent events feed of the current user's messaging events.
+    EventSource cannot set headers, so the token may also be passed as ?jwt=.
+    Reconnects resume from the Last-Event-ID header (or ?last_event_id=).
+    Needs a threaded or gevent worker: each open stream holds one.
+    """
+    email = get_jwt_identity()
+    user = User.query.filter_by(email=email).first()
+    if not user:
+        return jsonify({'error': 'User not found'}), 404
+    
+    user_id = user.id
+    broker = get_broker()
+    last_event_id = parse_last_event_id(request.headers.get('Last-Event-ID') or request.args.get('last_event_id'))
+    if last_event_id is None:
+        last_event_id = broker.latest_event_id(user_id)
+    heartbeat = current_app.config['MESSAGE_STREAM_HEARTBEAT_SECONDS']
+    max_seconds = current_app.config['MESSAGE_STREAM_MAX_SECONDS']
+    
+    # Hand the pooled connection back; an idle stream only holds the broker wait
+    db.session.close()
+    
+    def generate():
+        last = last_event_id
+        deadline = time.monotonic() + max_seconds
+        yield 'retry: 3000\n\n'
+        while time.monotonic() < deadline:
+            events, missed = broker.wait(user_id, last, heartbeat)
+            if missed:
+                yield 'event: resync\ndata: {}\n\n'
+                if not events:
+                    # The client refetches through REST; carry on from the current position
+                    last = broker.latest_event_id(user_id)
+            if not events:
+                yield ': keepalive\n\n'
+                continue
+            for event_id, event_type, data in events:
+                last = event_id
+                yield f'id: {event_id}\nevent: {event_type}\ndata: {json.dumps(data)}\n\n'
+    
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+@messaging_bp.route('/messages/events', methods=['GET'])
+@jwt_required()
+def poll_events():
+    """Long-poll alternative to /messages/stream for clients without EventSource"""
+    email = get_jwt_identity()
+    user = User.query.filter_by(email=email).first()
+    if not user:
+        return jsonify({'error': 'User not found'}), 404
+    
+    broker = get_broker()
+    last_event_id = parse_last_event_id(request.args.get('last_event_id'))
+    if last_event_id is None:
+        # First call: hand back the position to poll from
+        return jsonify({'events': [], 'last_event_id': broker.latest_event_id(user.id), 'missed': False}), 200
+    
+    timeout = max(0.0, min(request.args.get('timeout', 25, type=float), 55.0))
+    user_id = user.id
+    db.session.close()
+    events, missed = broker.wait(user_id, last_event_id, timeout)
+    
+    return jsonify({
+        'events': [{'id': event_id, 'type': event_type, 'data': data} for event_id, event_type, data in events],
+        'last_event_id': events[-1][0] if events else broker.latest_event_id(user_id) if missed else last_event_id,
+        'missed': missed
+    }), 200
@@ -5,46 +5,18 @@ from models.user import User
 from models.profile import Profile
 from models import db
 from datetime import datetime
+from sqlalchemy.orm import load_only
 from werkzeug.utils import secure_filename
 import os
 from config import Config
 import json
-from typing import Dict, Any, Optional
+from services.cache import get_cache
+from api.serializers import AUTHOR_CARD_OPTIONS, POST_FIELDS, serialize_comment, serialize_post
+from utils.conditional import conditional, versions_stamp
+from utils.streaming import keyset_batches, stream_response
 
 posts_bp = Blueprint('posts', __name__)
 
-# Simple in-memory cache
-_cache: Dict[str, Any] = {
-    'categories': None,
-    'popular_tags': None,
-    'last_updated': None
-}
-
-def get_cached_data(key: str, ttl_seconds: int = 300) -> Optional[Any]:
-    """Get cached data if it's still valid"""
-    if key not in _cache or _cache[key] is None:
-        return None
-    
-    if _cache['last_updated'] is None:
-        return None
-    
-    # Check if cache is still valid (5 minutes TTL)
-    if (datetime.utcnow() - _cache['last_updated']).total_seconds() > ttl_seconds:
-        return None
-    
-    return _cache[key]
-
-def set_cached_data(key: str, data: Any) -> None:
-    """Set cached data with timestamp"""
-    _cache[key] = data
-    _cache['last_updated'] = datetime.utcnow()
-
-def invalidate_cache() -> None:
-    """Invalidate all cached data"""
-    _cache['categories'] = None
-    _cache['popular_tags'] = None
-    _cache['last_updated'] = None
- 
 @posts_bp.route('/posts', methods=['POST'])
 @jwt_required()
 def create_post():
@@ -101,35 +73,27 @@ def create_post():
 
     db.session.add(post)
     db.session.commit()
-
-    # After saving the file and setting media_url:
-    if media_url:
-        # Ensure full URL is returned
-        media_url = request.host_url.rstrip('/') + media_url
+    get_cache().invalidate('posts')
 
     # Get user profile information
     profile = Profile.query.filter_by(user_id=user.id).first()
     
-    return jsonify({
-        'id': post.id,
-        'content': post.content,
-        'imageUrl': media_url,
-        'user_id': post.user_id,
-        'created_at': post.created_at.isoformat(),
-        'likes_count': post.likes_count if hasattr(post, 'likes_count') else 0,
-        'comments_count': post.comments_count if hasattr(post, 'comments_count') else 0,
-        'user': {
-            'id': user.id,
-            'name': user.name,
-            'username': user.username,
-            'avatar_url': profile.avatar_url if profile else None,
-            'title': profile.title if profile else None,
-            'location': profile.location if profile else None
-        }
-    }), 201
+    return jsonify(serialize_post(post, user, profile, request.host_url.rstrip('/'))), 201
+
+def posts_stamp():
+    # Any post added, removed, edited or liked, or any author card (name, title, avatar) changed
+    return versions_stamp('posts', 'authors')
+
+def post_stamp(post_id):
+    return db.session.query(
+        Post.updated_at, Post.likes_count, Post.comments_count, User.name, User.username, Profile.updated_at
+    ).outerjoin(User, User.id == Post.user_id).outerjoin(Profile, Profile.user_id == Post.user_id).filter(
+        Post.id == post_id
+    ).first()
 
 @posts_bp.route('/posts', methods=['GET'])
 @jwt_required()
+@conditional(posts_stamp)
 def get_posts():
     """Get all posts with pagination, filtering, and sorting"""
     page = request.args.get('page', 1, type=int)
@@ -140,9 +104,15 @@ def get_posts():
     tags = request.args.get('tags', '')
     sort_by = request.args.get('sort_by', 'created_at')
     sort_order = request.args.get('sort_order', 'desc')
+    try:
+        selection = POST_FIELDS.select(request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
     # Build query
     query = Post.query
+    if selection:
+        query = query.options(*selection.options)
     
     # Apply search filter
     if search:
@@ -192,30 +162,21 @@ def get_posts():
         page=page, per_page=per_page, error_out=False
     )
     
-    posts_data = []
-    for post in posts.items:
-        user = User.query.get(post.user_id)
-        profile = Profile.query.filter_by(user_id=post.user_id).first() if user else None
-        media_url = post.media_url
-        if media_url:
-            media_url = request.host_url.rstrip('/') + media_url
-        posts_data.append({
-            'id': post.id,
-            'content': post.content,
-            'user_id': post.user_id,
-            'created_at': post.created_at.isoformat(),
-            'likes_count': post.likes_count if hasattr(post, 'likes_count') else 0,
-            'comments_count': post.comments_count if hasattr(post, 'comments_count') else 0,
-            'imageUrl': media_url,
-            'user': {
-                'id': user.id,
-                'name': user.name,
-                'username': user.username,
-                'avatar_url': profile.avatar_url if profile else None,
-                'title': profile.title if profile else None,
-                'location': profile.location if profile else None
-            } if user else None
-        })
+    # Every author and their profile in one query, instead of two per post
+    author_ids = {post.user_id for post in posts.items} if not selection or 'user' in selection else ()
+    authors = {
+        author.id: (author, profile)
+        for author, profile in db.session.query(User, Profile)
+        .outerjoin(Profile, Profile.user_id == User.id)
+        .options(*AUTHOR_CARD_OPTIONS)
+        .filter(User.id.in_(author_ids))
+    } if author_ids else {}
+    
+    media_base = request.host_url.rstrip('/')
+    posts_data = [
+        serialize_post(post, *authors.get(post.user_id, (None, None)), media_base, selection=selection)
+        for post in posts.items
+    ]
     
     return jsonify({
         'posts': posts_data,
@@ -245,6 +206,7 @@ def like_post(post_id):
     post.likes_count += 1
     
     db.session.commit()
+    get_cache().invalidate('posts')
     
     return jsonify({
         'message': 'Post liked successfully',
@@ -253,6 +215,7 @@ def like_post(post_id):
 
 @posts_bp.route('/posts/<int:post_id>', methods=['GET'])
 @jwt_required()
+@conditional(post_stamp)
 def get_post(post_id):
     """Get a specific post"""
     post = Post.query.get(post_id)
@@ -261,26 +224,7 @@ def get_post(post_id):
     
     user = User.query.get(post.user_id)
     profile = Profile.query.filter_by(user_id=post.user_id).first() if user else None
-    media_url = post.media_url
-    if media_url:
-        media_url = request.host_url.rstrip('/') + media_url
-    return jsonify({
-        'id': post.id,
-        'content': post.content,
-        'user_id': post.user_id,
-        'created_at': post.created_at.isoformat(),
-        'likes_count': post.likes_count if hasattr(post, 'likes_count') else 0,
-        'comments_count': post.comments_count if hasattr(post, 'comments_count') else 0,
-        'imageUrl': media_url,
-        'user': {
-            'id': user.id,
-            'name': user.name,
-            'username': user.username,
-            'avatar_url': profile.avatar_url if profile else None,
-            'title': profile.title if profile else None,
-            'location': profile.location if profile else None
-        } if user else None
-    }), 200 
+    return jsonify(serialize_post(post, user, profile, request.host_url.rstrip('/'))), 200 
 
 @posts_bp.route('/api/uploads/<filename>')
 def uploaded_file(filename):
@@ -296,21 +240,19 @@ def get_comments(post_id):
     post = Post.query.get(post_id)
     if not post:
         return jsonify({'error': 'Post not found'}), 404
-    comments = Comment.query.filter_by(post_id=post_id).order_by(Comment.created_at.asc()).all()
-    comments_data = []
-    for comment in comments:
-        user = User.query.get(comment.user_id)
-        comments_data.append({
-            'id': comment.id,
-            'content': comment.content,
-            'created_at': comment.created_at.isoformat(),
-            'user': {
-                'id': user.id,
-                'name': user.name,
-                'username': user.username
-            } if user else None
-        })
-    return jsonify({'comments': comments_data}), 200
+    
+    def serialize_batch(comments):
+        # Commenters once per batch rather than once per comment
+        commenter_ids = {comment.user_id for comment in comments}
+        commenters = {
+            u.id: u for u in User.query.options(load_only(User.id, User.name, User.username))
+            .filter(User.id.in_(commenter_ids))
+        }
+        return [serialize_comment(comment, commenters.get(comment.user_id)) for comment in comments]
+    
+    # Popular posts collect thousands of comments: stream them rather than building the whole list
+    comments = Comment.query.filter_by(post_id=post_id)
+    return stream_response(keyset_batches(comments, (Comment.created_at, Comment.id)), serialize_batch, 'comments')
 
 @posts_bp.route('/posts/<int:post_id>/comments', methods=['POST'])
 @jwt_required()
@@ -329,16 +271,8 @@ def add_comment(post_id):
     comment = Comment(post_id=post_id, user_id=user.id, content=content.strip())
     db.session.add(comment)
     db.session.commit()
-    return jsonify({
-        'id': comment.id,
-        'content': comment.content,
-        'created_at': comment.created_at.isoformat(),
-        'user': {
-            'id': user.id,
-            'name': user.name,
-            'username': user.username
-        }
-    }), 201 
+    get_cache().invalidate('posts')
+    return jsonify(serialize_comment(comment, user)), 201 
 
 @posts_bp.route('/posts/<int:post_id>/comments/<int:comment_id>', methods=['PUT'])
 @jwt_required()
@@ -370,4 +304,5 @@ def delete_comment(post_id, comment_id):
         return jsonify({'error': 'Unauthorized'}), 403
     db.session.delete(comment)
     db.session.commit()
+    get_cache().invalidate('posts')
     return jsonify({'message': 'Comment deleted', 'id': comment.id}), 200 
\ No newline at end of file
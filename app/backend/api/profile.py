@@ -1,4 +1,4 @@
-from flask import Blueprint, request, jsonify, send_from_directory
+from flask import Blueprint, current_app, request, jsonify, send_from_directory
 from models.profile import Profile, Skill, Experience, Education, db
 from models.user import User
 import os
@@ -6,6 +6,9 @@ import secrets
 from werkzeug.utils import secure_filename
 from PIL import Image
 from config import Config
+from services.cache import get_cache
+from api.serializers import serialize_profile, serialize_full_profile
+from utils.conditional import conditional, current_etag
 from flask_jwt_extended import jwt_required, get_jwt_identity
 import time
 import datetime
@@ -34,33 +37,6 @@ def validate_profile_data(data):
             errors[required] = f'{required.capitalize()} cannot be empty.'
     return errors
 
-# Helper: serialize skill, experience, education
-
-def serialize_skill(skill):
-    return {"id": skill.id, "name": skill.name}
-
-def serialize_experience(exp):
-    return {
-        "id": exp.id,
-        "title": exp.title,
-        "company": exp.company,
-        "start_date": exp.start_date.isoformat() if exp.start_date else None,
-        "end_date": exp.end_date.isoformat() if exp.end_date else None,
-        "description": exp.description,
-        "current": exp.current
-    }
-
-def serialize_education(edu):
-    return {
-        "id": edu.id,
-        "school": edu.school,
-        "degree": edu.degree,
-        "field": edu.field,
-        "start_date": edu.start_date.isoformat() if edu.start_date else None,
-        "end_date": edu.end_date.isoformat() if edu.end_date else None,
-        "current": edu.current
-    }
-
 def get_user_id_from_email(email):
     user = User.query.filter_by(email=email).first()
     return user.id if user else None
@@ -69,27 +45,28 @@ def get_email_from_user_id(user_id):
     user = User.query.filter_by(id=user_id).first()
     return user.email if user else None
 
+def invalidate_profile_cache(user_id):
+    # Feed pages embed author names, titles and avatars, hence 'authors'
+    get_cache().invalidate(f'profile:{user_id}', 'authors')
+
+def profile_stamp(user_id):
+    return db.session.query(Profile.id, Profile.updated_at).filter_by(user_id=user_id).first()
+
 # Get profile by user_id
 @profile_bp.route('/profile/<int:user_id>', methods=['GET'])
+@conditional(profile_stamp)
 def get_profile(user_id):
+    cache = get_cache()
+    key = f'profile:{user_id}'
+    profile_data = cache.get(f'{key}:{current_etag()}')
+    if profile_data is not None:
+        return jsonify(profile_data)
     profile = Profile.query.filter_by(user_id=user_id).first()
     if not profile:
         return jsonify({'error': 'Profile not found'}), 404
-    return jsonify({
-        'id': profile.id,
-        'user_id': profile.user_id,
-        'bio': profile.bio,
-        'location': profile.location,
-        'title': profile.title,
-        'avatar_url': profile.avatar_url,
-        'cover_url': profile.cover_url,
-        'website': profile.website,
-        'linkedin': profile.linkedin,
-        'github': profile.github,
-        'twitter': profile.twitter,
-        'phone': profile.phone,
-        'created_at': profile.created_at.isoformat() if profile.created_at else None
-    })
+    profile_data = serialize_profile(profile)
+    cache.set(f'{key}:{current_etag()}', profile_data, current_app.config['CACHE_PROFILE_TTL_SECONDS'], tags=(key,))
+    return jsonify(profile_data)
 
 # Create or update profile by user_id
 @profile_bp.route('/profile/<int:user_id>', methods=['POST', 'PUT'])
@@ -110,6 +87,7 @@ def create_or_update_profile(user_id):
         if field in data:
             setattr(profile, field, data[field])
     db.session.commit()
+    invalidate_profile_cache(user_id)
     return jsonify({'message': 'Profile saved successfully.'})
 
 # Delete profile by user_id
@@ -120,6 +98,7 @@ def delete_profile(user_id):
         return jsonify({'error': 'Profile not found'}), 404
     db.session.delete(profile)
     db.session.commit()
+    invalidate_profile_cache(user_id)
     return jsonify({'message': 'Profile deleted.'})
 
 # GET /api/profile - Get current user's profile (with skills, experience, education)
@@ -134,30 +113,18 @@ def get_current_profile():
     profile = Profile.query.filter_by(user_id=user_id).first()
     if not profile:
         return jsonify({'error': 'Profile not found'}), 404
+    # Every edit to this view bumps updated_at, so other workers' entries go stale with it instead of living out the TTL
+    cache = get_cache()
+    key = f'profile:{user_id}:full:{profile.updated_at.isoformat() if profile.updated_at else ""}'
+    profile_data = cache.get(key)
+    if profile_data is not None:
+        return jsonify(profile_data), 200
     skills = Skill.query.filter_by(user_id=user_id).all()
     experience = Experience.query.filter_by(user_id=user_id).all()
     education = Education.query.filter_by(user_id=user_id).all()
-    return jsonify({
-        'id': profile.id,
-        'user_id': profile.user_id,
-        'bio': profile.bio,
-        'location': profile.location,
-        'title': profile.title,
-        'avatar_url': profile.avatar_url,
-        'cover_url': profile.cover_url,
-        'website': profile.website,
-        'linkedin': profile.linkedin,
-        'github': profile.github,
-        'twitter': profile.twitter,
-        'phone': profile.phone,
-        'created_at': profile.created_at.isoformat() if profile.created_at else None,
-        'name': user.name,
-        'username': user.username,
-        'email': user.email,
-        'skills': [serialize_skill(s) for s in skills],
-        'experience': [serialize_experience(e) for e in experience],
-        'education': [serialize_education(ed) for ed in education]
-    }), 200
+    profile_data = serialize_full_profile(profile, user, skills, experience, education)
+    cache.set(key, profile_data, current_app.config['CACHE_PROFILE_TTL_SECONDS'], tags=(f'profile:{user_id}',))
+    return jsonify(profile_data), 200
 
 # PUT /api/profile - Update current user's profile (with skills, experience, education)
 @profile_bp.route('/api/profile', methods=['PUT'])
@@ -200,6 +167,9 @@ def update_current_profile():
     if 'cover_url' in data:
         profile.cover_url = data['cover_url']
     
+    # Feeds and ETags read the author card's version from here, and the fields below live elsewhere
+    profile.updated_at = datetime.datetime.utcnow()
+    
     # Update user fields if provided
     if 'name' in data:
         user.name = data['name']
@@ -252,60 +222,18 @@ def update_current_profile():
         ))
     try:
         db.session.commit()
+        invalidate_profile_cache(user_id)
         # Re-fetch the latest data after saving
         profile = Profile.query.filter_by(user_id=user_id).first()
         user = User.query.filter_by(id=user_id).first()
         skills = Skill.query.filter_by(user_id=user_id).all()
         experience = Experience.query.filter_by(user_id=user_id).all()
         education = Education.query.filter_by(user_id=user_id).all()
-        skills_serialized = [serialize_skill(s) for s in skills]
-        experience_serialized = [serialize_experience(e) for e in experience]
-        education_serialized = [serialize_education(ed) for ed in education]
-        response = {
-            'id': profile.id,
-            'user_id': profile.user_id,
-            'bio': profile.bio,
-            'location': profile.location,
-            'title': profile.title,
-            'avatar_url': profile.avatar_url,
-            'cover_url': profile.cover_url,
-            'website': profile.website,
-            'linkedin': profile.linkedin,
-            'github': profile.github,
-            'twitter': profile.twitter,
-            'phone': profile.phone,
-            'created_at': profile.created_at.isoformat() if profile.created_at else None,
-            'name': user.name,
-            'username': user.username,
-            'email': user.email,
-            'skills': skills_serialized,
-            'experience': experience_serialized,
-            'education': education_serialized
-        }
+        response = serialize_full_profile(profile, user, skills, experience, education)
     except Exception as e:
         print('Critical error in profile PUT response:', e)
-        response = {
-            'id': profile.id,
-            'user_id': profile.user_id,
-            'bio': profile.bio,
-            'location': profile.location,
-            'title': profile.title,
-            'avatar_url': profile.avatar_url,
-            'cover_url': profile.cover_url,
-            'website': profile.website,
-            'linkedin': profile.linkedin,
-            'github': profile.github,
-            'twitter': profile.twitter,
-            'phone': profile.phone,
-            'created_at': profile.created_at.isoformat() if profile.created_at else None,
-            'name': user.name,
-            'username': user.username,
-            'email': user.email,
-            'skills': [],
-            'experience': [],
-            'education': [],
-            'error': 'Backend error: ' + str(e)
-        }
+        response = serialize_full_profile(profile, user, [], [], [])
+        response['error'] = 'Backend error: ' + str(e)
     return jsonify(response), 200
 
 def allowed_image(filename):
@@ -350,7 +278,7 @@ def upload_profile_image():
     timestamp = int(time.time())
     random_hex = secrets.token_hex(4)
     filename = secure_filename(f"{timestamp}_{random_hex}.{ext}")
-    upload_dir = Config.UPLOAD_FOLDER
+    upload_dir = current_app.config['UPLOAD_FOLDER']
     os.makedirs(upload_dir, exist_ok=True)
     file_path = os.path.join(upload_dir, filename)
     file.save(file_path)
@@ -372,12 +300,13 @@ def upload_profile_image():
         return jsonify({'error': 'Profile not found'}), 404
     profile.avatar_url = f"/api/profile_images/{os.path.basename(main_img_path)}"
     db.session.commit()
+    invalidate_profile_cache(user_id)
     return jsonify({'image_url': profile.avatar_url}), 200
 
 # Secure file serving for profile images (public access)
 @profile_bp.route('/api/profile_images/<filename>', methods=['GET'])
 def serve_profile_image(filename):
-    return send_from_directory(Config.UPLOAD_FOLDER, filename)
+    return send_from_directory(current_app.config['UPLOAD_FOLDER'], filename)
 
 @profile_bp.route('/api/profile/cover', methods=['POST'])
 @jwt_required()
@@ -398,7 +327,7 @@ def upload_cover_image():
     timestamp = int(time.time())
     random_hex = secrets.token_hex(4)
     filename = secure_filename(f"cover_{timestamp}_{random_hex}.{ext}")
-    upload_dir = Config.UPLOAD_FOLDER
+    upload_dir = current_app.config['UPLOAD_FOLDER']
     os.makedirs(upload_dir, exist_ok=True)
     file_path = os.path.join(upload_dir, filename)
     file.save(file_path)
@@ -420,6 +349,7 @@ def upload_cover_image():
         return jsonify({'error': 'Profile not found'}), 404
     profile.cover_url = f"/api/profile_images/{os.path.basename(main_img_path)}"
     db.session.commit()
+    invalidate_profile_cache(user_id)
     return jsonify({'cover_url': profile.cover_url}), 200
 
 @profile_bp.route('/api/profile/cover', methods=['DELETE'])
@@ -434,6 +364,7 @@ def remove_cover_image():
         return jsonify({'error': 'Profile not found'}), 404
     profile.cover_url = None
     db.session.commit()
+    invalidate_profile_cache(user_id)
     return jsonify({'message': 'Cover image removed.'}), 200
 
 # Routes will be implemented here 
\ No newline at end of file
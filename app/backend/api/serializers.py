@@ -0,0 +1,274 @@
+"""
+Response shapes for posts, jobs and profiles, shared by every handler that
+returns them.
+
+Each shape is a field plan compiled once at import: ``field_plan('id',
+('created_at', iso))`` generates a function whose body is a single dict
+literal over the instance ``__dict__``, where SQLAlchemy keeps loaded
+column values, so a row costs one dict lookup per field instead of an
+instrumented attribute access (which dominated the hand-built dicts). If a
+field is not loaded (expired after a commit, deferred) the plan falls back
+to attribute access, which loads it. ``iso`` is inlined. Output is
+JSON-ready (dates as ISO strings) so it can go into the read cache as well
+as to ``jsonify``; ``benchmarks/serialization_bench.py`` measures it.
+
+List views also take ``?fields=`` (``POST_FIELDS.select``, ``JOB_FIELDS.select``):
+a comma-separated list of response keys and presets. The result is a
+``Selection`` that carries the ``load_only``/``with_expression`` options
+for the list query, so unrequested columns (post content, job description
+and requirements) are never read, and the plan that serialises just those
+keys. The ``summary`` preset swaps the long text for its first
+``SUMMARY_EXCERPT_CHARS`` characters. The database cuts them with SUBSTR,
+and the response adds ``<key>_truncated``.
+"""
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload, load_only, with_expression
+
+from models.job import Job
+from models.post import Post
+from models.profile import Profile
+from models.user import User
+
+SUMMARY_EXCERPT_CHARS = 200
+
+
+def iso(value):
+    return value.isoformat() if value is not None else None
+
+
+def field_plan(*fields):
+    """Compile obj -> dict over fields, each an attribute name or (attribute name, converter)"""
+    namespace = {}
+    loaded, fallback = [], []
+    for index, field in enumerate(fields):
+        name, convert = (field, None) if isinstance(field, str) else field
+        if not name.isidentifier():
+            raise ValueError(f'not an attribute name: {name!r}')
+        for target, value in ((loaded, f'values[{name!r}]'), (fallback, f'obj.{name}')):
+            if convert is iso:
+                expression = f'({value}.isoformat() if {value} is not None else None)'
+            elif convert is not None:
+                namespace[f'convert_{index}'] = convert
+                expression = f'convert_{index}({value})'
+            else:
+                expression = value
+            target.append(f'{name!r}: {expression}')
+    exec(
+        'def serialize(obj):\n'
+        '    values = obj.__dict__\n'
+        '    try:\n'
+        f'        return {{{", ".join(loaded)}}}\n'
+        '    except KeyError:\n'
+        f'        return {{{", ".join(fallback)}}}\n',
+        namespace
+    )
+    return namespace['serialize']
+
+
+serialize_skill = field_plan('id', 'name')
+serialize_experience = field_plan('id', 'title', 'company', ('start_date', iso), ('end_date', iso), 'description',
+                                  'current')
+serialize_education = field_plan('id', 'school', 'degree', 'field', ('start_date', iso), ('end_date', iso), 'current')
+
+_user_fields = field_plan('id', 'name', 'username')
+_card_fields = field_plan('avatar_url', 'title', 'location')
+_NO_CARD = {'avatar_url': None, 'title': None, 'location': None}
+_post_fields = field_plan('id', 'content', 'user_id', ('created_at', iso), 'likes_count', 'comments_count')
+_job_fields = field_plan('id', 'title', 'company', 'location', 'description', 'requirements', 'salary_range',
+                         'job_type', ('created_at', iso), ('expires_at', iso))
+_comment_fields = field_plan('id', 'content', ('created_at', iso))
+_profile_fields = field_plan('id', 'user_id', 'bio', 'location', 'title', 'avatar_url', 'cover_url', 'website',
+                             'linkedin', 'github', 'twitter', 'phone', ('created_at', iso))
+
+
+# For queries loading authors only to build their cards: skip password hashes, bios and the like
+AUTHOR_CARD_OPTIONS = (load_only(User.id, User.name, User.username),
+                       load_only(Profile.user_id, Profile.avatar_url, Profile.title, Profile.location))
+# The same columns joined into a post query through Post.author (read with post_author_card)
+POST_AUTHOR_CARD = joinedload(Post.author).load_only(User.id, User.name, User.username).joinedload(
+    User.profile).load_only(Profile.user_id, Profile.avatar_url, Profile.title, Profile.location)
+
+
+def serialize_user(user):
+    return _user_fields(user) if user is not None else None
+
+
+def author_card(user, profile):
+    """The author block embedded in posts: id, name, username and profile headline fields"""
+    if user is None:
+        return None
+    card = _user_fields(user)
+    card.update(_card_fields(profile) if profile is not None else _NO_CARD)
+    return card
+
+
+def post_author_card(post):
+    """(user, profile) of a post loaded with POST_AUTHOR_CARD"""
+    author = post.author
+    return author, author.profile if author is not None else None
+
+
+def serialize_post(post, user, profile, media_base, media_key=False, selection=None):
+    """
+    A post with its author card, or the keys in selection. media_base is
+    request.host_url without the trailing slash; media_key also emits the
+    media URL as 'media_url' (feed views) next to 'imageUrl'.
+    """
+    if selection is None:
+        data = _post_fields(post)
+        wants_image, wants_media, wants_user = True, media_key, True
+    else:
+        data = selection.serialize(post)
+        wants_image, wants_media, wants_user = 'imageUrl' in selection, 'media_url' in selection, 'user' in selection
+    if wants_image or wants_media:
+        media_url = media_base + post.media_url if post.media_url else post.media_url
+        if wants_image:
+            data['imageUrl'] = media_url
+        if wants_media:
+            data['media_url'] = media_url
+    if wants_user:
+        data['user'] = author_card(user, profile)
+    return data
+
+
+def serialize_comment(comment, user):
+    data = _comment_fields(comment)
+    data['user'] = serialize_user(user)
+    return data
+
+
+def serialize_message(message, sender):
+    # Attribute access, not a field plan: archived messages are namedtuples, not ORM rows
+    return {
+        'id': message.id,
+        'content': message.content,
+        'sender_id': message.sender_id,
+        'sender': serialize_user(sender),
+        'created_at': message.created_at.isoformat(),
+        'is_read': message.is_read
+    }
+
+
+def serialize_job(job, posted_by_user, selection=None):
+    if selection is None:
+        data = _job_fields(job)
+    elif 'posted_by' not in selection:
+        return selection.serialize(job)
+    else:
+        data = selection.serialize(job)
+    data['posted_by'] = serialize_user(posted_by_user)
+    return data
+
+
+def serialize_profile(profile):
+    return _profile_fields(profile)
+
+
+def serialize_full_profile(profile, user, skills, experience, education):
+    """The current user's profile with account fields, skills, experience and education"""
+    data = _profile_fields(profile)
+    data['name'] = user.name
+    data['username'] = user.username
+    data['email'] = user.email
+    data['skills'] = [serialize_skill(skill) for skill in skills]
+    data['experience'] = [serialize_experience(exp) for exp in experience]
+    data['education'] = [serialize_education(edu) for edu in education]
+    return data
+
+
+class Selection:
+    """The response keys picked by ?fields=, with the query options and plan that produce only those"""
+
+    def __init__(self, fieldset, keys, excerpt):
+        self.keys = frozenset(keys)
+        self.excerpt = excerpt
+        self.name = ','.join(sorted(self.keys)) + (f'~{excerpt}' if excerpt else '')  # for cache keys
+        model = fieldset.model
+        columns = set(fieldset.required) | {key for key in self.keys if key in fieldset.columns}
+        for key in self.keys & fieldset.computed.keys():
+            columns.update(fieldset.computed[key])
+        self.options = [load_only(*(getattr(model, column) for column in sorted(columns)))]
+        if excerpt:
+            # One character more than we keep, to tell whether the text was cut
+            self.options.append(with_expression(
+                model.excerpt, func.substr(getattr(model, excerpt), 1, SUMMARY_EXCERPT_CHARS + 1)
+            ))
+        self._plan = field_plan(*(
+            (key, iso) if key in fieldset.dates else key
+            for key in sorted(self.keys & fieldset.columns)
+        ))
+
+    def __contains__(self, key):
+        return key in self.keys
+
+    def serialize(self, obj):
+        data = self._plan(obj)
+        if self.excerpt:
+            text = obj.excerpt or ''
+            truncated = len(text) > SUMMARY_EXCERPT_CHARS
+            data[self.excerpt] = text[:SUMMARY_EXCERPT_CHARS].rstrip() + '…' if truncated else text
+            data[f'{self.excerpt}_truncated'] = truncated
+        return data
+
+
+class FieldSet:
+    """
+    What ?fields= may ask for on one model's list view: columns returned
+    under their own name, computed keys and the columns they need, columns
+    every query loads, and presets (keys plus the text column to excerpt).
+    """
+
+    def __init__(self, model, columns, computed, required, presets, dates=()):
+        self.model = model
+        self.columns = frozenset(columns)
+        self.computed = computed
+        self.required = tuple(required)
+        self.presets = presets
+        self.dates = frozenset(dates)
+        self._selections = {}
+
+    def select(self, value):
+        """Selection for a ?fields= value, None for the full shape; ValueError names unknown fields"""
+        if not value:
+            return None
+        keys, excerpt, unknown = set(), None, []
+        for name in (part.strip() for part in value.split(',')):
+            if name in self.presets:
+                preset_keys, preset_excerpt = self.presets[name]
+                keys.update(preset_keys)
+                excerpt = excerpt or preset_excerpt
+            elif name in self.columns or name in self.computed:
+                keys.add(name)
+            elif name:
+                unknown.append(name)
+        if unknown:
+            raise ValueError(f'Unknown fields: {", ".join(unknown)}')
+        if excerpt in keys:
+            excerpt = None  # the full text was asked for as well
+        cache_key = (frozenset(keys), excerpt)
+        selection = self._selections.get(cache_key)
+        if selection is None:
+            selection = self._selections[cache_key] = Selection(self, keys, excerpt)
+        return selection
+
+
+POST_FIELDS = FieldSet(
+    Post,
+    columns=('id', 'content', 'user_id', 'created_at', 'likes_count', 'comments_count'),
+    computed={'imageUrl': ('media_url',), 'media_url': ('media_url',), 'user': ()},
+    required=('id', 'user_id'),
+    presets={'summary': (('id', 'user_id', 'created_at', 'likes_count', 'comments_count', 'imageUrl', 'user'),
+                         'content')},
+    dates=('created_at',),
+)
+
+JOB_FIELDS = FieldSet(
+    Job,
+    columns=('id', 'title', 'company', 'location', 'description', 'requirements', 'salary_range', 'job_type',
+             'created_at', 'expires_at'),
+    computed={'posted_by': ()},
+    required=('id', 'posted_by'),
+    presets={'summary': (('id', 'title', 'company', 'location', 'salary_range', 'job_type', 'created_at',
+                          'expires_at', 'posted_by'), 'description')},
+    dates=('created_at', 'expires_at'),
+)
@@ -0,0 +1,639 @@
+#!/usr/bin/env python3
+"""
+End-to-end HTTP benchmark with regression baselines.
+
+Boots the app from ``create_app`` against a local database seeded by the
+synthetic data generator (``flask data generate``), then drives the main
+endpoints with a concurrent load generator and records p50/p95/p99 latency
+and throughput per scenario:
+
+    # in-process (Flask test client, one per worker thread)
+    python benchmarks/http_bench.py --output results.json
+
+    # real server: spawn gunicorn with 4 workers on the same database
+    python benchmarks/http_bench.py --gunicorn 4 --output results.json
+
+    # an already running server seeded from the same database
+    python benchmarks/http_bench.py --url http://127.0.0.1:5000
+
+    # record / enforce a baseline (exit status 1 on regression)
+    python benchmarks/http_bench.py --save-baseline benchmarks/baselines/http.json
+    python benchmarks/http_bench.py --baseline benchmarks/baselines/http.json --tolerance 0.2
+
+    # soak: mixed traffic for hours, sampling RSS, open fds, pool checkouts
+    # and (in-process) tracemalloc; exit status 1 on monotonic growth
+    python benchmarks/http_bench.py --soak 4 --sample-interval 60 --output soak.json
+    python benchmarks/http_bench.py --soak 4 --gunicorn 2
+
+A scenario regresses when its p95 or p99 grows, or its throughput drops, by
+more than the tolerance. Baselines only mean something on the machine and
+database they were recorded on.
+"""
+import argparse
+import atexit
+import http.client
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import uuid
+from urllib.parse import urlsplit
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+APP_DIR = os.path.abspath(BACKEND_DIR) + os.sep
+sys.path.insert(0, BACKEND_DIR)
+
+SEARCH_WORDS = ('python', 'launch', 'hiring', 'remote', 'data', 'career')
+TAG_WORDS = ('python', 'hiring', 'career', 'remote', 'data')
+
+# name -> (method, path template, body kind)
+SCENARIOS = {
+    'feed': ('GET', '/feed?per_page=20', None),
+    'posts_search': ('GET', '/posts?search={search}&per_page=20', None),
+    'posts_tags': ('GET', '/posts?tags={tag}&per_page=20', None),
+    'jobs': ('GET', '/jobs?per_page=20', None),
+    'conversations': ('GET', '/messages/conversations?limit=50', None),
+    'profile': ('GET', '/api/profile', None),
+    'profile_image_upload': ('POST', '/api/profile/image', 'image'),
+}
+
+
+def percentile(ordered, pct):
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def png_bytes(size=256):
+    from PIL import Image
+    buffer = io.BytesIO()
+    Image.new('RGB', (size, size), (90, 140, 200)).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def multipart(field, filename, payload, content_type='image/png'):
+    boundary = uuid.uuid4().hex
+    body = (f'--{boundary}\r\nContent-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+            f'Content-Type: {content_type}\r\n\r\n').encode() + payload + f'\r\n--{boundary}--\r\n'.encode()
+    return body, f'multipart/form-data; boundary={boundary}'
+
+
+class InProcessClient:
+    """Flask test client; requests run in the calling thread"""
+
+    def __init__(self, app):
+        self._client = app.test_client()
+
+    def request(self, method, path, headers, body=None, content_type=None):
+        response = self._client.open(path, method=method, headers=headers, data=body, content_type=content_type)
+        response.get_data()
+        return response.status_code
+
+
+class HTTPClient:
+    """Keep-alive HTTP/1.1 connection to a running server"""
+
+    def __init__(self, base_url):
+        parts = urlsplit(base_url)
+        self._host, self._port = parts.hostname, parts.port or 80
+        self._conn = None
+
+    def request(self, method, path, headers, body=None, content_type=None):
+        if content_type:
+            headers = dict(headers, **{'Content-Type': content_type})
+        for attempt in (1, 2):
+            if self._conn is None:
+                self._conn = http.client.HTTPConnection(self._host, self._port, timeout=60)
+            try:
+                self._conn.request(method, path, body=body, headers=headers)
+                response = self._conn.getresponse()
+                response.read()
+                return response.status
+            except (http.client.HTTPException, OSError):
+                self._conn.close()
+                self._conn = None
+                if attempt == 2:
+                    raise
+
+
+class Target:
+    """
+    Where requests go, plus the bearer tokens of the users driving them.
+    app is set for in-process targets, server_pid for a spawned gunicorn.
+    """
+
+    def __init__(self, make_client, tokens, app=None, server_pid=None):
+        self.make_client = make_client
+        self.tokens = tokens
+        self.app = app
+        self.server_pid = server_pid
+
+
+def prepare_database(args):
+    """Create the tables and seed synthetic data unless the database already has users"""
+    os.environ['DATABASE_URL'] = args.database_url
+    # Size the connection pool for the worker threads (config.engine_options)
+    os.environ.setdefault('WEB_THREADS', str(args.concurrency))
+    if 'UPLOAD_FOLDER' not in os.environ:
+        # Inherited by --gunicorn workers, which are stopped before exit
+        os.environ['UPLOAD_FOLDER'] = tempfile.mkdtemp(prefix='http_bench_uploads_')
+        atexit.register(shutil.rmtree, os.environ['UPLOAD_FOLDER'], ignore_errors=True)
+    from main import app, create_app
+    from models import db
+    from models.user import User
+    import models.post, models.job, models.message  # noqa: F401,E401 (register every table)
+    from services.synthetic_data import SyntheticDataset
+
+    create_app()
+    with app.app_context():
+        db.create_all()
+        if args.reseed or not User.query.first():
+            started = time.perf_counter()
+            stats = SyntheticDataset(seed=args.seed, batch_size=5000).generate(
+                users=args.users, posts=args.users * 5, comments=args.users * 20, likes=args.users * 100,
+                jobs=max(1, args.users // 10), applications=args.users * 2,
+                conversations=args.users * 3, messages=args.users * 90,
+            )
+            print(f'seeded {sum(s.rows for s in stats)} rows in {time.perf_counter() - started:.1f}s')
+        # The most active synthetic users (lowest ids) drive the load
+        emails = [email for (email,) in User.query.with_entities(User.email)
+                  .filter(User.email.like('synthetic%')).order_by(User.id).limit(args.clients)]
+    return app, emails
+
+
+def in_process_target(app, emails):
+    from flask_jwt_extended import create_access_token
+    with app.app_context():
+        tokens = [create_access_token(identity=email) for email in emails]
+    return Target(lambda: InProcessClient(app), tokens, app=app)
+
+
+def http_target(base_url, emails):
+    """Log in as each user over HTTP; synthetic users share one password"""
+    from services.synthetic_data import PASSWORD
+    parts = urlsplit(base_url)
+    tokens = []
+    for email in emails:
+        conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=60)
+        conn.request('POST', '/auth/login', body=json.dumps({'email': email, 'password': PASSWORD}),
+                     headers={'Content-Type': 'application/json'})
+        response = conn.getresponse()
+        payload = json.loads(response.read() or b'{}')
+        conn.close()
+        if response.status != 200:
+            raise SystemExit(f'login failed for {email}: {response.status} {payload}')
+        tokens.append(payload['access_token'])
+    return Target(lambda: HTTPClient(base_url), tokens)
+
+
+def start_gunicorn(workers, database_url):
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    env = dict(os.environ, DATABASE_URL=database_url, WEB_CONCURRENCY=str(workers), WEB_THREADS='4')
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-w', str(workers), '--threads', '4', '-b', f'127.0.0.1:{port}',
+         '--log-level', 'warning', 'main:create_app()'],
+        cwd=BACKEND_DIR, env=env,
+    )
+    base_url = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit('gunicorn exited during startup (is it installed? pip install gunicorn)')
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return process, base_url
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise SystemExit('gunicorn did not start listening within 30s')
+
+
+def build_request(scenario, rng, image):
+    method, template, body_kind = SCENARIOS[scenario]
+    path = template.format(search=rng.choice(SEARCH_WORDS), tag=rng.choice(TAG_WORDS))
+    if body_kind == 'image':
+        body, content_type = multipart('image', 'bench.png', image)
+        return method, path, body, content_type
+    return method, path, None, None
+
+
+class Recorder:
+    """Latencies and error counts per scenario, drained by the caller"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = {}
+
+    def record(self, name, elapsed_ms, failed):
+        with self._lock:
+            latencies, errors = self._data.get(name, ([], 0))
+            latencies.append(elapsed_ms)
+            self._data[name] = (latencies, errors + failed)
+
+    def drain(self):
+        with self._lock:
+            data, self._data = self._data, {}
+        return {name: {'latencies': latencies, 'errors': errors} for name, (latencies, errors) in data.items()}
+
+
+def run_load(target, scenarios, concurrency, duration, warmup, seed, on_tick=None, tick_seconds=None):
+    """
+    Run concurrency worker threads for duration seconds, each picking
+    requests from scenarios (a list of names, repeated for weighting).
+    With on_tick, it is called with the Recorder every tick_seconds while
+    the load runs. Returns what is left in the Recorder plus the wall time.
+    """
+    image = png_bytes()
+    recorder = Recorder()
+    stop_at = [None]
+
+    def worker(index):
+        rng = random.Random(seed + index)
+        client = target.make_client()
+        headers = {'Authorization': f'Bearer {target.tokens[index % len(target.tokens)]}'}
+        for _ in range(warmup):
+            name = rng.choice(scenarios)
+            method, path, body, content_type = build_request(name, rng, image)
+            client.request(method, path, headers, body, content_type)
+        ready.wait()
+        go.wait()
+        while time.perf_counter() < stop_at[0]:
+            name = rng.choice(scenarios)
+            method, path, body, content_type = build_request(name, rng, image)
+            started = time.perf_counter()
+            try:
+                status = client.request(method, path, headers, body, content_type)
+            except Exception:
+                status = 599
+            recorder.record(name, (time.perf_counter() - started) * 1000, status >= 400)
+
+    ready, go = threading.Barrier(concurrency + 1), threading.Event()
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    ready.wait()
+    started = time.perf_counter()
+    stop_at[0] = started + duration
+    go.set()
+    if on_tick:
+        next_tick = started + tick_seconds
+        while next_tick <= stop_at[0]:
+            time.sleep(max(0.0, next_tick - time.perf_counter()))
+            on_tick(recorder)
+            while next_tick <= time.perf_counter():  # skip ticks missed while sampling
+                next_tick += tick_seconds
+    for thread in threads:
+        thread.join()
+    return recorder.drain(), time.perf_counter() - started
+
+
+def summarize(results, wall_time):
+    summary = {}
+    for name, data in sorted(results.items()):
+        ordered = sorted(data['latencies'])
+        summary[name] = {
+            'requests': len(ordered),
+            'errors': data['errors'],
+            'throughput_rps': round(len(ordered) / wall_time, 2) if wall_time else 0.0,
+            'p50_ms': round(percentile(ordered, 50), 2) if ordered else None,
+            'p95_ms': round(percentile(ordered, 95), 2) if ordered else None,
+            'p99_ms': round(percentile(ordered, 99), 2) if ordered else None,
+        }
+    return summary
+
+
+def compare(summary, baseline, tolerance):
+    """Return a list of regression messages against baseline['scenarios']"""
+    regressions = []
+    for name, base in baseline.get('scenarios', {}).items():
+        current = summary.get(name)
+        if current is None:
+            continue
+        for metric in ('p95_ms', 'p99_ms'):
+            if base.get(metric) and current.get(metric) and current[metric] > base[metric] * (1 + tolerance):
+                regressions.append(f'{name}: {metric} {current[metric]} > baseline {base[metric]} (+{tolerance:.0%})')
+        if base.get('throughput_rps') and current['throughput_rps'] < base['throughput_rps'] * (1 - tolerance):
+            regressions.append(f'{name}: throughput {current["throughput_rps"]} < baseline {base["throughput_rps"]} '
+                               f'(-{tolerance:.0%})')
+        if current['errors'] > base.get('errors', 0):
+            regressions.append(f'{name}: {current["errors"]} errors (baseline {base.get("errors", 0)})')
+    return regressions
+
+
+def print_table(summary):
+    print(f'{"scenario":22} {"reqs":>7} {"err":>5} {"rps":>9} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8}')
+    for name, row in summary.items():
+        print(f'{name:22} {row["requests"]:7} {row["errors"]:5} {row["throughput_rps"]:9.1f} '
+              f'{row["p50_ms"] or 0:8.1f} {row["p95_ms"] or 0:8.1f} {row["p99_ms"] or 0:8.1f}')
+
+
+# Request mix for soak runs: mostly reads, with enough uploads to exercise the Pillow paths
+SOAK_MIX = {'feed': 4, 'posts_search': 2, 'posts_tags': 2, 'jobs': 3, 'conversations': 3, 'profile': 3,
+            'profile_image_upload': 1}
+# Minimum end-to-end growth before a monotonic trend is reported
+GROWTH_THRESHOLDS = {'rss_bytes': 8 * 1024 * 1024, 'fds': 2, 'pool_checked_out': 1, 'traced_bytes': 4 * 1024 * 1024}
+TOP_ALLOCATORS = 25
+# Samples (after warmup) needed before a trend is reported at all
+MIN_TREND_SAMPLES = 8
+
+
+def read_rss(pid):
+    with open(f'/proc/{pid}/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) * 1024
+    return None
+
+
+def count_fds(pid):
+    return len(os.listdir(f'/proc/{pid}/fd'))
+
+
+def child_pids(pid):
+    try:
+        with open(f'/proc/{pid}/task/{pid}/children') as f:
+            return [int(child) for child in f.read().split()]
+    except OSError:
+        return []
+
+
+class SoakSampler:
+    """
+    Samples RSS and open file descriptors of the serving processes (this
+    process in-process, the gunicorn workers otherwise), checked out
+    SQLAlchemy pool connections and, in-process, tracemalloc's top
+    allocation sites.
+    """
+
+    def __init__(self, target, trace_frames):
+        self.target = target
+        self.started = time.monotonic()
+        self.samples = []
+        self.site_series = {}  # 'file:line' -> {sample index: bytes}
+        self.first_snapshot = self.last_snapshot = None
+        self.tracing = bool(target.app and trace_frames)
+        if self.tracing:
+            tracemalloc.start(trace_frames)
+
+    def _pids(self):
+        if self.target.server_pid:
+            return child_pids(self.target.server_pid)
+        return [os.getpid()]
+
+    def _pool_checked_out(self):
+        if not self.target.app:
+            return None
+        from models import db
+        with self.target.app.app_context():
+            checkedout = getattr(db.engine.pool, 'checkedout', None)
+            return checkedout() if checkedout else None
+
+    def _snapshot(self):
+        ignored = [tracemalloc.Filter(False, pattern) for pattern in
+                   (tracemalloc.__file__, __file__, threading.__file__, '<frozen importlib._bootstrap*>', '<unknown>')]
+        return tracemalloc.take_snapshot().filter_traces(ignored)
+
+    def sample(self, recorder=None):
+        pids = self._pids()
+        sample = {
+            'elapsed_s': round(time.monotonic() - self.started, 1),
+            'processes': len(pids),
+            'rss_bytes': sum(read_rss(pid) or 0 for pid in pids),
+            'fds': sum(count_fds(pid) for pid in pids),
+            'pool_checked_out': self._pool_checked_out(),
+            'traced_bytes': None,
+        }
+        if self.tracing:
+            snapshot = self._snapshot()
+            sample['traced_bytes'] = tracemalloc.get_traced_memory()[0]
+            index = len(self.samples)
+            for stat in snapshot.statistics('lineno')[:TOP_ALLOCATORS]:
+                frame = stat.traceback[-1]
+                self.site_series.setdefault(f'{frame.filename}:{frame.lineno}', {})[index] = stat.size
+            if self.first_snapshot is None:
+                self.first_snapshot = snapshot
+            self.last_snapshot = snapshot
+        if recorder is not None:
+            interval = recorder.drain().values()
+            latencies = sorted(latency for data in interval for latency in data['latencies'])
+            sample['requests'] = len(latencies)
+            sample['errors'] = sum(data['errors'] for data in interval)
+            sample['p95_ms'] = round(percentile(latencies, 95), 2) if latencies else None
+        self.samples.append(sample)
+        print(' '.join(f'{key}={value}' for key, value in sample.items()), flush=True)
+
+    def allocation_growth(self, limit=10):
+        """Call sites whose allocations grew most between the first and last snapshot, with tracebacks"""
+        if not (self.first_snapshot and self.last_snapshot):
+            return []
+        sites = []
+        for stat in self.last_snapshot.compare_to(self.first_snapshot, 'traceback')[:limit]:
+            if stat.size_diff <= 0:
+                continue
+            frame = stat.traceback[-1]
+            # The innermost frame in our own code is usually the one to fix
+            app_frame = next((f for f in reversed(stat.traceback) if f.filename.startswith(APP_DIR)
+                              and not f.filename.startswith(os.path.dirname(os.path.abspath(__file__)))), None)
+            series = self.site_series.get(f'{frame.filename}:{frame.lineno}', {})
+            sites.append({
+                'site': f'{frame.filename}:{frame.lineno}',
+                'app_site': f'{os.path.relpath(app_frame.filename, APP_DIR)}:{app_frame.lineno}' if app_frame else None,
+                'size_diff_bytes': stat.size_diff,
+                'count_diff': stat.count_diff,
+                'monotonic': is_monotonic_growth([series.get(i, 0) for i in range(1, len(self.samples))], 1),
+                'traceback': stat.traceback.format(most_recent_first=True),
+            })
+        return sites
+
+
+def is_monotonic_growth(values, threshold, warmup=0.2):
+    """
+    True when the lower envelope of values keeps rising: after dropping the
+    first warmup fraction, the minimum of each quarter is at least the
+    previous quarter's and the last exceeds the first by threshold. Using
+    minima keeps in-flight requests and GC timing from hiding (or faking)
+    a trend.
+    """
+    values = [value for value in values[int(len(values) * warmup):] if value is not None]
+    if len(values) < MIN_TREND_SAMPLES:
+        return False
+    size = len(values) / 4
+    minima = [min(values[int(i * size):int((i + 1) * size)]) for i in range(4)]
+    return all(b >= a for a, b in zip(minima, minima[1:])) and minima[-1] - minima[0] >= threshold
+
+
+def soak_findings(sampler, hours):
+    """Metrics that grew monotonically; the sample taken before any load is left out"""
+    findings = []
+    for key, threshold in GROWTH_THRESHOLDS.items():
+        values = [sample[key] for sample in sampler.samples[1:]]
+        if is_monotonic_growth(values, threshold):
+            first, last = values[int(len(values) * 0.2)], values[-1]
+            findings.append({'metric': key, 'first': first, 'last': last,
+                             'growth_per_hour': round((last - first) / max(hours, 1e-9), 1)})
+    return findings
+
+
+def run_soak(args, target):
+    """Mixed traffic for args.soak hours, sampling every args.sample_interval seconds"""
+    scenarios = [name for name, weight in SOAK_MIX.items() for _ in range(weight)]
+    sampler = SoakSampler(target, args.trace_frames)
+    sampler.sample()
+    duration = args.soak * 3600
+    results, wall_time = run_load(target, scenarios, args.concurrency, duration, args.warmup, args.seed,
+                                  on_tick=sampler.sample, tick_seconds=args.sample_interval)
+    sampler.sample()
+    findings = soak_findings(sampler, wall_time / 3600)
+    allocators = sampler.allocation_growth()
+    report = {
+        'meta': {
+            'mode': 'gunicorn' if args.gunicorn else 'in-process',
+            'workers': args.gunicorn, 'concurrency': args.concurrency, 'hours': args.soak,
+            'sample_interval_s': args.sample_interval, 'trace_frames': args.trace_frames if sampler.tracing else 0,
+            'python': platform.python_version(),
+            'recorded_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        },
+        'samples': sampler.samples,
+        'growth': findings,
+        'allocators': allocators,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if sampler.tracing:
+        print('top allocation growth since the first sample:')
+        for site in allocators:
+            print(f'  {site["size_diff_bytes"] / 1024:+10.1f} KiB {site["count_diff"]:+8} blocks  '
+                  f'{"monotonic " if site["monotonic"] else ""}{site["site"]}'
+                  + (f' (via {site["app_site"]})' if site['app_site'] else ''))
+    elif target.server_pid:
+        print('tracemalloc and pool checkouts are only sampled in-process; rerun without --gunicorn to locate allocations')
+    if findings:
+        print('MONOTONIC GROWTH:')
+        for finding in findings:
+            print(f'  {finding["metric"]}: {finding["first"]} -> {finding["last"]} '
+                  f'({finding["growth_per_hour"]:+}/hour)')
+        for site in allocators:
+            if site['monotonic']:
+                print(f'  growing allocator {site["site"]}:')
+                for line in site['traceback']:
+                    print(f'    {line}')
+        sys.exit(1)
+    if len(sampler.samples) - 1 < MIN_TREND_SAMPLES / 0.8:
+        print(f'only {len(sampler.samples)} samples; run longer or lower --sample-interval to detect trends')
+    else:
+        print(f'no monotonic growth over {len(sampler.samples)} samples')
+
+
+def add_common_arguments(parser):
+    parser.add_argument('--database-url', default='sqlite:///' + os.path.join(tempfile.gettempdir(), 'http_bench.db'),
+                        help='Seeded automatically when it has no users (default: a scratch SQLite file).')
+    parser.add_argument('--users', type=int, default=2000, help='Synthetic users to seed.')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--reseed', action='store_true', help='Seed even if the database already has users.')
+    parser.add_argument('--clients', type=int, default=50, help='Distinct users whose tokens drive the load.')
+    parser.add_argument('--concurrency', type=int, default=8)
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument('--url', help='Drive an already running server instead of the in-process app.')
+    target.add_argument('--gunicorn', type=int, metavar='WORKERS', help='Spawn gunicorn with this many workers.')
+
+
+def open_target(args):
+    """Seed the database and return (target, cleanup callable)"""
+    app, emails = prepare_database(args)
+    if args.gunicorn:
+        process, base_url = start_gunicorn(args.gunicorn, args.database_url)
+        target = http_target(base_url, emails)
+        target.server_pid = process.pid
+        return target, process.terminate
+    if args.url:
+        return http_target(args.url, emails), lambda: None
+    return in_process_target(app, emails), lambda: None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_common_arguments(parser)
+    parser.add_argument('--duration', type=float, default=10.0, help='Seconds of load per scenario.')
+    parser.add_argument('--warmup', type=int, default=5, help='Untimed requests per worker before each scenario.')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help='Comma separated subset to run.')
+    parser.add_argument('--output', help='Write results as JSON here.')
+    parser.add_argument('--baseline', help='Compare against this results file; exit 1 on regression.')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed relative slowdown (default 0.2).')
+    parser.add_argument('--save-baseline', help='Write the results as the new baseline here.')
+    parser.add_argument('--soak', type=float, metavar='HOURS',
+                        help='Replay mixed traffic for this long and report resource growth instead.')
+    parser.add_argument('--sample-interval', type=float, default=60.0, help='Seconds between soak samples.')
+    parser.add_argument('--trace-frames', type=int, default=5,
+                        help='tracemalloc traceback depth for in-process soaks (0 disables tracing).')
+    args = parser.parse_args()
+
+    if args.soak:
+        if args.url:
+            parser.error('--soak samples the serving processes; use in-process or --gunicorn')
+        target, cleanup = open_target(args)
+        try:
+            run_soak(args, target)
+        finally:
+            cleanup()
+        return
+
+    names = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = set(names) - set(SCENARIOS)
+    if unknown:
+        parser.error(f'unknown scenarios: {", ".join(sorted(unknown))}')
+
+    target, cleanup = open_target(args)
+    try:
+        summary = {}
+        for name in names:
+            results, wall_time = run_load(target, [name], args.concurrency, args.duration, args.warmup, args.seed)
+            summary.update(summarize(results, wall_time))
+    finally:
+        cleanup()
+
+    report = {
+        'meta': {
+            'mode': 'gunicorn' if args.gunicorn else ('url' if args.url else 'in-process'),
+            'workers': args.gunicorn, 'concurrency': args.concurrency, 'duration_s': args.duration,
+            'users': args.users, 'seed': args.seed, 'python': platform.python_version(),
+            'recorded_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        },
+        'scenarios': summary,
+    }
+    print_table(summary)
+    for path in (args.output, args.save_baseline):
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            with open(path, 'w') as f:
+                json.dump(report, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        for key in ('mode', 'workers', 'concurrency', 'users'):
+            if baseline.get('meta', {}).get(key) != report['meta'][key]:
+                print(f'warning: baseline was recorded with {key}={baseline["meta"].get(key)}, '
+                      f'this run used {report["meta"][key]}')
+        regressions = compare(summary, baseline, args.tolerance)
+        if regressions:
+            print('REGRESSIONS:')
+            for message in regressions:
+                print(f'  {message}')
+            sys.exit(1)
+        print(f'no regressions beyond {args.tolerance:.0%} of {args.baseline}')
+
+
+if __name__ == '__main__':
+    main()
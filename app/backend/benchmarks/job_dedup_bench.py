@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Benchmark the MinHash/LSH near-duplicate job index.
+
+Builds the index over synthetic job texts (a share of them lightly edited
+reposts of earlier ones), then times single lookups and checks how many
+reposts are found. No database is needed.
+
+    python benchmarks/job_dedup_bench.py --jobs 50000 --queries 2000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from services.job_dedup import JobDuplicateIndex, minhash  # noqa: E402
+
+WORDS = [f'term{i}' for i in range(5000)] + ['python', 'flask', 'sql', 'team', 'remote', 'senior', 'api']
+
+
+def make_text(rng, length):
+    return ' '.join(rng.choice(WORDS) for _ in range(length))
+
+
+def repost(rng, text, edit_rate):
+    words = text.split()
+    for i in range(len(words)):
+        if rng.random() < edit_rate:
+            words[i] = rng.choice(WORDS)
+    return ' '.join(words)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--jobs', type=int, default=20000)
+    parser.add_argument('--queries', type=int, default=1000)
+    parser.add_argument('--repost-share', type=float, default=0.1)
+    parser.add_argument('--edit-rate', type=float, default=0.03, help='Share of words changed in a repost')
+    parser.add_argument('--threshold', type=float, default=0.7)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    texts, reposts = [], []
+    for job_id in range(1, args.jobs + 1):
+        if texts and rng.random() < args.repost_share:
+            original = rng.randrange(len(texts))
+            texts.append(repost(rng, texts[original], args.edit_rate))
+            reposts.append((job_id, original + 1))
+        else:
+            texts.append(make_text(rng, rng.randint(80, 250)))
+
+    started = time.perf_counter()
+    signatures = [minhash(text) for text in texts]
+    hashed = time.perf_counter()
+    index = JobDuplicateIndex()
+    for job_id, signature in enumerate(signatures, 1):
+        index.add(job_id, signature)
+    built = time.perf_counter()
+    print(f'signatures: {args.jobs} jobs in {hashed - started:.2f}s '
+          f'({(hashed - started) / args.jobs * 1e6:.0f} us/job)')
+    print(f'index build: {built - hashed:.2f}s ({(built - hashed) / args.jobs * 1e6:.1f} us/job)')
+
+    sample = rng.sample(reposts, min(args.queries, len(reposts)))
+    timings, found = [], 0
+    for job_id, original_id in sample:
+        signature = signatures[job_id - 1]
+        start = time.perf_counter()
+        matches = index.query(signature, threshold=args.threshold, exclude_id=job_id)
+        timings.append(time.perf_counter() - start)
+        found += any(match_id == original_id for match_id, _ in matches)
+    if timings:
+        timings.sort()
+        p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+        print(f'lookup: p50 {statistics.median(timings) * 1e3:.3f} ms, p99 {p99 * 1e3:.3f} ms '
+              f'over {len(timings)} queries')
+        print(f'repost recall at threshold {args.threshold}: {found / len(sample):.1%}')
+
+
+if __name__ == '__main__':
+    main()
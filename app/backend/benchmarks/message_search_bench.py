@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Benchmark GET /messages/search for a user with a very large message history.
+
+Bulk-loads synthetic conversations into a scratch database (Zipf-distributed
+vocabulary, so some terms appear in a large share of messages and most are
+rare), indexes the benchmarked user's postings, then times first pages and
+cursor follow-ups through the real endpoint, hydration included.
+
+    python benchmarks/message_search_bench.py --messages 1000000
+
+Never point --database-url at a real database: the tables are dropped first.
+"""
+import argparse
+import atexit
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+VOCABULARY_SIZE = 20000
+LOAD_BATCH_SIZE = 20000
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=1000000)
+    parser.add_argument('--conversations', type=int, default=500)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--database-url', default='sqlite:///' + os.path.join(tempfile.gettempdir(), 'message_search_bench.db'))
+    parser.add_argument('--seed', type=int, default=11)
+    args = parser.parse_args()
+
+    os.environ['DATABASE_URL'] = args.database_url
+    os.environ['UPLOAD_FOLDER'] = tempfile.mkdtemp(prefix='message_search_bench_uploads_')
+    atexit.register(shutil.rmtree, os.environ['UPLOAD_FOLDER'], ignore_errors=True)
+    from flask_jwt_extended import create_access_token
+    from main import app, create_app
+    from models import db
+    from models.user import User
+    from models.message import Conversation, Message, MessageSearchTerm
+    from services.message_search import posting_rows
+
+    create_app()
+    rng = random.Random(args.seed)
+    words = [f'w{i}' for i in range(VOCABULARY_SIZE)]
+    weights = [1.0 / (rank + 1) for rank in range(VOCABULARY_SIZE)]
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+
+        started = time.perf_counter()
+        users = [{'id': i, 'username': f'bench{i}', 'name': f'Bench {i}', 'email': f'bench{i}@example.com', 'password_hash': '-'}
+                 for i in range(1, args.conversations + 2)]
+        db.session.execute(User.__table__.insert(), users)
+        db.session.execute(Conversation.__table__.insert(), [
+            {'id': i, 'user1_id': 1, 'user2_id': i + 1} for i in range(1, args.conversations + 1)
+        ])
+        base = datetime.utcnow() - timedelta(days=365)
+        for start in range(1, args.messages + 1, LOAD_BATCH_SIZE):
+            ids = range(start, min(start + LOAD_BATCH_SIZE, args.messages + 1))
+            messages, postings = [], []
+            for message_id in ids:
+                content = ' '.join(rng.choices(words, weights, k=rng.randint(5, 30)))
+                conversation_id = rng.randint(1, args.conversations)
+                messages.append({
+                    'id': message_id, 'conversation_id': conversation_id,
+                    'sender_id': rng.choice((1, conversation_id + 1)), 'content': content,
+                    'created_at': base + timedelta(seconds=message_id * 30), 'is_read': True,
+                })
+                # Only the benchmarked user's postings; the other side's rows never affect its queries
+                postings.extend(posting_rows(message_id, content, (1,)))
+            # Key order keeps the posting index inserts local
+            postings.sort(key=lambda row: (row['term'], row['message_id']))
+            db.session.execute(Message.__table__.insert(), messages)
+            db.session.execute(MessageSearchTerm.__table__.insert(), postings)
+            db.session.commit()
+        loaded = time.perf_counter() - started
+        total_postings = MessageSearchTerm.query.count()
+        print(f'loaded {args.messages} messages ({total_postings} postings) in {loaded:.1f}s')
+
+        token = create_access_token(identity='bench1@example.com')
+
+    client = app.test_client()
+    headers = {'Authorization': f'Bearer {token}'}
+    # Very common, mid-frequency and rare terms, alone and combined
+    shapes = {
+        'common term': lambda: words[rng.randint(0, 9)],
+        'mid term': lambda: words[rng.randint(100, 999)],
+        'rare term': lambda: words[rng.randint(5000, VOCABULARY_SIZE - 1)],
+        'two terms': lambda: f'{words[rng.randint(0, 49)]} {words[rng.randint(50, 999)]}',
+        'three terms': lambda: ' '.join(words[rng.randint(0, 199)] for _ in range(3)),
+    }
+    for name, make_query in shapes.items():
+        first_page, next_page, hits = [], [], 0
+        for _ in range(args.queries):
+            query = make_query()
+            started = time.perf_counter()
+            response = client.get('/messages/search', query_string={'q': query}, headers=headers)
+            first_page.append((time.perf_counter() - started) * 1000)
+            body = response.get_json()
+            hits += len(body['results'])
+            if body['next_cursor']:
+                started = time.perf_counter()
+                client.get('/messages/search', query_string={'q': query, 'cursor': body['next_cursor']},
+                           headers=headers)
+                next_page.append((time.perf_counter() - started) * 1000)
+        line = (f'{name:12} first page p50 {statistics.median(first_page):6.1f} ms  '
+                f'p95 {percentile(first_page, 95):6.1f} ms  p99 {percentile(first_page, 99):6.1f} ms  '
+                f'avg hits {hits / args.queries:.1f}')
+        if next_page:
+            line += f'  | next page p95 {percentile(next_page, 95):6.1f} ms'
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
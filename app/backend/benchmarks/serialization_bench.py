@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark per-item serialisation cost of posts, jobs and profiles.
+
+Seeds a scratch database, loads rows the way the list endpoints do (authors
+and profiles batched), then times turning each row into a dict with the
+hand-built code the handlers used before ``api.serializers`` (kept here as
+the baseline) and with the compiled field plans, and encoding the resulting
+pages with the stdlib JSON provider and with ``FastJSONProvider`` (orjson,
+when installed). Costs are microseconds per item, best of --repeat runs.
+
+    python benchmarks/serialization_bench.py --items 2000 --repeat 7
+
+Never point --database-url at a real database: the tables are dropped first.
+"""
+import argparse
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+
+def legacy_post(post, user, profile, host_url):
+    media_url = post.media_url
+    if media_url:
+        media_url = host_url.rstrip('/') + media_url
+    return {
+        'id': post.id,
+        'content': post.content,
+        'media_url': media_url,
+        'imageUrl': media_url,
+        'user_id': post.user_id,
+        'created_at': post.created_at.isoformat(),
+        'likes_count': post.likes_count if hasattr(post, 'likes_count') else 0,
+        'comments_count': post.comments_count if hasattr(post, 'comments_count') else 0,
+        'user': {
+            'id': user.id,
+            'name': user.name,
+            'username': user.username,
+            'avatar_url': profile.avatar_url if profile else None,
+            'title': profile.title if profile else None,
+            'location': profile.location if profile else None
+        } if user else None
+    }
+
+
+def legacy_job(job, posted_by_user):
+    return {
+        'id': job.id,
+        'title': job.title,
+        'company': job.company,
+        'location': job.location,
+        'description': job.description,
+        'requirements': job.requirements,
+        'salary_range': job.salary_range,
+        'job_type': job.job_type,
+        'created_at': job.created_at.isoformat(),
+        'expires_at': job.expires_at.isoformat() if job.expires_at else None,
+        'posted_by': {
+            'id': posted_by_user.id,
+            'name': posted_by_user.name,
+            'username': posted_by_user.username
+        } if posted_by_user else None
+    }
+
+
+def legacy_profile(profile):
+    return {
+        'id': profile.id,
+        'user_id': profile.user_id,
+        'bio': profile.bio,
+        'location': profile.location,
+        'title': profile.title,
+        'avatar_url': profile.avatar_url,
+        'cover_url': profile.cover_url,
+        'website': profile.website,
+        'linkedin': profile.linkedin,
+        'github': profile.github,
+        'twitter': profile.twitter,
+        'phone': profile.phone,
+        'created_at': profile.created_at.isoformat() if profile.created_at else None
+    }
+
+
+def per_item_us(fn, items, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best / items * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--items', type=int, default=2000, help='Posts and jobs to serialise (profiles: one per user)')
+    parser.add_argument('--repeat', type=int, default=7)
+    parser.add_argument('--database-url', default='sqlite:///' + os.path.join(tempfile.gettempdir(), 'serialization_bench.db'))
+    parser.add_argument('--seed', type=int, default=5)
+    args = parser.parse_args()
+
+    os.environ['DATABASE_URL'] = args.database_url
+    os.environ['UPLOAD_FOLDER'] = tempfile.mkdtemp(prefix='serialization_bench_uploads_')
+    atexit.register(shutil.rmtree, os.environ['UPLOAD_FOLDER'], ignore_errors=True)
+    from flask.json.provider import DefaultJSONProvider
+    from main import app, create_app
+    from models import db
+    from models.job import Job
+    from models.post import Post
+    from models.profile import Profile
+    from models.user import User
+    from api.serializers import serialize_job, serialize_post, serialize_profile
+    from services.synthetic_data import SyntheticDataset
+    from utils import json_provider
+
+    create_app()
+    host_url = 'http://localhost:5000/'
+    media_base = host_url.rstrip('/')
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        users = max(10, args.items // 10)
+        SyntheticDataset(seed=args.seed).generate(users=users, posts=args.items, comments=0, likes=0, jobs=args.items,
+                                                  applications=0, conversations=0, messages=0)
+        posts = Post.query.all()
+        jobs = Job.query.all()
+        profiles = Profile.query.all()
+        authors = {user.id: (user, profile) for user, profile in
+                   db.session.query(User, Profile).outerjoin(Profile, Profile.user_id == User.id)}
+        post_rows = [(post, *authors.get(post.user_id, (None, None))) for post in posts]
+        job_rows = [(job, authors.get(job.posted_by, (None, None))[0]) for job in jobs]
+
+        cases = [
+            ('post', len(post_rows),
+             lambda: [legacy_post(post, user, profile, host_url) for post, user, profile in post_rows],
+             lambda: [serialize_post(post, user, profile, media_base, media_key=True) for post, user, profile in post_rows]),
+            ('job', len(job_rows),
+             lambda: [legacy_job(job, user) for job, user in job_rows],
+             lambda: [serialize_job(job, user) for job, user in job_rows]),
+            ('profile', len(profiles),
+             lambda: [legacy_profile(profile) for profile in profiles],
+             lambda: [serialize_profile(profile) for profile in profiles]),
+        ]
+        print(f'{"build dicts":14} {"before us/item":>15} {"after us/item":>14} {"speedup":>8}')
+        pages = {}
+        for name, count, before, after in cases:
+            assert before() == after(), f'{name}: field plan output differs from the hand-built dicts'
+            pages[name] = after()
+            old, new = per_item_us(before, count, args.repeat), per_item_us(after, count, args.repeat)
+            print(f'{name:14} {old:15.2f} {new:14.2f} {old / new:7.1f}x')
+
+        stdlib, fast = DefaultJSONProvider(app), json_provider.FastJSONProvider(app)
+        encoder = 'orjson' if json_provider.orjson is not None else 'stdlib (orjson not installed)'
+        print(f'\n{"encode page":14} {"stdlib us/item":>15} {"fast us/item":>14} {"speedup":>8}   fast = {encoder}')
+        for name, page in pages.items():
+            payload = {'items': page, 'total': len(page)}
+            old = per_item_us(lambda: stdlib.response(payload), len(page), args.repeat)
+            new = per_item_us(lambda: fast.response(payload), len(page), args.repeat)
+            print(f'{name:14} {old:15.2f} {new:14.2f} {old / new:7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,255 @@
+"""
+Flask CLI commands for scheduled maintenance and batch reports.
+
+Run them through the application factory, e.g. from cron:
+
+    */15 * * * * cd app/backend && flask --app main:create_app jobs sweep
+"""
+import sqlite3
+import time
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy.orm import load_only
+
+from api.serializers import AUTHOR_CARD_OPTIONS, serialize_comment, serialize_job, serialize_post
+from models import db
+from models.job import Job
+from models.post import Comment, Post
+from models.profile import Profile
+from models.user import User
+from services.job_dedup import JobDuplicateIndex
+from services.job_sweeper import deactivate_expired_jobs, archive_inactive_jobs
+from services import message_archive, message_search
+from services.cache import get_cache
+from services.synthetic_data import SyntheticDataset
+from utils.db_routing import measure_lag, replica_keys
+from utils.streaming import encode_stream, keyset_batches
+
+jobs_cli = AppGroup('jobs', help='Job listing maintenance.')
+messages_cli = AppGroup('messages', help='Messaging maintenance.')
+data_cli = AppGroup('data', help='Synthetic data for local scale testing, and bulk exports.')
+replica_cli = AppGroup('replica', help='Read replica status and local SQLite replicas.')
+cache_cli = AppGroup('cache', help='Read-path cache maintenance.')
+
+
+@jobs_cli.command('sweep')
+@click.option('--batch-size', type=int, default=None, help='Rows per batch (default JOB_SWEEP_BATCH_SIZE).')
+@click.option('--archive-after-days', type=int, default=None,
+              help='Archive jobs inactive for this many days (default JOB_ARCHIVE_AFTER_DAYS).')
+@click.option('--skip-archive', is_flag=True, help='Only deactivate expired jobs.')
+def sweep_jobs(batch_size, archive_after_days, skip_archive):
+    """Deactivate expired jobs and archive long-inactive ones"""
+    config = current_app.config
+    batch_size = batch_size or config['JOB_SWEEP_BATCH_SIZE']
+    if archive_after_days is None:
+        archive_after_days = config['JOB_ARCHIVE_AFTER_DAYS']
+
+    click.echo(str(deactivate_expired_jobs(batch_size=batch_size)))
+    if not skip_archive:
+        for stats in archive_inactive_jobs(older_than_days=archive_after_days, batch_size=batch_size):
+            click.echo(str(stats))
+
+
+@jobs_cli.command('find-duplicates')
+@click.option('--threshold', type=float, default=None,
+              help='Minimum estimated Jaccard similarity (default JOB_DUPLICATE_THRESHOLD).')
+@click.option('--include-inactive', is_flag=True, help='Also cluster inactive jobs.')
+def find_duplicate_jobs(threshold, include_inactive):
+    """Cluster near-duplicate listings in the jobs table"""
+    threshold = threshold or current_app.config['JOB_DUPLICATE_THRESHOLD']
+    started = time.perf_counter()
+    index = JobDuplicateIndex().build(include_inactive=include_inactive)
+    built = time.perf_counter()
+    clusters = index.clusters(threshold=threshold)
+    finished = time.perf_counter()
+
+    titles = {}
+    job_ids = [job_id for cluster in clusters for job_id in cluster]
+    for start in range(0, len(job_ids), 500):
+        chunk = job_ids[start:start + 500]
+        titles.update(Job.query.with_entities(Job.id, Job.title).filter(Job.id.in_(chunk)))
+    for cluster in clusters:
+        click.echo(', '.join(f'{job_id} ({titles.get(job_id, "?")})' for job_id in cluster))
+    click.echo(f'{len(clusters)} clusters covering {len(job_ids)} of {len(index)} jobs; '
+               f'index built in {built - started:.2f}s, clustered in {finished - built:.2f}s')
+
+
+@messages_cli.command('reindex-search')
+@click.option('--batch-size', type=int, default=message_search.REINDEX_BATCH_SIZE, help='Messages per batch.')
+@click.option('--after-id', type=int, default=0, help='Only reindex messages with a larger id.')
+def reindex_message_search(batch_size, after_id):
+    """Rebuild the message search postings (backfill after migrating)"""
+    messages, postings, elapsed = message_search.reindex(batch_size=batch_size, min_id=after_id)
+    click.echo(f'indexed {messages} messages ({postings} postings) in {elapsed:.2f}s')
+
+
+@messages_cli.command('archive')
+@click.option('--older-than-days', type=int, default=None,
+              help='Archive messages older than this (default MESSAGE_ARCHIVE_AFTER_DAYS).')
+@click.option('--block-size', type=int, default=None,
+              help='Messages per compressed block (default MESSAGE_ARCHIVE_BLOCK_SIZE).')
+def archive_messages(older_than_days, block_size):
+    """Move old messages into compressed per-conversation archive blocks"""
+    config = current_app.config
+    if older_than_days is None:
+        older_than_days = config['MESSAGE_ARCHIVE_AFTER_DAYS']
+    block_size = block_size or config['MESSAGE_ARCHIVE_BLOCK_SIZE']
+
+    before = message_archive.storage_report()
+    click.echo(str(message_archive.archive_old_messages(older_than_days=older_than_days, block_size=block_size)))
+    after = message_archive.storage_report()
+    for key in before:
+        click.echo(f'{key}: {before[key]} -> {after.get(key)}')
+
+
+@data_cli.command('generate')
+@click.option('--users', type=int, default=1000, show_default=True)
+@click.option('--posts', type=int, default=None, help='Default 5 per user.')
+@click.option('--comments', type=int, default=None, help='Default 4 per post.')
+@click.option('--likes', type=int, default=None, help='Default 20 per post (stored as posts.likes_count).')
+@click.option('--jobs', type=int, default=None, help='Default 1 per 10 users.')
+@click.option('--applications', type=int, default=None, help='Default 15 per job.')
+@click.option('--conversations', type=int, default=None, help='Default 3 per user.')
+@click.option('--messages', type=int, default=None, help='Default 30 per conversation.')
+@click.option('--seed', type=int, default=42, show_default=True)
+@click.option('--anchor', type=click.DateTime(formats=['%Y-%m-%d']), default=None,
+              help='Day all timestamps are relative to (default 2026-01-01, so a seed always gives the same rows).')
+@click.option('--batch-size', type=int, default=5000, show_default=True, help='Rows per INSERT batch.')
+@click.option('--index-search', is_flag=True, help='Also write message search postings (slower).')
+def generate_data(users, posts, comments, likes, jobs, applications, conversations, messages,
+                  seed, anchor, batch_size, index_search):
+    """Fill the database with skewed, deterministic synthetic data"""
+    posts = users * 5 if posts is None else posts
+    comments = posts * 4 if comments is None else comments
+    likes = posts * 20 if likes is None else likes
+    jobs = max(1, users // 10) if jobs is None else jobs
+    applications = jobs * 15 if applications is None else applications
+    conversations = users * 3 if conversations is None else conversations
+    messages = conversations * 30 if messages is None else messages
+
+    started = time.perf_counter()
+    dataset = SyntheticDataset(seed=seed, anchor=anchor, batch_size=batch_size, index_search=index_search)
+    stats = dataset.generate(users=users, posts=posts, comments=comments, likes=likes, jobs=jobs,
+                             applications=applications, conversations=conversations, messages=messages)
+    for table_stats in stats:
+        click.echo(str(table_stats))
+    total = sum(table_stats.rows for table_stats in stats)
+    elapsed = time.perf_counter() - started
+    click.echo(f'{total} rows in {elapsed:.1f}s ({total / elapsed:.0f} rows/s); '
+               f'every synthetic user can log in with password {dataset.password!r}')
+    get_cache().clear()
+    if not index_search:
+        click.echo('Run `flask messages reindex-search` to make the messages searchable.')
+
+
+def _users_by_id(user_ids, with_profiles=False):
+    if not with_profiles:
+        return {user.id: user for user in
+                User.query.options(load_only(User.id, User.name, User.username)).filter(User.id.in_(user_ids))}
+    rows = (db.session.query(User, Profile).outerjoin(Profile, Profile.user_id == User.id)
+            .options(*AUTHOR_CARD_OPTIONS).filter(User.id.in_(user_ids)))
+    return {user.id: (user, profile) for user, profile in rows}
+
+
+def _export_posts(posts):
+    authors = _users_by_id({post.user_id for post in posts}, with_profiles=True)
+    # Media URLs stay relative: an export has no request host
+    return [serialize_post(post, *authors.get(post.user_id, (None, None)), '') for post in posts]
+
+
+def _export_jobs(jobs):
+    posters = _users_by_id({job.posted_by for job in jobs})
+    return [serialize_job(job, posters.get(job.posted_by)) for job in jobs]
+
+
+def _export_comments(comments):
+    commenters = _users_by_id({comment.user_id for comment in comments})
+    return [dict(serialize_comment(comment, commenters.get(comment.user_id)), post_id=comment.post_id)
+            for comment in comments]
+
+
+# table -> (model, batch serialiser); rows go out in id order, in the API's shapes
+EXPORTS = {
+    'posts': (Post, _export_posts),
+    'jobs': (Job, _export_jobs),
+    'comments': (Comment, _export_comments),
+}
+
+
+@data_cli.command('export')
+@click.argument('table', type=click.Choice(sorted(EXPORTS)))
+@click.option('--output', type=click.File('wb'), default='-', help='File to write (default stdout).')
+@click.option('--format', 'output_format', type=click.Choice(['ndjson', 'json']), default='ndjson', show_default=True)
+def export_data(table, output, output_format):
+    """Stream a table out in batches, in constant memory however large it is"""
+    model, serialize_batch = EXPORTS[table]
+    batches = keyset_batches(model.query, (model.id,))
+    for chunk in encode_stream(batches, serialize_batch, current_app.json.dumps, key=table,
+                               ndjson=output_format == 'ndjson'):
+        output.write(chunk)
+    output.flush()
+
+
+@replica_cli.command('status')
+def replica_status():
+    """Show each configured replica and its current lag"""
+    engines = db.engines
+    keys = replica_keys(engines)
+    if not keys:
+        click.echo('No replicas configured (set DATABASE_REPLICA_URLS); every read uses the primary.')
+    for key in keys:
+        try:
+            lag = measure_lag(engines[key])
+            status = 'not replicating' if lag is None else f'{lag:.1f}s behind'
+        except Exception as exc:
+            status = f'unreachable ({exc})'
+        click.echo(f'{key}: {engines[key].url.render_as_string(hide_password=True)} {status}')
+
+
+@replica_cli.command('sync')
+@click.option('--every', type=float, default=None, help='Keep syncing at this interval (seconds) until interrupted.')
+def sync_replicas(every):
+    """Copy a SQLite primary into SQLite replicas, standing in for replication in local testing"""
+    engines = db.engines
+    primary = engines[None]
+    targets = [engines[key] for key in replica_keys(engines)]
+    if primary.dialect.name != 'sqlite' or not targets or any(e.dialect.name != 'sqlite' for e in targets):
+        raise click.UsageError('sync only copies a SQLite primary into SQLite replicas')
+    while True:
+        source = sqlite3.connect(primary.url.database)
+        try:
+            for engine in targets:
+                destination = sqlite3.connect(engine.url.database)
+                try:
+                    source.backup(destination)
+                finally:
+                    destination.close()
+                click.echo(f'synced {engine.url.database}')
+        finally:
+            source.close()
+        if every is None:
+            break
+        time.sleep(every)
+
+
+@cache_cli.command('clear')
+@click.option('--tag', 'tags', multiple=True, help='Only drop entries with this tag (repeatable), e.g. jobs.')
+def clear_cache(tags):
+    """Drop cached entries from the shared tier (other workers' local copies expire on their own)"""
+    cache = get_cache()
+    if tags:
+        cache.invalidate(*tags)
+    else:
+        cache.clear()
+    target = current_app.config['CACHE_SHARED_URL'] or 'this process only (no CACHE_SHARED_URL)'
+    click.echo(f'cleared {", ".join(tags) if tags else "everything"} in {target}')
+
+
+def register_commands(app):
+    app.cli.add_command(jobs_cli)
+    app.cli.add_command(messages_cli)
+    app.cli.add_command(data_cli)
+    app.cli.add_command(replica_cli)
+    app.cli.add_command(cache_cli)
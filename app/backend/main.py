@@ -6,6 +6,7 @@ from config import Config
 from dotenv import load_dotenv
 import os
 from flask_migrate import Migrate
+from utils.json_provider import FastJSONProvider
 
 # Load environment variables
 load_dotenv()
@@ -13,6 +14,7 @@ load_dotenv()
 # Create Flask app
 app = Flask(__name__)
 app.config.from_object(Config)
+app.json = FastJSONProvider(app)
 
 # Initialize extensions
 CORS(app, origins=["http://localhost:5173", "http://localhost:5174"], allow_headers=["Content-Type", "Authorization"], methods=["GET", "POST", "PUT", "DELETE", "PATCH", "OPTIONS"], supports_credentials=True)
@@ -21,6 +23,7 @@ CORS(app, origins=["http://localhost:5173", "http://localhost:5174"], allow_head
 from models import db
 from models.user import User
 from models.profile import Profile, Skill, Experience, Education
+import models.data_version  # noqa: F401 (version counters bumped on commit, read by ETag stamps)
 
 # Initialize database
 db.init_app(app)
@@ -34,6 +37,9 @@ from api.posts import posts_bp
 from api.feed import feed_bp
 from api.jobs import jobs_bp
 from api.messaging import messaging_bp
+from commands import register_commands
+from utils.db_routing import init_db_routing
+from utils.metrics import init_metrics
 
 # Remove the manual CORS headers from after_request
 def add_cors_headers(response):
@@ -58,6 +64,9 @@ def create_app():
     app.register_blueprint(feed_bp)
     app.register_blueprint(jobs_bp)
     app.register_blueprint(messaging_bp)
+    register_commands(app)
+    init_metrics(app)
+    init_db_routing(app)
     return app
 
 @app.route('/')
@@ -75,5 +84,7 @@ if __name__ == '__main__':
     app.register_blueprint(feed_bp)
     app.register_blueprint(jobs_bp)
     app.register_blueprint(messaging_bp)
+    init_metrics(app)
+    init_db_routing(app)
     # Run the app
     app.run(debug=True) 
\ No newline at end of file
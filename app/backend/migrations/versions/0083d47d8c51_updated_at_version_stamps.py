@@ -0,0 +1,31 @@
+"""Add profiles.updated_at and index updated_at for ETag version stamps
+
+Revision ID: 0083d47d8c51
+Revises: 110a4cacc27d
+Create Date: 2026-10-21 10:12:44.518230
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0083d47d8c51'
+down_revision = '110a4cacc27d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('profiles', sa.Column('updated_at', sa.DateTime(), nullable=True))
+    op.execute('UPDATE profiles SET updated_at = COALESCE(created_at, CURRENT_TIMESTAMP)')
+    op.create_index('ix_profiles_updated_at', 'profiles', ['updated_at'], unique=False)
+    op.create_index('ix_posts_updated_at', 'posts', ['updated_at'], unique=False)
+    op.create_index('ix_jobs_updated_at', 'jobs', ['updated_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_jobs_updated_at', table_name='jobs')
+    op.drop_index('ix_posts_updated_at', table_name='posts')
+    op.drop_index('ix_profiles_updated_at', table_name='profiles')
+    op.drop_column('profiles', 'updated_at')
@@ -0,0 +1,64 @@
+"""Add jobs.expires_at and archive tables for long-inactive jobs
+
+Revision ID: 0b77a0eb3e5e
+Revises: 7bf97491a911
+Create Date: 2026-10-19 14:05:51.203947
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0b77a0eb3e5e'
+down_revision = '7bf97491a911'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing listings keep expires_at NULL and never expire on their own
+    op.add_column('jobs', sa.Column('expires_at', sa.DateTime(), nullable=True))
+    op.create_index('ix_jobs_is_active_expires_at', 'jobs', ['is_active', 'expires_at'], unique=False)
+
+    op.create_table('jobs_archive',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('title', sa.String(length=200), nullable=False),
+    sa.Column('company', sa.String(length=200), nullable=False),
+    sa.Column('location', sa.String(length=200), nullable=True),
+    sa.Column('description', sa.Text(), nullable=False),
+    sa.Column('requirements', sa.Text(), nullable=True),
+    sa.Column('salary_range', sa.String(length=100), nullable=True),
+    sa.Column('job_type', sa.String(length=50), nullable=True),
+    sa.Column('posted_by', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.Column('is_active', sa.Boolean(), nullable=True),
+    sa.Column('expires_at', sa.DateTime(), nullable=True),
+    sa.Column('archived_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_jobs_archive_posted_by'), 'jobs_archive', ['posted_by'], unique=False)
+
+    op.create_table('job_applications_archive',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('job_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(length=50), nullable=True),
+    sa.Column('applied_at', sa.DateTime(), nullable=True),
+    sa.Column('cover_letter', sa.Text(), nullable=True),
+    sa.Column('archived_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_job_applications_archive_job_id'), 'job_applications_archive', ['job_id'], unique=False)
+    op.create_index(op.f('ix_job_applications_archive_user_id'), 'job_applications_archive', ['user_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_job_applications_archive_user_id'), table_name='job_applications_archive')
+    op.drop_index(op.f('ix_job_applications_archive_job_id'), table_name='job_applications_archive')
+    op.drop_table('job_applications_archive')
+    op.drop_index(op.f('ix_jobs_archive_posted_by'), table_name='jobs_archive')
+    op.drop_table('jobs_archive')
+    op.drop_index('ix_jobs_is_active_expires_at', table_name='jobs')
+    op.drop_column('jobs', 'expires_at')
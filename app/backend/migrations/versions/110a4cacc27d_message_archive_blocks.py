@@ -0,0 +1,39 @@
+"""Add message_archive_blocks for cold storage of old messages
+
+Revision ID: 110a4cacc27d
+Revises: 6a9cffcaa355
+Create Date: 2026-10-20 16:41:27.904113
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '110a4cacc27d'
+down_revision = '6a9cffcaa355'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('message_archive_blocks',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('conversation_id', sa.Integer(), nullable=False),
+    sa.Column('first_message_id', sa.Integer(), nullable=False),
+    sa.Column('first_created_at', sa.DateTime(), nullable=False),
+    sa.Column('last_message_id', sa.Integer(), nullable=False),
+    sa.Column('last_created_at', sa.DateTime(), nullable=False),
+    sa.Column('message_count', sa.Integer(), nullable=False),
+    sa.Column('payload', sa.LargeBinary(length=16777215), nullable=False),
+    sa.Column('archived_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['conversation_id'], ['conversations.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_message_archive_blocks_conversation_id_last', 'message_archive_blocks',
+                    ['conversation_id', 'last_created_at', 'last_message_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_message_archive_blocks_conversation_id_last', table_name='message_archive_blocks')
+    op.drop_table('message_archive_blocks')
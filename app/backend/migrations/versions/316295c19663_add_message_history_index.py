@@ -0,0 +1,24 @@
+"""Add (conversation_id, created_at, id) index for message history pagination
+
+Revision ID: 316295c19663
+Revises: 8e83f6073151
+Create Date: 2026-10-19 18:02:10.457331
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '316295c19663'
+down_revision = '8e83f6073151'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_messages_conversation_id_created_at_id', 'messages', ['conversation_id', 'created_at', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_messages_conversation_id_created_at_id', table_name='messages')
@@ -0,0 +1,44 @@
+"""Add job_application_counts table and (job_id, id) index on job_applications
+
+Revision ID: 3e11f3604df2
+Revises: 2c253f46f848
+Create Date: 2026-10-19 09:12:40.118305
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3e11f3604df2'
+down_revision = '2c253f46f848'
+branch_labels = None
+depends_on = None
+
+APPLICATION_STATUSES = ('applied', 'reviewed', 'interviewed', 'offered', 'rejected')
+
+
+def upgrade():
+    op.create_table('job_application_counts',
+    sa.Column('job_id', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(length=50), nullable=False),
+    sa.Column('total', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['job_id'], ['jobs.id'], ),
+    sa.PrimaryKeyConstraint('job_id', 'status')
+    )
+    op.create_index('ix_job_applications_job_id_id', 'job_applications', ['job_id', 'id'], unique=False)
+
+    # Backfill one counter row per job and status from the existing applications
+    conn = op.get_bind()
+    for status in APPLICATION_STATUSES:
+        conn.execute(sa.text(
+            'INSERT INTO job_application_counts (job_id, status, total) '
+            'SELECT jobs.id, :status, '
+            '(SELECT COUNT(*) FROM job_applications a WHERE a.job_id = jobs.id AND a.status = :status) '
+            'FROM jobs'
+        ), {'status': status})
+
+
+def downgrade():
+    op.drop_index('ix_job_applications_job_id_id', table_name='job_applications')
+    op.drop_table('job_application_counts')
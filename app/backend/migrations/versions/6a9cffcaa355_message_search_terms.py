@@ -0,0 +1,34 @@
+"""Add message_search_terms inverted index
+
+Revision ID: 6a9cffcaa355
+Revises: 7549265242c4
+Create Date: 2026-10-20 14:03:12.518240
+
+Existing messages are indexed by ``flask messages reindex-search`` (the
+tokenizer lives in Python, so the backfill is not done in SQL here).
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6a9cffcaa355'
+down_revision = '7549265242c4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('message_search_terms',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('term', sa.String(length=64), nullable=False),
+    sa.Column('message_id', sa.Integer(), nullable=False),
+    sa.Column('weight', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['message_id'], ['messages.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'term', 'message_id')
+    )
+
+
+def downgrade():
+    op.drop_table('message_search_terms')
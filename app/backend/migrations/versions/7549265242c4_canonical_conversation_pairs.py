@@ -0,0 +1,85 @@
+"""Store conversation participants in canonical order and merge duplicate threads
+
+Revision ID: 7549265242c4
+Revises: 7d7c5d37859c
+Create Date: 2026-10-20 09:26:58.301774
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7549265242c4'
+down_revision = '7d7c5d37859c'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    conn = op.get_bind()
+
+    # 1. Put the lower user id first (row by row: MySQL evaluates SET left to right, so no in-place swap)
+    rows = conn.execute(sa.text(
+        'SELECT id, user1_id, user2_id, user1_unread_count, user2_unread_count '
+        'FROM conversations WHERE user1_id > user2_id'
+    )).fetchall()
+    for conv_id, user1_id, user2_id, user1_unread, user2_unread in rows:
+        conn.execute(sa.text(
+            'UPDATE conversations SET user1_id = :user1_id, user2_id = :user2_id, '
+            'user1_unread_count = :user1_unread, user2_unread_count = :user2_unread WHERE id = :id'
+        ), {'id': conv_id, 'user1_id': user2_id, 'user2_id': user1_id,
+            'user1_unread': user2_unread, 'user2_unread': user1_unread})
+
+    # 2. Merge duplicate threads of the same pair into the oldest one
+    duplicates = conn.execute(sa.text(
+        'SELECT user1_id, user2_id, MIN(id) FROM conversations '
+        'GROUP BY user1_id, user2_id HAVING COUNT(*) > 1'
+    )).fetchall()
+    for user1_id, user2_id, keep_id in duplicates:
+        params = {'user1_id': user1_id, 'user2_id': user2_id, 'keep_id': keep_id}
+        merged = conn.execute(sa.text(
+            'SELECT id, user1_unread_count, user2_unread_count, updated_at FROM conversations '
+            'WHERE user1_id = :user1_id AND user2_id = :user2_id AND id <> :keep_id'
+        ), params).fetchall()
+        merged_ids = [row[0] for row in merged]
+        conn.execute(
+            sa.text('UPDATE messages SET conversation_id = :keep_id WHERE conversation_id IN :merged_ids')
+            .bindparams(sa.bindparam('merged_ids', expanding=True)),
+            {'keep_id': keep_id, 'merged_ids': merged_ids}
+        )
+        conn.execute(sa.text(
+            'UPDATE conversations SET '
+            'user1_unread_count = user1_unread_count + :user1_unread, '
+            'user2_unread_count = user2_unread_count + :user2_unread '
+            'WHERE id = :keep_id'
+        ), {'keep_id': keep_id,
+            'user1_unread': sum(row[1] for row in merged),
+            'user2_unread': sum(row[2] for row in merged)})
+        latest = conn.execute(sa.text(
+            'SELECT id, SUBSTR(content, 1, 200), sender_id, created_at FROM messages '
+            'WHERE conversation_id = :keep_id ORDER BY created_at DESC, id DESC LIMIT 1'
+        ), params).fetchone()
+        if latest:
+            conn.execute(sa.text(
+                'UPDATE conversations SET last_message_id = :id, last_message_preview = :preview, '
+                'last_sender_id = :sender_id, last_message_at = :created_at, updated_at = :created_at '
+                'WHERE id = :keep_id'
+            ), {'keep_id': keep_id, 'id': latest[0], 'preview': latest[1],
+                'sender_id': latest[2], 'created_at': latest[3]})
+        conn.execute(
+            sa.text('DELETE FROM conversations WHERE id IN :merged_ids')
+            .bindparams(sa.bindparam('merged_ids', expanding=True)),
+            {'merged_ids': merged_ids}
+        )
+
+    # 3. One row per pair, always in canonical order
+    with op.batch_alter_table('conversations') as batch_op:
+        batch_op.create_unique_constraint('uq_conversations_user_pair', ['user1_id', 'user2_id'])
+        batch_op.create_check_constraint('ck_conversations_canonical_pair', 'user1_id < user2_id')
+
+
+def downgrade():
+    with op.batch_alter_table('conversations') as batch_op:
+        batch_op.drop_constraint('ck_conversations_canonical_pair', type_='check')
+        batch_op.drop_constraint('uq_conversations_user_pair', type_='unique')
@@ -0,0 +1,49 @@
+"""Deduplicate job applications and make (job_id, user_id) unique
+
+Revision ID: 7bf97491a911
+Revises: 3e11f3604df2
+Create Date: 2026-10-19 11:40:03.527114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7bf97491a911'
+down_revision = '3e11f3604df2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    conn = op.get_bind()
+
+    # 1. Keep the earliest application of every (job_id, user_id) pair
+    duplicates = conn.execute(sa.text(
+        'SELECT job_id, user_id, MIN(id) FROM job_applications '
+        'GROUP BY job_id, user_id HAVING COUNT(*) > 1'
+    )).fetchall()
+    for job_id, user_id, keep_id in duplicates:
+        conn.execute(sa.text(
+            'DELETE FROM job_applications '
+            'WHERE job_id = :job_id AND user_id = :user_id AND id <> :keep_id'
+        ), {'job_id': job_id, 'user_id': user_id, 'keep_id': keep_id})
+
+    # 2. Recount the per-status counters of the affected jobs
+    for job_id in {row[0] for row in duplicates}:
+        conn.execute(sa.text(
+            'UPDATE job_application_counts SET total = '
+            '(SELECT COUNT(*) FROM job_applications a '
+            'WHERE a.job_id = job_application_counts.job_id AND a.status = job_application_counts.status) '
+            'WHERE job_id = :job_id'
+        ), {'job_id': job_id})
+
+    # 3. Enforce one application per user and job
+    with op.batch_alter_table('job_applications') as batch_op:
+        batch_op.create_unique_constraint('uq_job_applications_job_id_user_id', ['job_id', 'user_id'])
+
+
+def downgrade():
+    with op.batch_alter_table('job_applications') as batch_op:
+        batch_op.drop_constraint('uq_job_applications_job_id_user_id', type_='unique')
@@ -0,0 +1,49 @@
+"""Add per-conversation and per-user unread message counters
+
+Revision ID: 7d7c5d37859c
+Revises: 316295c19663
+Create Date: 2026-10-19 20:47:36.612098
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7d7c5d37859c'
+down_revision = '316295c19663'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('conversations', sa.Column('user1_unread_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('conversations', sa.Column('user2_unread_count', sa.Integer(), server_default='0', nullable=False))
+    op.create_table('user_unread_counts',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('total', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+
+    # Backfill from the unread messages each participant has received
+    conn = op.get_bind()
+    for participant in ('user1', 'user2'):
+        conn.execute(sa.text(
+            f'UPDATE conversations SET {participant}_unread_count = '
+            '(SELECT COUNT(*) FROM messages m WHERE m.conversation_id = conversations.id '
+            f'AND m.sender_id <> conversations.{participant}_id AND m.is_read = :false)'
+        ), {'false': False})
+    conn.execute(sa.text(
+        'INSERT INTO user_unread_counts (user_id, total) '
+        'SELECT users.id, '
+        '(SELECT COALESCE(SUM(c.user1_unread_count), 0) FROM conversations c WHERE c.user1_id = users.id) + '
+        '(SELECT COALESCE(SUM(c.user2_unread_count), 0) FROM conversations c WHERE c.user2_id = users.id) '
+        'FROM users'
+    ))
+
+
+def downgrade():
+    op.drop_table('user_unread_counts')
+    op.drop_column('conversations', 'user2_unread_count')
+    op.drop_column('conversations', 'user1_unread_count')
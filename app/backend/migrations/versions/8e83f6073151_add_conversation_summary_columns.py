@@ -0,0 +1,48 @@
+"""Add latest-message summary columns and inbox indexes to conversations
+
+Revision ID: 8e83f6073151
+Revises: 0b77a0eb3e5e
+Create Date: 2026-10-19 16:31:27.884120
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8e83f6073151'
+down_revision = '0b77a0eb3e5e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('conversations', sa.Column('last_message_id', sa.Integer(), nullable=True))
+    op.add_column('conversations', sa.Column('last_message_preview', sa.String(length=200), nullable=True))
+    op.add_column('conversations', sa.Column('last_sender_id', sa.Integer(), nullable=True))
+    op.add_column('conversations', sa.Column('last_message_at', sa.DateTime(), nullable=True))
+    op.create_index('ix_conversations_user1_id_updated_at', 'conversations', ['user1_id', 'updated_at', 'id'], unique=False)
+    op.create_index('ix_conversations_user2_id_updated_at', 'conversations', ['user2_id', 'updated_at', 'id'], unique=False)
+
+    # Backfill from the newest message of every conversation
+    conn = op.get_bind()
+    conn.execute(sa.text(
+        'UPDATE conversations SET last_message_id = '
+        '(SELECT MAX(m.id) FROM messages m WHERE m.conversation_id = conversations.id)'
+    ))
+    conn.execute(sa.text(
+        'UPDATE conversations SET '
+        'last_message_preview = (SELECT SUBSTR(m.content, 1, 200) FROM messages m WHERE m.id = conversations.last_message_id), '
+        'last_sender_id = (SELECT m.sender_id FROM messages m WHERE m.id = conversations.last_message_id), '
+        'last_message_at = (SELECT m.created_at FROM messages m WHERE m.id = conversations.last_message_id) '
+        'WHERE last_message_id IS NOT NULL'
+    ))
+
+
+def downgrade():
+    op.drop_index('ix_conversations_user2_id_updated_at', table_name='conversations')
+    op.drop_index('ix_conversations_user1_id_updated_at', table_name='conversations')
+    op.drop_column('conversations', 'last_message_at')
+    op.drop_column('conversations', 'last_sender_id')
+    op.drop_column('conversations', 'last_message_preview')
+    op.drop_column('conversations', 'last_message_id')
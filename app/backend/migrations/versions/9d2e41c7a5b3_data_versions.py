@@ -0,0 +1,34 @@
+"""Add data_versions counters for ETag stamps, drop the updated_at indexes they replace
+
+Revision ID: 9d2e41c7a5b3
+Revises: 0083d47d8c51
+Create Date: 2026-10-22 09:14:05.311842
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9d2e41c7a5b3'
+down_revision = '0083d47d8c51'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    data_versions = op.create_table('data_versions',
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    op.bulk_insert(data_versions, [{'name': name, 'version': 0} for name in ('authors', 'jobs', 'posts')])
+    # posts.updated_at stays indexed for ?sort_by=updated_at
+    op.drop_index('ix_jobs_updated_at', table_name='jobs')
+    op.drop_index('ix_profiles_updated_at', table_name='profiles')
+
+
+def downgrade():
+    op.create_index('ix_profiles_updated_at', 'profiles', ['updated_at'], unique=False)
+    op.create_index('ix_jobs_updated_at', 'jobs', ['updated_at'], unique=False)
+    op.drop_table('data_versions')
@@ -0,0 +1,24 @@
+"""Add (post_id, created_at, id) index for streamed comment lists
+
+Revision ID: a3f1c8d2e4b6
+Revises: 9d2e41c7a5b3
+Create Date: 2026-10-19 21:40:12.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3f1c8d2e4b6'
+down_revision = '9d2e41c7a5b3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_comments_post_id_created_at_id', 'comments', ['post_id', 'created_at', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_comments_post_id_created_at_id', table_name='comments')
@@ -1,3 +1,6 @@
 from flask_sqlalchemy import SQLAlchemy
+
+import utils.db_engine  # noqa: F401 (SQLite pragmas on connect, per-request statement timeout)
+from utils.db_routing import RoutingSession
  
-db = SQLAlchemy() 
\ No newline at end of file
+db = SQLAlchemy(session_options={'class_': RoutingSession})
\ No newline at end of file
@@ -0,0 +1,89 @@
+"""
+Version counters for ETag stamps, one row per cached data set.
+
+Conditional GETs (utils/conditional.py) stamp list responses with these
+counters instead of scanning the tables they list: reading one is a
+primary-key lookup. A transaction that writes to a versioned table bumps its
+counter in the same transaction, just before commit, so the counter and the
+rows change together for every reader and in every process (web workers, CLI
+sweeps). Writes are noticed through the ORM, both flushes and bulk
+``query.update()``/``delete()``, and through Core statements on the versioned
+tables run with ``db.session.execute``. Versions use the cache tag names:
+``authors`` covers users and profiles, which make up author cards.
+
+The counter row is locked from the bump to the commit, so writers to the
+same table serialise for that last moment of their transaction. A
+transaction that bumps several counters updates them one statement at a
+time in name order, so two such transactions take the row locks in the
+same order and cannot deadlock on them.
+"""
+from sqlalchemy import event, update
+from sqlalchemy.orm import Session
+
+from . import db
+
+# Table name -> version it belongs to
+VERSIONED_TABLES = {
+    'posts': 'posts',
+    'jobs': 'jobs',
+    'users': 'authors',
+    'profiles': 'authors',
+}
+VERSIONS = tuple(sorted(set(VERSIONED_TABLES.values())))
+PENDING_KEY = 'data_versions_pending'
+
+
+class DataVersion(db.Model):
+    __tablename__ = 'data_versions'
+
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<DataVersion {self.name}={self.version}>'
+
+
+@event.listens_for(DataVersion.__table__, 'after_create')
+def _seed_versions(table, connection, **kw):
+    # db.create_all(); the migration seeds the same rows
+    connection.execute(table.insert(), [{'name': name, 'version': 0} for name in VERSIONS])
+
+
+def _note(session, table_name):
+    name = VERSIONED_TABLES.get(table_name)
+    if name is not None:
+        session.info.setdefault(PENDING_KEY, set()).add(name)
+
+
+@event.listens_for(Session, 'after_flush')
+def _note_flushed(session, flush_context):
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        table = getattr(obj, '__table__', None)
+        if table is not None:
+            _note(session, table.name)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _note_bulk(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, 'table', None)
+        if table is not None:
+            _note(orm_execute_state.session, table.name)
+
+
+@event.listens_for(Session, 'before_commit')
+def _bump_versions(session):
+    session.flush()  # so the flush events have seen every pending change
+    names = session.info.pop(PENDING_KEY, None)
+    # One statement per name: a single UPDATE ... IN (...) does not promise the order its rows are locked in
+    for name in sorted(names or ()):
+        session.execute(
+            update(DataVersion).where(DataVersion.name == name)
+            .values(version=DataVersion.version + 1)
+            .execution_options(synchronize_session=False)
+        )
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_versions(session):
+    session.info.pop(PENDING_KEY, None)
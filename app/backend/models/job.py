@@ -1,8 +1,13 @@
 from . import db
 from datetime import datetime
 
+APPLICATION_STATUSES = ('applied', 'reviewed', 'interviewed', 'offered', 'rejected')
+
 class Job(db.Model):
     __tablename__ = 'jobs'
+    __table_args__ = (
+        db.Index('ix_jobs_is_active_expires_at', 'is_active', 'expires_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
@@ -16,8 +21,11 @@ class Job(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     is_active = db.Column(db.Boolean, default=True)
+    expires_at = db.Column(db.DateTime, nullable=True)  # swept to is_active=False once passed
+    # Leading characters of description, only loaded by list queries that ask for it (?fields=summary)
+    excerpt = db.query_expression()
     
-    def __init__(self, title, company, description, posted_by, location=None, requirements=None, salary_range=None, job_type=None):
+    def __init__(self, title, company, description, posted_by, location=None, requirements=None, salary_range=None, job_type=None, expires_at=None):
         self.title = title
         self.company = company
         self.description = description
@@ -26,12 +34,17 @@ class Job(db.Model):
         self.requirements = requirements
         self.salary_range = salary_range
         self.job_type = job_type
+        self.expires_at = expires_at
     
     def __repr__(self):
         return f'<Job {self.id}: {self.title} at {self.company}>'
 
 class JobApplication(db.Model):
     __tablename__ = 'job_applications'
+    __table_args__ = (
+        db.UniqueConstraint('job_id', 'user_id', name='uq_job_applications_job_id_user_id'),
+        db.Index('ix_job_applications_job_id_id', 'job_id', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     job_id = db.Column(db.Integer, db.ForeignKey('jobs.id'), nullable=False)
@@ -47,3 +60,56 @@ class JobApplication(db.Model):
     
     def __repr__(self):
         return f'<JobApplication {self.id}: User {self.user_id} for Job {self.job_id}>'
+
+class JobApplicationCount(db.Model):
+    """Per-job, per-status application counter maintained alongside JobApplication writes"""
+    __tablename__ = 'job_application_counts'
+    
+    job_id = db.Column(db.Integer, db.ForeignKey('jobs.id'), primary_key=True)
+    status = db.Column(db.String(50), primary_key=True)
+    total = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __init__(self, job_id, status, total=0):
+        self.job_id = job_id
+        self.status = status
+        self.total = total
+    
+    def __repr__(self):
+        return f'<JobApplicationCount Job {self.job_id} {self.status}: {self.total}>'
+
+class JobArchive(db.Model):
+    """Long-inactive jobs moved out of the hot jobs table by the sweeper"""
+    __tablename__ = 'jobs_archive'
+    
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    title = db.Column(db.String(200), nullable=False)
+    company = db.Column(db.String(200), nullable=False)
+    location = db.Column(db.String(200))
+    description = db.Column(db.Text, nullable=False)
+    requirements = db.Column(db.Text)
+    salary_range = db.Column(db.String(100))
+    job_type = db.Column(db.String(50))
+    posted_by = db.Column(db.Integer, nullable=False, index=True)
+    created_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime)
+    is_active = db.Column(db.Boolean)
+    expires_at = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<JobArchive {self.id}: {self.title} at {self.company}>'
+
+class JobApplicationArchive(db.Model):
+    """Applications of archived jobs"""
+    __tablename__ = 'job_applications_archive'
+    
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    job_id = db.Column(db.Integer, nullable=False, index=True)
+    user_id = db.Column(db.Integer, nullable=False, index=True)
+    status = db.Column(db.String(50))
+    applied_at = db.Column(db.DateTime)
+    cover_letter = db.Column(db.Text)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<JobApplicationArchive {self.id}: User {self.user_id} for Job {self.job_id}>'
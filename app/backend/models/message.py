@@ -1,8 +1,17 @@
 from . import db
 from datetime import datetime
 
+PREVIEW_LENGTH = 200
+
 class Conversation(db.Model):
     __tablename__ = 'conversations'
+    __table_args__ = (
+        # Participants are stored in canonical order (user1_id < user2_id) so a pair maps to one row
+        db.UniqueConstraint('user1_id', 'user2_id', name='uq_conversations_user_pair'),
+        db.CheckConstraint('user1_id < user2_id', name='ck_conversations_canonical_pair'),
+        db.Index('ix_conversations_user1_id_updated_at', 'user1_id', 'updated_at', 'id'),
+        db.Index('ix_conversations_user2_id_updated_at', 'user2_id', 'updated_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user1_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -10,15 +19,27 @@ class Conversation(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    # Denormalized summary of the latest message, maintained by send_message
+    last_message_id = db.Column(db.Integer)
+    last_message_preview = db.Column(db.String(PREVIEW_LENGTH))
+    last_sender_id = db.Column(db.Integer)
+    last_message_at = db.Column(db.DateTime)
+    
+    # Unread messages for each participant, maintained by send_message and mark_read
+    user1_unread_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    user2_unread_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    
     def __init__(self, user1_id, user2_id):
-        self.user1_id = user1_id
-        self.user2_id = user2_id
+        self.user1_id, self.user2_id = sorted((user1_id, user2_id))
     
     def __repr__(self):
         return f'<Conversation {self.id}: {self.user1_id} <-> {self.user2_id}>'
 
 class Message(db.Model):
     __tablename__ = 'messages'
+    __table_args__ = (
+        db.Index('ix_messages_conversation_id_created_at_id', 'conversation_id', 'created_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     conversation_id = db.Column(db.Integer, db.ForeignKey('conversations.id'), nullable=False)
@@ -34,3 +55,67 @@ class Message(db.Model):
     
     def __repr__(self):
         return f'<Message {self.id}: {self.content[:50]}...>'
+
+class UserUnreadCount(db.Model):
+    """Unread messages across all of a user's conversations, for O(1) badges"""
+    __tablename__ = 'user_unread_counts'
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    total = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __init__(self, user_id, total=0):
+        self.user_id = user_id
+        self.total = total
+    
+    def __repr__(self):
+        return f'<UserUnreadCount User {self.user_id}: {self.total}>'
+
+class MessageSearchTerm(db.Model):
+    """Inverted index posting: a term occurring in a message, stored once per participant"""
+    __tablename__ = 'message_search_terms'
+    
+    # (user_id, term, message_id) keeps every search scoped to the caller's own postings
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    term = db.Column(db.String(64), primary_key=True)
+    message_id = db.Column(db.Integer, db.ForeignKey('messages.id'), primary_key=True)
+    weight = db.Column(db.Integer, nullable=False)
+    
+    def __init__(self, user_id, term, message_id, weight):
+        self.user_id = user_id
+        self.term = term
+        self.message_id = message_id
+        self.weight = weight
+    
+    def __repr__(self):
+        return f'<MessageSearchTerm User {self.user_id}: {self.term} -> {self.message_id}>'
+
+class MessageArchiveBlock(db.Model):
+    """A run of a conversation's oldest messages moved out of the hot table, zlib-compressed JSON"""
+    __tablename__ = 'message_archive_blocks'
+    __table_args__ = (
+        db.Index('ix_message_archive_blocks_conversation_id_last', 'conversation_id', 'last_created_at', 'last_message_id'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    conversation_id = db.Column(db.Integer, db.ForeignKey('conversations.id'), nullable=False)
+    first_message_id = db.Column(db.Integer, nullable=False)
+    first_created_at = db.Column(db.DateTime, nullable=False)
+    last_message_id = db.Column(db.Integer, nullable=False)
+    last_created_at = db.Column(db.DateTime, nullable=False)
+    message_count = db.Column(db.Integer, nullable=False)
+    payload = db.Column(db.LargeBinary(length=16777215), nullable=False)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __init__(self, conversation_id, first_message_id, first_created_at, last_message_id, last_created_at,
+                 message_count, payload, archived_at=None):
+        self.conversation_id = conversation_id
+        self.first_message_id = first_message_id
+        self.first_created_at = first_created_at
+        self.last_message_id = last_message_id
+        self.last_created_at = last_created_at
+        self.message_count = message_count
+        self.payload = payload
+        self.archived_at = archived_at
+    
+    def __repr__(self):
+        return f'<MessageArchiveBlock {self.id}: conversation {self.conversation_id}, {self.message_count} messages>'
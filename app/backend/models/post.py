@@ -13,13 +13,17 @@ class Post(db.Model):
     is_public = db.Column(db.Boolean, default=True)
     allow_comments = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)  # ?sort_by=updated_at
     media_url = db.Column(db.String(255), nullable=True)
     
     # For now, we'll add these as columns. In a full implementation, 
     # these would be calculated from related tables
     likes_count = db.Column(db.Integer, default=0)
     comments_count = db.Column(db.Integer, default=0)
+    # Leading characters of content, only loaded by list queries that ask for it (?fields=summary)
+    excerpt = db.query_expression()
+    # Read-only; lets list queries eager-load author cards in the post query itself
+    author = db.relationship('User', viewonly=True, lazy='select')
     
     def __init__(self, user_id, content, media_url=None, title=None, category=None, tags=None, is_public=True, allow_comments=True, created_at=None, updated_at=None):
         self.user_id = user_id
@@ -40,6 +44,11 @@ class Post(db.Model):
 
 class Comment(db.Model):
     __tablename__ = 'comments'
+    __table_args__ = (
+        # Comment lists walk a post's comments in (created_at, id) keyset batches
+        db.Index('ix_comments_post_id_created_at_id', 'post_id', 'created_at', 'id'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     post_id = db.Column(db.Integer, db.ForeignKey('posts.id'), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -16,6 +16,8 @@ class Profile(db.Model):
     twitter = db.Column(db.String(255))     # Twitter profile
     phone = db.Column(db.String(20))        # Phone number
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Also bumped by edits to the owner's name, skills, experience and education; ETag stamps read it
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     user = db.relationship('User', backref=db.backref('profile', uselist=False))
 
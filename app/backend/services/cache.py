@@ -0,0 +1,376 @@
+"""
+Two-tier cache for read paths (feed pages, profiles, job listings).
+
+- Local tier: a bounded LRU per process with a TTL per key, guarded by a
+  lock. Always on.
+- Shared tier, chosen by ``CACHE_SHARED_URL`` (empty by default):
+  ``sqlite:////path/cache.db`` is a SQLite (WAL) file every worker on the
+  host reads, a local stand-in for ``redis://host:6379/0``, which needs the
+  optional ``redis`` package.
+
+Entries carry tags (``posts``, ``jobs``, ``profile:<user id>``) and writers
+call ``invalidate(*tags)`` after they commit. That drops the entries from
+this process's LRU and from the shared tier. Other workers' LRU copies are
+not reached, so with a shared tier local copies live at most
+``CACHE_LOCAL_TTL_SECONDS``; that is the staleness bound across workers.
+
+``get_or_set`` fills a missing key once per process: threads that miss
+while another is producing the same key wait for its value (see
+``utils.single_flight``), so an expiring hot entry is rebuilt once rather
+than by every request that arrives before it is back.
+
+Values must be JSON serialisable and are shared between callers: treat
+what ``get`` returns as read-only. Hits and misses per key namespace (the
+part before the first ``:``) show up at ``/metrics``.
+"""
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+
+from utils.single_flight import SingleFlight
+
+MISSING = object()
+# Tag sets in Redis outlive any entry they point to; stale members are harmless
+REDIS_TAG_TTL = 86400
+
+
+class CacheStats:
+    """Lookups per (namespace, result) where result is local_hit, shared_hit or miss"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.lookups = {}
+        self.invalidations = 0
+
+    def record(self, key, result):
+        namespace = key.split(':', 1)[0]
+        with self._lock:
+            self.lookups[(namespace, result)] = self.lookups.get((namespace, result), 0) + 1
+
+    def hit_ratio(self, namespace=None):
+        hits = total = 0
+        with self._lock:
+            for (name, result), count in self.lookups.items():
+                if namespace is None or name == namespace:
+                    total += count
+                    hits += count if result != 'miss' else 0
+        return hits / total if total else None
+
+
+class LRUCache:
+    """In-process tier: OrderedDict in LRU order plus a tag -> keys index"""
+
+    def __init__(self, max_entries=10000):
+        self._max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires_at, value, tags)
+        self._tags = {}
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return MISSING
+            if entry[0] <= time.monotonic():
+                self._remove(key)
+                return MISSING
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, ttl, tags=()):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + ttl, value, tags)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self._max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, key):
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def invalidate(self, tags):
+        with self._lock:
+            for tag in tags:
+                for key in list(self._tags.get(tag, ())):
+                    self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+
+
+class SharedStore:
+    """Interface of the shared tier"""
+
+    def get(self, key):
+        """(value, tags, expires_at epoch seconds) or MISSING"""
+        raise NotImplementedError
+
+    def set(self, key, value, ttl, tags=()):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def invalidate(self, tags):
+        """Drop every entry carrying any of tags"""
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+
+class SQLiteStore(SharedStore):
+    """Entries and their tags in a SQLite file shared by the workers on one host"""
+
+    def __init__(self, path, purge_every=1000):
+        self._path = path
+        self._local = threading.local()
+        self._purge_every = purge_every
+        self._writes = 0
+        conn = self._connect()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('CREATE TABLE IF NOT EXISTS entries ('
+                     'key TEXT PRIMARY KEY, value TEXT NOT NULL, tags TEXT NOT NULL, expires_at REAL NOT NULL)')
+        conn.execute('CREATE TABLE IF NOT EXISTS entry_tags (tag TEXT NOT NULL, key TEXT NOT NULL, PRIMARY KEY (tag, key))')
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self._path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def get(self, key):
+        row = self._connect().execute(
+            'SELECT value, tags, expires_at FROM entries WHERE key = ? AND expires_at > ?', (key, time.time())
+        ).fetchone()
+        return MISSING if row is None else (json.loads(row[0]), tuple(json.loads(row[1])), row[2])
+
+    def set(self, key, value, ttl, tags=()):
+        conn = self._connect()
+        now = time.time()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute('INSERT OR REPLACE INTO entries (key, value, tags, expires_at) VALUES (?, ?, ?, ?)',
+                         (key, json.dumps(value, separators=(',', ':')), json.dumps(tags), now + ttl))
+            conn.executemany('INSERT OR IGNORE INTO entry_tags (tag, key) VALUES (?, ?)', [(tag, key) for tag in tags])
+        self._writes += 1
+        if self._writes % self._purge_every == 0:
+            self._purge(now)
+
+    def _purge(self, now):
+        conn = self._connect()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute('DELETE FROM entries WHERE expires_at <= ?', (now,))
+            conn.execute('DELETE FROM entry_tags WHERE key NOT IN (SELECT key FROM entries)')
+
+    def delete(self, key):
+        conn = self._connect()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute('DELETE FROM entries WHERE key = ?', (key,))
+            conn.execute('DELETE FROM entry_tags WHERE key = ?', (key,))
+
+    def invalidate(self, tags):
+        conn = self._connect()
+        marks = ','.join('?' * len(tags))
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute(f'DELETE FROM entries WHERE key IN (SELECT key FROM entry_tags WHERE tag IN ({marks}))', tags)
+            conn.execute(f'DELETE FROM entry_tags WHERE tag IN ({marks})', tags)
+
+    def clear(self):
+        conn = self._connect()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute('DELETE FROM entries')
+            conn.execute('DELETE FROM entry_tags')
+
+
+class RedisStore(SharedStore):
+    """Entries as Redis strings with expiry; each tag is a set of the keys carrying it"""
+
+    def __init__(self, url, prefix='prok:cache:'):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError('CACHE_SHARED_URL=redis://... needs the redis package (pip install redis)')
+        self._client = redis.Redis.from_url(url)
+        self._prefix = prefix
+
+    def get(self, key):
+        payload = self._client.get(self._prefix + key)
+        if payload is None:
+            return MISSING
+        value, tags, expires_at = json.loads(payload)
+        return value, tuple(tags), expires_at
+
+    def set(self, key, value, ttl, tags=()):
+        pipe = self._client.pipeline()
+        payload = json.dumps([value, list(tags), time.time() + ttl], separators=(',', ':'))
+        pipe.set(self._prefix + key, payload, ex=max(1, int(ttl)))
+        for tag in tags:
+            tag_key = f'{self._prefix}tag:{tag}'
+            pipe.sadd(tag_key, key)
+            pipe.expire(tag_key, max(REDIS_TAG_TTL, int(ttl)))
+        pipe.execute()
+
+    def delete(self, key):
+        self._client.delete(self._prefix + key)
+
+    def invalidate(self, tags):
+        for tag in tags:
+            tag_key = f'{self._prefix}tag:{tag}'
+            keys = self._client.smembers(tag_key)
+            pipe = self._client.pipeline()
+            if keys:
+                pipe.delete(*[self._prefix + key.decode() for key in keys])
+            pipe.delete(tag_key)
+            pipe.execute()
+
+    def clear(self):
+        keys = list(self._client.scan_iter(match=self._prefix + '*', count=1000))
+        for start in range(0, len(keys), 1000):
+            self._client.delete(*keys[start:start + 1000])
+
+
+class Cache:
+    """The local LRU in front of an optional SharedStore"""
+
+    def __init__(self, local, shared=None, local_ttl=None):
+        self.local = local
+        self.shared = shared
+        self.local_ttl = local_ttl
+        self.stats = CacheStats()
+        self.fills = SingleFlight()
+
+    def _local_ttl(self, ttl):
+        return min(ttl, self.local_ttl) if self.shared is not None and self.local_ttl else ttl
+
+    def get(self, key, default=None):
+        value = self.local.get(key)
+        if value is not MISSING:
+            self.stats.record(key, 'local_hit')
+            return value
+        if self.shared is not None:
+            entry = self.shared.get(key)
+            if entry is not MISSING:
+                value, tags, expires_at = entry
+                self.stats.record(key, 'shared_hit')
+                self.local.set(key, value, self._local_ttl(max(0.0, expires_at - time.time())), tags)
+                return value
+        self.stats.record(key, 'miss')
+        return default
+
+    def set(self, key, value, ttl, tags=()):
+        tags = tuple(tags)
+        self.local.set(key, value, self._local_ttl(ttl), tags)
+        if self.shared is not None:
+            self.shared.set(key, value, ttl, tags)
+
+    def get_or_set(self, key, produce, ttl, tags=()):
+        """Cached value of key, or produce() stored under it for ttl seconds; concurrent misses share one produce()"""
+        value = self.get(key, MISSING)
+        if value is MISSING:
+            def fill():
+                value = produce()
+                self.set(key, value, ttl, tags)
+                return value
+            value = self.fills.do(key, fill, name=key.split(':', 1)[0])
+        return value
+
+    def delete(self, key):
+        self.local.delete(key)
+        if self.shared is not None:
+            self.shared.delete(key)
+
+    def invalidate(self, *tags):
+        """Drop every entry carrying any of tags, here and in the shared tier"""
+        if not tags:
+            return
+        self.stats.invalidations += 1
+        self.local.invalidate(tags)
+        if self.shared is not None:
+            self.shared.invalidate(tags)
+
+    def clear(self):
+        self.local.clear()
+        if self.shared is not None:
+            self.shared.clear()
+
+    def render_metrics(self):
+        """Prometheus text for the /metrics endpoint"""
+        lines = ['# HELP cache_lookups_total Cache lookups by key namespace and result.',
+                 '# TYPE cache_lookups_total counter']
+        for (namespace, result), count in sorted(self.stats.lookups.items()):
+            lines.append(f'cache_lookups_total{{namespace="{namespace}",result="{result}"}} {count}')
+        lines += ['# HELP cache_local_entries Entries in this process\'s LRU tier.',
+                  '# TYPE cache_local_entries gauge',
+                  f'cache_local_entries {len(self.local)}',
+                  '# HELP cache_evictions_total LRU evictions from this process\'s tier.',
+                  '# TYPE cache_evictions_total counter',
+                  f'cache_evictions_total {self.local.evictions}',
+                  '# HELP cache_invalidations_total invalidate() calls.',
+                  '# TYPE cache_invalidations_total counter',
+                  f'cache_invalidations_total {self.stats.invalidations}',
+                  '# HELP cache_fills_total get_or_set misses by namespace; followers waited for another thread\'s fill.',
+                  '# TYPE cache_fills_total counter']
+        for (namespace, role), count in sorted(self.fills.counts.items()):
+            lines.append(f'cache_fills_total{{namespace="{namespace}",role="{role}"}} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+def create_shared_store(url):
+    if not url:
+        return None
+    if url.startswith('sqlite:///'):
+        return SQLiteStore(url[len('sqlite:///'):])
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisStore(url)
+    raise ValueError(f'Unsupported CACHE_SHARED_URL: {url}')
+
+
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """The current app's cache, created on first use"""
+    app = current_app._get_current_object()
+    cache = app.extensions.get('cache')
+    if cache is None:
+        with _cache_lock:
+            cache = app.extensions.get('cache')
+            if cache is None:
+                cache = Cache(LRUCache(app.config['CACHE_MAX_ENTRIES']),
+                              create_shared_store(app.config['CACHE_SHARED_URL']),
+                              app.config['CACHE_LOCAL_TTL_SECONDS'])
+                metrics = app.extensions.get('metrics')
+                if metrics is not None:
+                    metrics.add_collector(cache.render_metrics)
+                app.extensions['cache'] = cache
+    return cache
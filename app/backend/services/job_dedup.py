@@ -0,0 +1,196 @@
+"""
+MinHash / LSH index for spotting near-duplicate job postings.
+
+A job's description and requirements are cut into word 3-gram shingles and
+summarised by a 128 value MinHash signature, whose agreement rate estimates
+the Jaccard similarity of two shingle sets. Signatures are split into 16
+bands of 8 rows; jobs sharing any band bucket become candidates (the LSH
+S-curve puts the 50% detection point near a similarity of 0.71), and only
+those candidates are verified against their stored signatures. A lookup is
+therefore a handful of dict probes instead of a pairwise scan.
+
+Like the recommender, the index is process local, built lazily from active
+jobs and kept current by create_job plus an ``id > max_id`` catch-up. Jobs
+closed or expired elsewhere (the sweeper runs in its own process) stay in
+it until the background rebuild after ``JOB_DUPLICATE_REBUILD_SECONDS``
+(services/rebuilding_index.py), so ``query_live`` checks matches against the jobs table before they are
+reported, and drops the dead ones.
+"""
+import time
+import zlib
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import or_
+from sqlalchemy.orm import load_only
+
+from models.job import Job
+from services.rebuilding_index import RebuildingIndex
+from utils.text import tokenize
+
+NUM_PERM = 128
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 3
+BUILD_BATCH_SIZE = 2000
+
+# Universal hashing (a * x + b) mod p with p < 2**32, so every product fits in uint64
+_PRIME = np.uint64(4294967291)
+_rng = np.random.RandomState(20240601)
+_A = _rng.randint(1, 4294967291, size=NUM_PERM, dtype=np.uint64)[:, None]
+_B = _rng.randint(0, 4294967291, size=NUM_PERM, dtype=np.uint64)[:, None]
+_EMPTY = np.full(NUM_PERM, 4294967295, dtype=np.uint32)
+
+
+def shingles(*texts):
+    """Hashed word k-gram shingles of the given texts (k-grams never span two texts)"""
+    grams = []
+    for text in texts:
+        tokens = tokenize(text)
+        if len(tokens) < SHINGLE_SIZE:
+            grams.extend([' '.join(tokens)] if tokens else [])
+        else:
+            grams.extend(' '.join(tokens[i:i + SHINGLE_SIZE]) for i in range(len(tokens) - SHINGLE_SIZE + 1))
+    return np.unique(np.fromiter((zlib.crc32(g.encode()) for g in grams), dtype=np.uint64))
+
+
+def minhash(*texts):
+    """MinHash signature (uint32[NUM_PERM]) of the texts' shingle set"""
+    values = shingles(*texts)
+    if not len(values):
+        return _EMPTY.copy()
+    values %= _PRIME
+    return ((_A * values[None, :] + _B) % _PRIME).min(axis=1).astype(np.uint32)
+
+
+def job_signature(job):
+    return minhash(job.description, job.requirements)
+
+
+def similarity(sig_a, sig_b):
+    """Estimated Jaccard similarity of two signatures"""
+    return float(np.count_nonzero(sig_a == sig_b)) / NUM_PERM
+
+
+class JobDuplicateIndex(RebuildingIndex):
+    """LSH buckets over job signatures"""
+
+    rebuild_setting = 'JOB_DUPLICATE_REBUILD_SECONDS'
+    thread_name = 'job-duplicate-rebuild'
+
+    def __init__(self):
+        super().__init__()
+        self._reset()
+
+    def _reset(self):
+        self._buckets = [dict() for _ in range(BANDS)]  # band -> {band bytes: [job ids]}
+        self._signatures = {}                            # job id -> signature
+        self._max_job_id = 0
+
+    def _band_keys(self, signature):
+        raw = signature.tobytes()
+        step = ROWS * signature.itemsize
+        return [raw[band * step:(band + 1) * step] for band in range(BANDS)]
+
+    def add(self, job_id, signature):
+        with self._lock:
+            if job_id in self._signatures:
+                return
+            self._signatures[job_id] = signature
+            for bucket, key in zip(self._buckets, self._band_keys(signature)):
+                bucket.setdefault(key, []).append(job_id)
+            self._max_job_id = max(self._max_job_id, job_id)
+
+    def discard(self, job_ids):
+        with self._lock:
+            for job_id in job_ids:
+                signature = self._signatures.pop(job_id, None)
+                if signature is None:
+                    continue
+                for bucket, key in zip(self._buckets, self._band_keys(signature)):
+                    members = bucket.get(key)
+                    if members and job_id in members:
+                        members.remove(job_id)
+                        if not members:
+                            del bucket[key]
+
+    def query(self, signature, threshold=0.7, exclude_id=None):
+        """Return [(job_id, similarity)] of indexed jobs at or above threshold, best first"""
+        if (signature == _EMPTY).all():
+            return []
+        with self._lock:
+            candidates = set()
+            for bucket, key in zip(self._buckets, self._band_keys(signature)):
+                candidates.update(bucket.get(key, ()))
+            candidates.discard(exclude_id)
+            matches = [(job_id, similarity(signature, self._signatures[job_id])) for job_id in candidates]
+        return sorted((m for m in matches if m[1] >= threshold), key=lambda m: -m[1])
+
+    def query_live(self, signature, threshold=0.7, now=None):
+        """query() limited to jobs that are still listed (active and not expired); the rest leave the index"""
+        matches = self.query(signature, threshold)
+        if not matches:
+            return matches
+        now = now or datetime.utcnow()
+        live = {job_id for (job_id,) in Job.query.with_entities(Job.id).filter(
+            Job.id.in_([job_id for job_id, _ in matches]),
+            Job.is_active == True,  # noqa: E712
+            or_(Job.expires_at.is_(None), Job.expires_at > now)
+        )}
+        self.discard([job_id for job_id, _ in matches if job_id not in live])
+        return [match for match in matches if match[0] in live]
+
+    def clusters(self, threshold=0.7):
+        """Group indexed jobs with their near-duplicates; returns clusters of two or more ids"""
+        parent = {}
+
+        def find(job_id):
+            root = parent.setdefault(job_id, job_id)
+            while parent[root] != root:
+                root = parent[root]
+            while parent[job_id] != root:
+                parent[job_id], job_id = root, parent[job_id]
+            return root
+
+        with self._lock:
+            for job_id, signature in self._signatures.items():
+                for other_id, _ in self.query(signature, threshold, exclude_id=job_id):
+                    root_a, root_b = find(job_id), find(other_id)
+                    if root_a != root_b:
+                        parent[max(root_a, root_b)] = min(root_a, root_b)
+        groups = {}
+        for job_id in parent:
+            groups.setdefault(find(job_id), []).append(job_id)
+        return sorted((sorted(members) for members in groups.values() if len(members) > 1),
+                      key=lambda group: (-len(group), group[0]))
+
+    def _load(self, min_id=0, include_inactive=False):
+        query = (Job.query
+                 .options(load_only(Job.id, Job.description, Job.requirements))
+                 .filter(Job.id > min_id)
+                 .order_by(Job.id.asc()))
+        if not include_inactive:
+            query = query.filter(Job.is_active == True)  # noqa: E712
+        for job in query.yield_per(BUILD_BATCH_SIZE):
+            yield job.id, job_signature(job)
+
+    def build(self, include_inactive=False):
+        """(Re)build the index from the jobs table; lookups keep using the old one until it is done"""
+        fresh = JobDuplicateIndex()
+        for job_id, signature in self._load(include_inactive=include_inactive):
+            fresh.add(job_id, signature)
+        with self._lock:
+            self._buckets, self._signatures, self._max_job_id = fresh._buckets, fresh._signatures, fresh._max_job_id
+            self._built = True
+            self._built_at = time.monotonic()
+        return self
+
+    def _catch_up(self):
+        for job_id, signature in self._load(self._max_job_id):
+            self.add(job_id, signature)
+
+    def __len__(self):
+        return len(self._signatures)
+
+
+duplicate_index = JobDuplicateIndex()
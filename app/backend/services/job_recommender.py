@@ -0,0 +1,172 @@
+"""
+Hashed-feature TF-IDF index used to recommend active job listings.
+
+Every active job is turned into a sparse vector of hashed unigram/bigram
+features taken from its title, requirements and description. Vectors are
+stored column-wise as posting lists (feature -> rows, weights) so a query
+only touches the features it actually contains, and the whole active set
+is scored with a single NumPy ``bincount`` (a sparse matrix-vector product).
+
+The index lives in process memory. It is built lazily on first use, new
+jobs are appended incrementally (``add_job`` from ``create_job`` plus a
+cheap ``id > max_id`` catch-up for jobs created by other workers), and it
+is rebuilt in the background once it is older than
+``JOB_RECOMMENDER_REBUILD_SECONDS`` so deactivations made elsewhere are
+eventually dropped (services/rebuilding_index.py). Until then
+get_recommended_jobs filters the matches on ``is_active``.
+"""
+import math
+import time
+import zlib
+from array import array
+
+import numpy as np
+from sqlalchemy.orm import load_only
+
+from models.job import Job
+from services.rebuilding_index import RebuildingIndex
+from utils.text import tokenize
+
+N_FEATURES = 1 << 20
+FIELD_WEIGHTS = {'title': 3.0, 'requirements': 2.0, 'description': 1.0}
+SKILL_WEIGHT = 2.0
+EXPERIENCE_WEIGHT = 1.0
+BUILD_BATCH_SIZE = 2000
+
+
+def hashed_features(text, weight, counts):
+    """Add weighted unigram and bigram feature counts for text into counts"""
+    tokens = tokenize(text)
+    for i, token in enumerate(tokens):
+        feature = zlib.crc32(token.encode()) & (N_FEATURES - 1)
+        counts[feature] = counts.get(feature, 0.0) + weight
+        if i:
+            bigram = f'{tokens[i - 1]} {token}'
+            feature = zlib.crc32(bigram.encode()) & (N_FEATURES - 1)
+            counts[feature] = counts.get(feature, 0.0) + weight
+    return counts
+
+
+def normalize(counts):
+    """Sublinear tf scaling followed by L2 normalisation"""
+    weights = {f: 1.0 + math.log(c) if c >= 1 else c for f, c in counts.items()}
+    norm = math.sqrt(sum(w * w for w in weights.values()))
+    if not norm:
+        return {}
+    return {f: w / norm for f, w in weights.items()}
+
+
+def job_vector(job):
+    counts = {}
+    for field, weight in FIELD_WEIGHTS.items():
+        hashed_features(getattr(job, field), weight, counts)
+    return normalize(counts)
+
+
+def profile_vector(skills, experience_titles):
+    counts = {}
+    for skill in skills:
+        hashed_features(skill, SKILL_WEIGHT, counts)
+    for title in experience_titles:
+        hashed_features(title, EXPERIENCE_WEIGHT, counts)
+    return normalize(counts)
+
+
+class JobRecommender(RebuildingIndex):
+    """In-memory inverted index of active jobs, scored with NumPy"""
+
+    rebuild_setting = 'JOB_RECOMMENDER_REBUILD_SECONDS'
+    thread_name = 'job-recommender-rebuild'
+
+    def __init__(self):
+        super().__init__()
+        self._reset()
+
+    def _reset(self):
+        self._job_ids = array('i')      # row -> job id
+        self._rows = {}                 # job id -> row
+        self._postings = {}             # feature -> (array('i') rows, array('f') weights)
+        self._max_job_id = 0
+
+    def _add(self, job_id, vector):
+        if job_id in self._rows or not vector:
+            return
+        row = len(self._job_ids)
+        self._job_ids.append(job_id)
+        self._rows[job_id] = row
+        for feature, weight in vector.items():
+            posting = self._postings.get(feature)
+            if posting is None:
+                posting = self._postings[feature] = (array('i'), array('f'))
+            posting[0].append(row)
+            posting[1].append(weight)
+        self._max_job_id = max(self._max_job_id, job_id)
+
+    def _load(self, min_id=0):
+        """Yield (id, vector) for active jobs with id > min_id in id order"""
+        query = (Job.query
+                 .options(load_only(Job.id, Job.title, Job.description, Job.requirements))
+                 .filter(Job.is_active == True, Job.id > min_id)  # noqa: E712
+                 .order_by(Job.id.asc()))
+        for job in query.yield_per(BUILD_BATCH_SIZE):
+            yield job.id, job_vector(job)
+
+    def build(self):
+        """(Re)build the whole index from the database"""
+        fresh = JobRecommender()
+        for job_id, vector in self._load():
+            fresh._add(job_id, vector)
+        with self._lock:
+            self._job_ids, self._rows = fresh._job_ids, fresh._rows
+            self._postings, self._max_job_id = fresh._postings, fresh._max_job_id
+            self._built = True
+            self._built_at = time.monotonic()
+
+    def _catch_up(self):
+        for job_id, vector in self._load(self._max_job_id):
+            self._add(job_id, vector)
+
+    def add_job(self, job):
+        """Index a newly created job (no-op until the index has been built)"""
+        if not self._built or not job.is_active:
+            return
+        vector = job_vector(job)
+        with self._lock:
+            self._add(job.id, vector)
+
+    def recommend(self, skills, experience_titles, limit=10, exclude_ids=()):
+        """Return [(job_id, score)] best matches, highest score first"""
+        query = profile_vector(skills, experience_titles)
+        if not query:
+            return []
+        self.ensure_fresh()
+        with self._lock:
+            n_rows = len(self._job_ids)
+            if not n_rows:
+                return []
+            rows_parts, weight_parts = [], []
+            for feature, query_weight in query.items():
+                posting = self._postings.get(feature)
+                if posting is None:
+                    continue
+                rows = np.frombuffer(posting[0], dtype=np.int32)
+                idf = math.log((1 + n_rows) / (1 + len(rows))) + 1.0
+                rows_parts.append(rows)
+                weight_parts.append(np.frombuffer(posting[1], dtype=np.float32) * (query_weight * idf * idf))
+            if not rows_parts:
+                return []
+            scores = np.bincount(np.concatenate(rows_parts),
+                                 weights=np.concatenate(weight_parts),
+                                 minlength=n_rows)
+            for job_id in exclude_ids:
+                row = self._rows.get(job_id)
+                if row is not None:
+                    scores[row] = 0.0
+            k = min(limit, n_rows)
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top], kind='stable')]
+            job_ids = np.frombuffer(self._job_ids, dtype=np.int32)
+            return [(int(job_ids[row]), float(scores[row])) for row in top if scores[row] > 0]
+
+
+job_index = JobRecommender()
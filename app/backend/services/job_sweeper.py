@@ -0,0 +1,105 @@
+"""
+Job expiry sweeper and archiver.
+
+Both passes work in bounded batches of primary keys and commit after each
+batch, so locks are short and a run can be interrupted at any point without
+leaving half-moved rows behind. Meant to be run on a schedule through the
+``flask jobs sweep`` command (see commands.py).
+
+The sweeper runs in its own process, so it leaves the web workers' in-memory
+state alone: clearing its own copy of the caches or indexes would never
+reach them. Workers see the sweep through the database instead. The bulk
+updates and deletes bump the ``jobs`` data version (models/data_version.py),
+which changes the ETag of job lists, and with it their cache keys.
+Deactivated and deleted jobs also drop out of the detail stamp. The
+recommender and duplicate index filter their matches on ``is_active`` at
+query time, and both rebuild on a timer.
+"""
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, literal, select
+
+from models import db
+from models.job import Job, JobApplication, JobApplicationCount, JobArchive, JobApplicationArchive
+
+JOB_COLUMNS = ('id', 'title', 'company', 'location', 'description', 'requirements', 'salary_range',
+               'job_type', 'posted_by', 'created_at', 'updated_at', 'is_active', 'expires_at')
+APPLICATION_COLUMNS = ('id', 'job_id', 'user_id', 'status', 'applied_at', 'cover_letter')
+
+
+class SweepStats:
+    """Rows processed by one sweeper pass and how fast"""
+
+    def __init__(self, name):
+        self.name = name
+        self.batches = 0
+        self.rows = 0
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    def add_batch(self, rows):
+        self.batches += 1
+        self.rows += rows
+        self.elapsed = time.perf_counter() - self.started
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+    def __str__(self):
+        return (f'{self.name}: {self.rows} rows in {self.batches} batches, '
+                f'{self.elapsed:.2f}s ({self.rows_per_second:.0f} rows/s)')
+
+
+def deactivate_expired_jobs(batch_size=500, now=None):
+    """Set is_active=False on active jobs whose expires_at has passed"""
+    now = now or datetime.utcnow()
+    stats = SweepStats('deactivated')
+    while True:
+        ids = [job_id for (job_id,) in db.session.query(Job.id)
+               .filter(Job.is_active == True, Job.expires_at <= now)  # noqa: E712
+               .order_by(Job.id)
+               .limit(batch_size)]
+        if not ids:
+            break
+        Job.query.filter(Job.id.in_(ids)).update(
+            {Job.is_active: False, Job.updated_at: now}, synchronize_session=False
+        )
+        db.session.commit()
+        stats.add_batch(len(ids))
+    return stats
+
+
+def archive_inactive_jobs(older_than_days=90, batch_size=200, now=None):
+    """
+    Move jobs that have been inactive for older_than_days, together with their
+    applications, into jobs_archive / job_applications_archive.
+    """
+    now = now or datetime.utcnow()
+    cutoff = now - timedelta(days=older_than_days)
+    jobs_stats = SweepStats('archived jobs')
+    applications_stats = SweepStats('archived applications')
+    while True:
+        ids = [job_id for (job_id,) in db.session.query(Job.id)
+               .filter(Job.is_active == False, Job.updated_at < cutoff)  # noqa: E712
+               .order_by(Job.id)
+               .limit(batch_size)]
+        if not ids:
+            break
+        db.session.execute(insert(JobArchive).from_select(
+            JOB_COLUMNS + ('archived_at',),
+            select(*[getattr(Job, column) for column in JOB_COLUMNS], literal(now)).where(Job.id.in_(ids))
+        ))
+        moved = db.session.execute(insert(JobApplicationArchive).from_select(
+            APPLICATION_COLUMNS + ('archived_at',),
+            select(*[getattr(JobApplication, column) for column in APPLICATION_COLUMNS], literal(now))
+            .where(JobApplication.job_id.in_(ids))
+        )).rowcount
+        JobApplicationCount.query.filter(JobApplicationCount.job_id.in_(ids)).delete(synchronize_session=False)
+        JobApplication.query.filter(JobApplication.job_id.in_(ids)).delete(synchronize_session=False)
+        Job.query.filter(Job.id.in_(ids)).delete(synchronize_session=False)
+        db.session.commit()
+        jobs_stats.add_batch(len(ids))
+        applications_stats.add_batch(max(moved, 0))
+    return jobs_stats, applications_stats
@@ -0,0 +1,200 @@
+"""
+Cold storage for old messages.
+
+``archive_old_messages`` moves the oldest messages of each conversation
+(everything created before the cutoff) out of ``messages`` into
+``message_archive_blocks``: one row per run of up to ``block_size``
+consecutive messages, stored as zlib-compressed JSON together with the
+(created_at, id) range it covers. Each block is written and its messages
+deleted in one short transaction, so the job can be stopped at any point.
+
+Because only the oldest messages are ever archived, a conversation's history
+is always "blocks, then hot rows", and ``archived_before`` /
+``archived_after`` let ``get_messages`` continue a cursor into the blocks
+without the client noticing. Archived messages count as read and are no
+longer returned by search.
+"""
+import json
+import math
+import zlib
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, func, or_
+
+from models import db
+from models.message import Conversation, Message, MessageArchiveBlock, MessageSearchTerm, UserUnreadCount
+from services.job_sweeper import SweepStats
+
+CONVERSATION_BATCH_SIZE = 500
+# Entries per B-tree page for the (conversation_id, created_at, id) index: ~16KB pages of ~40 byte entries
+INDEX_FANOUT = 400
+
+ArchivedMessage = namedtuple('ArchivedMessage', 'id conversation_id sender_id content created_at is_read')
+
+
+def pack_block(rows):
+    """Compress [(id, sender_id, content, created_at, is_read)] in (created_at, id) order"""
+    return zlib.compress(json.dumps(
+        [[row[0], row[1], row[2], row[3].isoformat(), bool(row[4])] for row in rows],
+        separators=(',', ':')
+    ).encode())
+
+
+def unpack_block(block):
+    return [
+        ArchivedMessage(message_id, block.conversation_id, sender_id, content, datetime.fromisoformat(created_at), is_read)
+        for message_id, sender_id, content, created_at, is_read in json.loads(zlib.decompress(block.payload))
+    ]
+
+
+def archived_before(conversation_id, boundary, limit):
+    """Up to limit archived messages older than boundary (created_at, id) or the newest ones, newest first"""
+    query = MessageArchiveBlock.query.filter_by(conversation_id=conversation_id)
+    if boundary:
+        query = query.filter(or_(
+            MessageArchiveBlock.first_created_at < boundary[0],
+            and_(MessageArchiveBlock.first_created_at == boundary[0], MessageArchiveBlock.first_message_id < boundary[1])
+        ))
+    query = query.order_by(MessageArchiveBlock.last_created_at.desc(), MessageArchiveBlock.last_message_id.desc())
+    messages = []
+    for block in query.yield_per(4):
+        for message in reversed(unpack_block(block)):
+            if boundary is None or (message.created_at, message.id) < tuple(boundary):
+                messages.append(message)
+                if len(messages) == limit:
+                    return messages
+    return messages
+
+
+def archived_after(conversation_id, boundary, limit):
+    """Up to limit archived messages newer than boundary (created_at, id), oldest first"""
+    query = (MessageArchiveBlock.query
+             .filter_by(conversation_id=conversation_id)
+             .filter(or_(
+                 MessageArchiveBlock.last_created_at > boundary[0],
+                 and_(MessageArchiveBlock.last_created_at == boundary[0], MessageArchiveBlock.last_message_id > boundary[1])
+             ))
+             .order_by(MessageArchiveBlock.last_created_at.asc(), MessageArchiveBlock.last_message_id.asc()))
+    messages = []
+    for block in query.yield_per(4):
+        for message in unpack_block(block):
+            if (message.created_at, message.id) > tuple(boundary):
+                messages.append(message)
+                if len(messages) == limit:
+                    return messages
+    return messages
+
+
+def iter_archived(conversation_id):
+    """Every archived message of the conversation, oldest first, a few blocks in memory at a time"""
+    query = (MessageArchiveBlock.query
+             .filter_by(conversation_id=conversation_id)
+             .order_by(MessageArchiveBlock.last_created_at.asc(), MessageArchiveBlock.last_message_id.asc()))
+    for block in query.yield_per(4):
+        yield from unpack_block(block)
+
+
+def _release_unread(conversation, rows):
+    """Archived messages count as read: take unread ones off the recipients' counters"""
+    unread = {}
+    for _, sender_id, _, _, is_read in rows:
+        if not is_read:
+            recipient_id = conversation.user2_id if sender_id == conversation.user1_id else conversation.user1_id
+            unread[recipient_id] = unread.get(recipient_id, 0) + 1
+    for recipient_id, count in unread.items():
+        column = (Conversation.user1_unread_count if recipient_id == conversation.user1_id
+                  else Conversation.user2_unread_count)
+        # updated_at orders the inbox: pin it against its onupdate, archiving is not activity
+        Conversation.query.filter_by(id=conversation.id).update(
+            {column: db.case((column > count, column - count), else_=0),
+             Conversation.updated_at: Conversation.updated_at},
+            synchronize_session=False
+        )
+        UserUnreadCount.query.filter_by(user_id=recipient_id).update(
+            {UserUnreadCount.total: db.case((UserUnreadCount.total > count, UserUnreadCount.total - count), else_=0)},
+            synchronize_session=False
+        )
+
+
+def _archive_block(conversation, rows, now):
+    ids = [row[0] for row in rows]
+    db.session.add(MessageArchiveBlock(
+        conversation_id=conversation.id,
+        first_message_id=rows[0][0],
+        first_created_at=rows[0][3],
+        last_message_id=rows[-1][0],
+        last_created_at=rows[-1][3],
+        message_count=len(rows),
+        payload=pack_block(rows),
+        archived_at=now,
+    ))
+    _release_unread(conversation, rows)
+    MessageSearchTerm.query.filter(MessageSearchTerm.message_id.in_(ids)).delete(synchronize_session=False)
+    Message.query.filter(Message.id.in_(ids)).delete(synchronize_session=False)
+    db.session.commit()
+
+
+def archive_old_messages(older_than_days=365, block_size=200, now=None):
+    """Move messages created more than older_than_days ago into compressed blocks"""
+    now = now or datetime.utcnow()
+    cutoff = now - timedelta(days=older_than_days)
+    stats = SweepStats('archived messages')
+    last_conversation_id = 0
+    while True:
+        conversations = (Conversation.query
+                         .filter(Conversation.id > last_conversation_id)
+                         .order_by(Conversation.id)
+                         .limit(CONVERSATION_BATCH_SIZE)
+                         .all())
+        if not conversations:
+            break
+        for conversation in conversations:
+            while True:
+                rows = (db.session.query(Message.id, Message.sender_id, Message.content, Message.created_at, Message.is_read)
+                        .filter(Message.conversation_id == conversation.id, Message.created_at < cutoff)
+                        .order_by(Message.created_at.asc(), Message.id.asc())
+                        .limit(block_size)
+                        .all())
+                if not rows:
+                    break
+                _archive_block(conversation, rows, now)
+                stats.add_batch(len(rows))
+                if len(rows) < block_size:
+                    break
+        last_conversation_id = conversations[-1].id
+        db.session.expunge_all()
+    return stats
+
+
+def estimated_index_depth(rows, fanout=INDEX_FANOUT):
+    """Levels of a B-tree holding rows entries with the given fanout"""
+    return max(1, math.ceil(math.log(rows, fanout))) if rows > 1 else 1
+
+
+def storage_report():
+    """Row counts, estimated index depth and (on MySQL) on-disk size of the hot and archive tables"""
+    hot_rows = db.session.query(func.count(Message.id)).scalar()
+    blocks, archived_rows, archive_bytes = db.session.query(
+        func.count(MessageArchiveBlock.id),
+        func.coalesce(func.sum(MessageArchiveBlock.message_count), 0),
+        func.coalesce(func.sum(func.length(MessageArchiveBlock.payload)), 0),
+    ).one()
+    report = {
+        'hot_rows': hot_rows,
+        'hot_index_depth': estimated_index_depth(hot_rows),
+        'archived_rows': int(archived_rows),
+        'archive_blocks': blocks,
+        'archive_payload_bytes': int(archive_bytes),
+        'archive_index_depth': estimated_index_depth(blocks),
+    }
+    if db.engine.dialect.name == 'mysql':
+        sizes = db.session.execute(db.text(
+            'SELECT table_name, data_length, index_length FROM information_schema.tables '
+            'WHERE table_schema = DATABASE() AND table_name IN (:hot, :archive)'
+        ), {'hot': Message.__tablename__, 'archive': MessageArchiveBlock.__tablename__})
+        for table_name, data_length, index_length in sizes:
+            prefix = 'hot' if table_name == Message.__tablename__ else 'archive'
+            report[f'{prefix}_data_bytes'] = data_length
+            report[f'{prefix}_index_bytes'] = index_length
+    return report
@@ -0,0 +1,214 @@
+"""
+Pub/sub of messaging events for the SSE and long-poll endpoints.
+
+``send_message`` publishes to each participant's channel (their user id)
+and stream handlers wait on their own channel. Brokers are pluggable via
+``MESSAGE_BROKER_URL``:
+
+- ``memory://`` (default): per-user ring buffers guarded by a Condition.
+  Only sees events published by the same process, so use it with a single
+  worker (threads or gevent).
+- ``sqlite:////path/events.db``: a shared SQLite (WAL) file polled by every
+  worker. A local stand-in for Redis pub/sub when several gunicorn workers
+  run on one host. Events older than the retention window are purged, and
+  the newest purged id of each channel is kept so a client resuming from
+  before it is told it missed events, as with the ring buffers.
+
+Event ids increase per channel, so clients resume with ``Last-Event-ID``.
+"""
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+
+from flask import current_app
+
+
+class MessageBroker:
+    """Interface every broker implements"""
+
+    def publish(self, user_id, event_type, data):
+        """Append an event to user_id's channel and return its id"""
+        raise NotImplementedError
+
+    def latest_event_id(self, user_id):
+        """Id to resume from when a client connects without a Last-Event-ID"""
+        raise NotImplementedError
+
+    def wait(self, user_id, last_event_id, timeout):
+        """
+        Return (events, missed) where events is a list of (id, type, data)
+        newer than last_event_id, waiting up to timeout seconds for one to
+        arrive. missed is True when events after last_event_id were dropped
+        and the client should resynchronise through the REST endpoints; it
+        is reported at once, with or without newer events.
+        """
+        raise NotImplementedError
+
+
+class InProcessBroker(MessageBroker):
+    """Ring buffer of recent events per user, shared by the threads of one process"""
+
+    def __init__(self, buffer_size=100, max_channels=10000):
+        self._buffer_size = buffer_size
+        self._max_channels = max_channels
+        self._channels = OrderedDict()  # user id -> [deque of (id, type, data), last evicted id], LRU ordered
+        self._evicted_through = 0       # newest event id of any channel dropped by the LRU
+        self._condition = threading.Condition()
+        self._last_id = 0
+
+    def _next_id(self):
+        # Millisecond clock based so ids stay increasing across restarts
+        self._last_id = max(self._last_id + 1, int(time.time() * 1000) * 1000)
+        return self._last_id
+
+    def publish(self, user_id, event_type, data):
+        with self._condition:
+            channel = self._channels.get(user_id)
+            if channel is None:
+                # The user's channel may have been dropped before: resuming from before that is a miss
+                channel = self._channels[user_id] = [deque(maxlen=self._buffer_size), self._evicted_through]
+                if len(self._channels) > self._max_channels:
+                    _, (evicted, _) = self._channels.popitem(last=False)
+                    if evicted:
+                        self._evicted_through = max(self._evicted_through, evicted[-1][0])
+            else:
+                self._channels.move_to_end(user_id)
+            events = channel[0]
+            if len(events) == events.maxlen:
+                channel[1] = events[0][0]
+            event_id = self._next_id()
+            events.append((event_id, event_type, data))
+            self._condition.notify_all()
+            return event_id
+
+    def latest_event_id(self, user_id):
+        with self._condition:
+            return self._last_id
+
+    def _pending(self, user_id, last_event_id):
+        channel = self._channels.get(user_id)
+        horizon = channel[1] if channel else self._evicted_through
+        missed = bool(last_event_id) and last_event_id < horizon
+        if not channel or channel[0][-1][0] <= last_event_id:
+            return [], missed
+        return [event for event in channel[0] if event[0] > last_event_id], missed
+
+    def wait(self, user_id, last_event_id, timeout):
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while True:
+                events, missed = self._pending(user_id, last_event_id)
+                remaining = deadline - time.monotonic()
+                if events or missed or remaining <= 0:
+                    return events, missed
+                self._condition.wait(remaining)
+
+
+class SQLiteBroker(MessageBroker):
+    """Events table in a SQLite file that every worker on the host polls"""
+
+    def __init__(self, path, poll_interval=0.25, retention_seconds=3600):
+        self._path = path
+        self._poll_interval = poll_interval
+        self._retention = retention_seconds
+        self._local = threading.local()
+        self._published = 0
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS events ('
+                'id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL, '
+                'type TEXT NOT NULL, data TEXT NOT NULL, created_at REAL NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS ix_events_user_id_id ON events (user_id, id)')
+            # user id -> newest purged event id, the channel's horizon (like the ring buffers' last evicted id)
+            conn.execute('CREATE TABLE IF NOT EXISTS purged (user_id INTEGER PRIMARY KEY, through_id INTEGER NOT NULL)')
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self._path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def publish(self, user_id, event_type, data):
+        conn = self._connect()
+        now = time.time()
+        cursor = conn.execute(
+            'INSERT INTO events (user_id, type, data, created_at) VALUES (?, ?, ?, ?)',
+            (user_id, event_type, json.dumps(data), now)
+        )
+        self._published += 1
+        if self._published % 1000 == 0:
+            self._purge(conn, now - self._retention)
+        return cursor.lastrowid
+
+    def _purge(self, conn, cutoff):
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            # Ids only grow, so the newest purged id of a channel replaces the previous one
+            conn.execute(
+                'INSERT OR REPLACE INTO purged (user_id, through_id) '
+                'SELECT user_id, MAX(id) FROM events WHERE created_at < ? GROUP BY user_id',
+                (cutoff,)
+            )
+            conn.execute('DELETE FROM events WHERE created_at < ?', (cutoff,))
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+    def _missed(self, conn, user_id, last_event_id):
+        if not last_event_id:
+            return False
+        row = conn.execute('SELECT through_id FROM purged WHERE user_id = ?', (user_id,)).fetchone()
+        return row is not None and last_event_id < row[0]
+
+    def latest_event_id(self, user_id):
+        # Never behind the channel's purge horizon, so resuming from it is not reported as a miss
+        row = self._connect().execute(
+            'SELECT MAX(id) FROM (SELECT MAX(id) AS id FROM events WHERE user_id = ? '
+            'UNION ALL SELECT through_id FROM purged WHERE user_id = ?)',
+            (user_id, user_id)
+        ).fetchone()
+        return row[0] or 0
+
+    def wait(self, user_id, last_event_id, timeout):
+        conn = self._connect()
+        deadline = time.monotonic() + timeout
+        missed = self._missed(conn, user_id, last_event_id)
+        while True:
+            rows = conn.execute(
+                'SELECT id, type, data FROM events WHERE user_id = ? AND id > ? ORDER BY id LIMIT 100',
+                (user_id, last_event_id)
+            ).fetchall()
+            if rows or missed or time.monotonic() >= deadline:
+                events = [(event_id, event_type, json.loads(data)) for event_id, event_type, data in rows]
+                # Check again: another worker may have purged while this one waited
+                return events, missed or self._missed(conn, user_id, last_event_id)
+            time.sleep(min(self._poll_interval, max(deadline - time.monotonic(), 0)))
+
+
+def create_broker(url):
+    if url.startswith('memory://'):
+        return InProcessBroker()
+    if url.startswith('sqlite:///'):
+        return SQLiteBroker(url[len('sqlite:///'):])
+    raise ValueError(f'Unsupported MESSAGE_BROKER_URL: {url}')
+
+
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    """The current app's broker, created on first use"""
+    app = current_app._get_current_object()
+    broker = app.extensions.get('message_broker')
+    if broker is None:
+        with _broker_lock:
+            broker = app.extensions.get('message_broker')
+            if broker is None:
+                broker = app.extensions['message_broker'] = create_broker(app.config['MESSAGE_BROKER_URL'])
+    return broker
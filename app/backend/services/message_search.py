@@ -0,0 +1,155 @@
+"""
+Full-text search over a user's messages.
+
+Every message is tokenized once when it is sent and a posting row
+``(user_id, term, message_id, weight)`` is written for each distinct term
+and each participant, so a search only ever touches the caller's own
+postings through the table's primary key. Queries match all of their terms:
+
+1. Each term's posting count is probed (capped) to find the rarest one.
+2. The newest ``CANDIDATE_LIMIT`` postings of the rarest term are the
+   candidate set; the remaining terms are joined onto it by primary key.
+3. Candidates are ranked by summed term weight, ties broken by recency,
+   and paged with a ``(score, message_id)`` keyset cursor.
+
+The candidate window keeps the cost bounded for very common terms; hits
+older than the window are reachable by adding terms or scrolling the
+conversation itself.
+"""
+import math
+import time
+
+from sqlalchemy import and_, func, or_, select
+
+from models import db
+from models.message import Conversation, Message, MessageSearchTerm
+from utils.text import tokenize
+
+MAX_TERM_LENGTH = 64
+MAX_QUERY_TERMS = 8
+CANDIDATE_LIMIT = 5000
+REINDEX_BATCH_SIZE = 1000
+
+STOPWORDS = frozenset((
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'but', 'by', 'for', 'i', 'if', 'in', 'is', 'it',
+    'me', 'my', 'of', 'on', 'or', 'so', 'that', 'the', 'this', 'to', 'was', 'we', 'with', 'you',
+))
+
+_postings = MessageSearchTerm.__table__
+
+
+def search_terms(text):
+    """Distinct indexable terms of text, in order of first occurrence"""
+    return list(dict.fromkeys(
+        token[:MAX_TERM_LENGTH] for token in tokenize(text) if token not in STOPWORDS
+    ))
+
+
+def term_weights(text):
+    """{term: integer weight} with log-scaled term frequency, normalised by message length"""
+    counts = {}
+    for token in tokenize(text):
+        if token not in STOPWORDS:
+            term = token[:MAX_TERM_LENGTH]
+            counts[term] = counts.get(term, 0) + 1
+    if not counts:
+        return {}
+    norm = math.sqrt(len(counts))
+    return {term: max(1, int(1000 * (1 + math.log(tf)) / norm)) for term, tf in counts.items()}
+
+
+def posting_rows(message_id, content, user_ids):
+    return [
+        {'user_id': user_id, 'term': term, 'message_id': message_id, 'weight': weight}
+        for term, weight in term_weights(content).items()
+        for user_id in user_ids
+    ]
+
+
+def index_message(message, user_ids):
+    """Write the message's postings for each participant (in the caller's transaction)"""
+    rows = posting_rows(message.id, message.content, user_ids)
+    if rows:
+        db.session.execute(_postings.insert(), rows)
+
+
+def _term_frequency(user_id, term):
+    capped = (select(_postings.c.message_id)
+              .where(_postings.c.user_id == user_id, _postings.c.term == term)
+              .limit(CANDIDATE_LIMIT + 1)
+              .subquery())
+    return db.session.execute(select(func.count()).select_from(capped)).scalar()
+
+
+def search(user_id, query, limit=20, after=None):
+    """
+    Return [(message_id, score)] for the user's messages containing every
+    term of query, best first. after is the (score, message_id) of the last
+    hit of the previous page.
+    """
+    terms = search_terms(query)[:MAX_QUERY_TERMS]
+    if not terms:
+        return []
+    frequencies = {term: _term_frequency(user_id, term) for term in terms}
+    if not all(frequencies.values()):
+        return []
+    terms.sort(key=frequencies.get)
+
+    rarest = _postings.alias('p0')
+    candidates = (select(rarest.c.message_id, rarest.c.weight)
+                  .where(rarest.c.user_id == user_id, rarest.c.term == terms[0])
+                  .order_by(rarest.c.message_id.desc())
+                  .limit(CANDIDATE_LIMIT)
+                  .subquery('candidates'))
+    joined = candidates
+    score = candidates.c.weight
+    for position, term in enumerate(terms[1:], start=1):
+        other = _postings.alias(f'p{position}')
+        joined = joined.join(other, and_(
+            other.c.user_id == user_id,
+            other.c.term == term,
+            other.c.message_id == candidates.c.message_id,
+        ))
+        score = score + other.c.weight
+
+    statement = select(candidates.c.message_id, score.label('score')).select_from(joined)
+    if after:
+        after_score, after_id = after
+        statement = statement.where(or_(
+            score < after_score,
+            and_(score == after_score, candidates.c.message_id < after_id),
+        ))
+    statement = statement.order_by(score.desc(), candidates.c.message_id.desc()).limit(limit)
+    return [(message_id, int(value)) for message_id, value in db.session.execute(statement)]
+
+
+def reindex(batch_size=REINDEX_BATCH_SIZE, min_id=0):
+    """
+    Rebuild postings for messages with id > min_id in batches, committing
+    after each batch. Returns (messages, postings, elapsed seconds).
+    """
+    started = time.perf_counter()
+    messages = postings = 0
+    last_id = min_id
+    while True:
+        rows = db.session.execute(
+            select(Message.id, Message.content, Conversation.user1_id, Conversation.user2_id)
+            .join(Conversation, Conversation.id == Message.conversation_id)
+            .where(Message.id > last_id)
+            .order_by(Message.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        ids = [row[0] for row in rows]
+        db.session.execute(_postings.delete().where(_postings.c.message_id.in_(ids)))
+        batch = []
+        for message_id, content, user1_id, user2_id in rows:
+            batch.extend(posting_rows(message_id, content, (user1_id, user2_id)))
+        if batch:
+            db.session.execute(_postings.insert(), batch)
+        db.session.commit()
+        messages += len(rows)
+        postings += len(batch)
+        last_id = ids[-1]
+    return messages, postings, time.perf_counter() - started
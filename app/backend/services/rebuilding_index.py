@@ -0,0 +1,59 @@
+"""
+Lifecycle shared by the process-local job indexes (services/job_recommender.py,
+services/job_dedup.py).
+
+An index is built from the database on first use, catches up on rows
+created by other workers with a cheap ``id > max_id`` load on every use, and
+is rebuilt in a background thread once it is older than the config setting
+named by ``rebuild_setting``; lookups keep using the old index meanwhile.
+Subclasses implement ``build`` (set ``_built`` and ``_built_at`` when the new
+index is swapped in) and ``_catch_up``.
+"""
+import threading
+import time
+
+from flask import current_app
+
+
+class RebuildingIndex:
+    """Base class for an in-memory index rebuilt from the database on a timer"""
+
+    rebuild_setting = None  # config key: maximum age in seconds before a background rebuild
+    thread_name = 'index-rebuild'
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._built = False
+        self._built_at = 0.0
+        self._rebuilding = False
+
+    def build(self):
+        raise NotImplementedError
+
+    def _catch_up(self):
+        """Add rows created since the last build or catch-up (called with the lock held)"""
+        raise NotImplementedError
+
+    def _rebuild_in_background(self, app):
+        def run():
+            try:
+                with app.app_context():
+                    self.build()
+            finally:
+                self._rebuilding = False
+
+        self._rebuilding = True
+        threading.Thread(target=run, name=self.thread_name, daemon=True).start()
+
+    def ensure_fresh(self):
+        """Build on first use, catch up on rows created by other workers, rebuild when stale"""
+        if not self._built:
+            with self._lock:
+                if not self._built:
+                    self.build()
+            return
+        max_age = current_app.config.get(self.rebuild_setting, 3600)
+        if not self._rebuilding and time.monotonic() - self._built_at > max_age:
+            self._rebuild_in_background(current_app._get_current_object())
+        with self._lock:
+            self._catch_up()
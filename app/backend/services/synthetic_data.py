@@ -0,0 +1,364 @@
+"""
+Deterministic synthetic data for scale testing (``flask data generate``).
+
+Distributions are skewed the way real social data is: a few users write
+most posts, jobs and messages (Zipf-like author weights), a few posts
+collect most comments and likes, and a few conversations hold most of the
+messages. Everything is drawn from one ``random.Random(seed)`` and dated
+relative to an anchor day (``DEFAULT_ANCHOR`` unless one is given), so the
+same seed always produces the same rows, whatever day it runs. Active jobs
+have no expiry date, so they stay listed however far the anchor is in the
+past. Ids are assigned here so child rows can refer to them without a round
+trip; PostgreSQL sequences are moved past them afterwards.
+
+Rows are written with Core ``insert()`` executemany in batches, one commit
+per batch, bypassing the ORM unit of work. Derived data is kept consistent
+with what the API maintains: ``comments_count``, the job application
+counters, conversation summaries and unread counters. Likes only exist as
+``posts.likes_count`` (there is no likes table).
+"""
+import hashlib
+import json
+import random
+from datetime import datetime, timedelta
+
+from sqlalchemy import bindparam, func, text
+
+from models import db
+from models.user import User
+from models.profile import Profile, Skill, Experience, Education
+from models.post import Post, Comment
+from models.job import Job, JobApplication, JobApplicationCount, APPLICATION_STATUSES
+from models.message import Conversation, Message, UserUnreadCount, MessageSearchTerm, PREVIEW_LENGTH
+from services.job_sweeper import SweepStats
+from services.message_search import posting_rows
+
+PASSWORD = 'Synthetic1!'
+DEFAULT_ANCHOR = datetime(2026, 1, 1)
+
+WORDS = (
+    'team project launch release meeting update customer product design review hiring remote office '
+    'python java javascript react flask sql data cloud aws docker kubernetes api backend frontend mobile '
+    'growth sales marketing strategy startup funding roadmap feedback deadline sprint demo conference '
+    'great thanks congrats excited proud learning opportunity career mentor network community event '
+    'today tomorrow week month quarter year new first next last big small fast better best'
+).split()
+SKILLS = ('Python', 'SQL', 'JavaScript', 'React', 'Flask', 'Django', 'AWS', 'Docker', 'Kubernetes', 'Java',
+          'Go', 'TypeScript', 'Machine Learning', 'Data Analysis', 'Product Management', 'Design', 'Marketing',
+          'Sales', 'Leadership', 'Communication')
+TITLES = ('Software Engineer', 'Senior Software Engineer', 'Data Scientist', 'Product Manager', 'Designer',
+          'DevOps Engineer', 'Engineering Manager', 'Marketing Manager', 'Sales Lead', 'Analyst')
+COMPANIES = ('Acme', 'Globex', 'Initech', 'Umbrella', 'Hooli', 'Stark Industries', 'Wayne Enterprises',
+             'Soylent', 'Pied Piper', 'Vandelay Industries')
+CITIES = ('Bangalore', 'Hyderabad', 'Mumbai', 'Delhi', 'Pune', 'Chennai', 'London', 'Berlin', 'New York',
+          'San Francisco', 'Remote')
+SCHOOLS = ('IIT Madras', 'IIT Bombay', 'BITS Pilani', 'NIT Trichy', 'Anna University', 'MIT', 'Stanford')
+JOB_TYPES = ('full-time', 'part-time', 'contract', 'internship')
+TAGS = ('python', 'hiring', 'career', 'ai', 'remote', 'startup', 'design', 'data', 'leadership', 'webdev')
+# Share of applications in each status, in APPLICATION_STATUSES order
+STATUS_WEIGHTS = (0.55, 0.2, 0.12, 0.03, 0.1)
+SUMMARY_COLUMNS = ('last_message_id', 'last_message_preview', 'last_sender_id', 'last_message_at', 'updated_at',
+                   'user1_unread_count', 'user2_unread_count')
+
+
+def zipf_cum_weights(n, exponent=1.1):
+    """Cumulative weights giving rank r a probability proportional to 1 / (r + 1) ** exponent"""
+    total, weights = 0.0, []
+    for rank in range(n):
+        total += 1.0 / (rank + 1) ** exponent
+        weights.append(total)
+    return weights
+
+
+def heavy_tail_counts(rng, n, total, alpha=1.3, minimum=0):
+    """Split total into n Pareto-weighted counts (hot items get most of it)"""
+    weights = [rng.paretovariate(alpha) for _ in range(n)]
+    scale = total / sum(weights) if weights else 0
+    return [max(minimum, int(weight * scale + rng.random())) for weight in weights]
+
+
+class SyntheticDataset:
+    """Generates and bulk-inserts one synthetic dataset; see generate()"""
+
+    def __init__(self, seed=42, anchor=None, batch_size=5000, index_search=False):
+        self.rng = random.Random(seed)
+        self.anchor = anchor or DEFAULT_ANCHOR
+        self.batch_size = batch_size
+        self.index_search = index_search
+        self.password = PASSWORD
+        self.stats = []
+        self.user_ids = []
+        self.post_ids = []
+        self.job_ids = []
+
+    # -- helpers -------------------------------------------------------------
+
+    def _password_hash(self):
+        """A werkzeug-compatible pbkdf2 hash of PASSWORD with a seed-derived salt"""
+        salt = ''.join(self.rng.choices('abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789', k=16))
+        digest = hashlib.pbkdf2_hmac('sha256', PASSWORD.encode(), salt.encode(), 600000).hex()
+        return f'pbkdf2:sha256:600000${salt}${digest}'
+
+    def _next_id(self, model):
+        return (db.session.query(func.max(model.id)).scalar() or 0) + 1
+
+    def _sync_sequences(self, *models):
+        """Move PostgreSQL id sequences past the ids assigned here (MySQL and SQLite follow MAX(id) themselves)"""
+        if db.engine.dialect.name != 'postgresql':
+            return
+        for model in models:
+            table = model.__tablename__
+            db.session.execute(text(
+                f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), COALESCE(MAX(id), 1), MAX(id) IS NOT NULL) "
+                f"FROM {table}"
+            ))
+        db.session.commit()
+
+    def _insert(self, table, rows, stats):
+        """Write rows (an iterable of dicts) in batches, committing after each"""
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                db.session.execute(table.insert(), batch)
+                db.session.commit()
+                stats.add_batch(len(batch))
+                batch = []
+        if batch:
+            db.session.execute(table.insert(), batch)
+            db.session.commit()
+            stats.add_batch(len(batch))
+
+    def _table(self, name, model, rows):
+        stats = SweepStats(name)
+        self._insert(model.__table__, rows, stats)
+        self.stats.append(stats)
+        return stats
+
+    def _text(self, low, high):
+        return ' '.join(self.rng.choices(WORDS, k=self.rng.randint(low, high)))
+
+    def _past(self, max_days):
+        return self.anchor - timedelta(seconds=self.rng.randint(0, max_days * 86400))
+
+    def _author_picker(self):
+        """Pick user ids with Zipf-like skew (a few prolific users)"""
+        cum_weights = zipf_cum_weights(len(self.user_ids))
+        user_ids = self.user_ids
+        return lambda k=1: self.rng.choices(user_ids, cum_weights=cum_weights, k=k)
+
+    # -- tables --------------------------------------------------------------
+
+    def users(self, count):
+        first_id = self._next_id(User)
+        password_hash = self._password_hash()
+        self.user_ids = list(range(first_id, first_id + count))
+
+        def rows():
+            for user_id in self.user_ids:
+                yield {'id': user_id, 'email': f'synthetic{user_id}@example.com', 'username': f'synthetic{user_id}',
+                       'name': f'Synthetic User {user_id}', 'password_hash': password_hash,
+                       'created_at': self._past(3 * 365)}
+        self._table('users', User, rows())
+
+    def profiles(self):
+        rng = self.rng
+
+        def profile_rows():
+            for user_id in self.user_ids:
+                created = self._past(3 * 365)
+                yield {'user_id': user_id, 'bio': self._text(5, 40), 'location': rng.choice(CITIES),
+                       'title': rng.choice(TITLES), 'created_at': created, 'updated_at': created}
+
+        def skill_rows():
+            for user_id in self.user_ids:
+                for name in rng.sample(SKILLS, min(len(SKILLS), int(rng.paretovariate(1.5)) + rng.randint(0, 3))):
+                    yield {'user_id': user_id, 'name': name}
+
+        def experience_rows():
+            for user_id in self.user_ids:
+                for _ in range(rng.choice((0, 1, 1, 2, 2, 3, 4))):
+                    start = self._past(15 * 365).date()
+                    yield {'user_id': user_id, 'title': rng.choice(TITLES), 'company': rng.choice(COMPANIES),
+                           'start_date': start, 'end_date': None, 'description': self._text(5, 30), 'current': False}
+
+        def education_rows():
+            for user_id in self.user_ids:
+                for _ in range(rng.choice((0, 1, 1, 1, 2))):
+                    start = self._past(20 * 365).date()
+                    yield {'user_id': user_id, 'school': rng.choice(SCHOOLS), 'degree': rng.choice(('BTech', 'MTech', 'MBA', 'BSc', 'MSc')),
+                           'field': rng.choice(('Computer Science', 'Electronics', 'Business', 'Design')),
+                           'start_date': start, 'end_date': start + timedelta(days=4 * 365), 'current': False}
+
+        self._table('profiles', Profile, profile_rows())
+        self._table('skills', Skill, skill_rows())
+        self._table('experiences', Experience, experience_rows())
+        self._table('education', Education, education_rows())
+
+    def posts(self, count, comments, likes):
+        rng = self.rng
+        pick_author = self._author_picker()
+        first_id = self._next_id(Post)
+        self.post_ids = list(range(first_id, first_id + count))
+        comment_counts = heavy_tail_counts(rng, count, comments)
+        like_counts = heavy_tail_counts(rng, count, likes)
+        created = [self._past(365) for _ in range(count)]
+
+        def post_rows():
+            authors = pick_author(count)
+            for i, post_id in enumerate(self.post_ids):
+                yield {'id': post_id, 'user_id': authors[i], 'content': self._text(8, 60),
+                       'category': rng.choice((None, 'career', 'tech', 'news')),
+                       'tags': json.dumps(rng.sample(TAGS, rng.randint(1, 3))) if rng.random() < 0.6 else None,
+                       'is_public': rng.random() > 0.05, 'allow_comments': True,
+                       'created_at': created[i], 'updated_at': created[i], 'media_url': None,
+                       'likes_count': like_counts[i], 'comments_count': comment_counts[i]}
+
+        def comment_rows():
+            for i, post_id in enumerate(self.post_ids):
+                if not comment_counts[i]:
+                    continue
+                commenters = pick_author(comment_counts[i])
+                at = created[i]
+                for user_id in commenters:
+                    at += timedelta(seconds=int(rng.expovariate(1 / 3600)) + 1)
+                    yield {'post_id': post_id, 'user_id': user_id, 'content': self._text(2, 25), 'created_at': at}
+
+        self._table('posts', Post, post_rows())
+        self._table('comments', Comment, comment_rows())
+
+    def jobs(self, count, applications):
+        rng = self.rng
+        pick_author = self._author_picker()
+        first_id = self._next_id(Job)
+        self.job_ids = list(range(first_id, first_id + count))
+        posters = pick_author(count)
+        applicant_counts = [min(n, len(self.user_ids) - 1) for n in heavy_tail_counts(rng, count, applications)]
+        tallies = []
+
+        def job_rows():
+            for i, job_id in enumerate(self.job_ids):
+                created = self._past(180)
+                active = rng.random() < 0.8
+                yield {'id': job_id, 'title': rng.choice(TITLES), 'company': rng.choice(COMPANIES),
+                       'location': rng.choice(CITIES), 'description': self._text(40, 200),
+                       'requirements': self._text(10, 60), 'salary_range': None, 'job_type': rng.choice(JOB_TYPES),
+                       'posted_by': posters[i], 'created_at': created, 'updated_at': created, 'is_active': active,
+                       'expires_at': None if active else created + timedelta(days=60)}
+
+        def application_rows():
+            for i, job_id in enumerate(self.job_ids):
+                tally = dict.fromkeys(APPLICATION_STATUSES, 0)
+                if applicant_counts[i]:
+                    applicants = [user_id for user_id in rng.sample(self.user_ids, applicant_counts[i] + 1)
+                                  if user_id != posters[i]][:applicant_counts[i]]
+                    statuses = rng.choices(APPLICATION_STATUSES, weights=STATUS_WEIGHTS, k=len(applicants))
+                    for user_id, status in zip(applicants, statuses):
+                        tally[status] += 1
+                        yield {'job_id': job_id, 'user_id': user_id, 'status': status,
+                               'applied_at': self._past(90), 'cover_letter': None}
+                tallies.append(tally)
+
+        def count_rows():
+            for job_id, tally in zip(self.job_ids, tallies):
+                for status in APPLICATION_STATUSES:
+                    yield {'job_id': job_id, 'status': status, 'total': tally[status]}
+
+        self._table('jobs', Job, job_rows())
+        self._table('job_applications', JobApplication, application_rows())
+        self._table('job_application_counts', JobApplicationCount, count_rows())
+
+    def conversations(self, count, messages):
+        rng = self.rng
+        pick_author = self._author_picker()
+        pairs = set()
+        attempts = 0
+        while len(pairs) < count and attempts < count * 20:
+            attempts += 1
+            # A prolific user on one side, anyone on the other
+            user_a, user_b = pick_author()[0], rng.choice(self.user_ids)
+            if user_a != user_b:
+                pairs.add((min(user_a, user_b), max(user_a, user_b)))
+        pairs = sorted(pairs)
+        first_id = self._next_id(Conversation)
+        conversation_ids = list(range(first_id, first_id + len(pairs)))
+        message_counts = heavy_tail_counts(rng, len(pairs), messages, minimum=1)
+        summaries, unread_totals = [], {}
+        next_message_id = self._next_id(Message)
+
+        def conversation_rows():
+            for conversation_id, (user1_id, user2_id) in zip(conversation_ids, pairs):
+                yield {'id': conversation_id, 'user1_id': user1_id, 'user2_id': user2_id,
+                       'created_at': self.anchor - timedelta(days=400), 'updated_at': self.anchor - timedelta(days=400),
+                       'user1_unread_count': 0, 'user2_unread_count': 0}
+
+        def message_rows():
+            message_id = next_message_id
+            for conversation_id, (user1_id, user2_id), total in zip(conversation_ids, pairs, message_counts):
+                at = self._past(365)
+                unread_tail = 0 if rng.random() < 0.7 else rng.randint(1, 5)
+                unread = {user1_id: 0, user2_id: 0}
+                sender_id = content = None
+                for position in range(total):
+                    sender_id = user1_id if rng.random() < 0.5 else user2_id
+                    at += timedelta(seconds=int(rng.expovariate(1 / 1800)) + 1)
+                    content = self._text(1, 30)
+                    is_read = position < total - unread_tail
+                    if not is_read:
+                        recipient_id = user2_id if sender_id == user1_id else user1_id
+                        unread[recipient_id] += 1
+                    yield {'id': message_id, 'conversation_id': conversation_id, 'sender_id': sender_id,
+                           'content': content, 'created_at': at, 'is_read': is_read}
+                    if self.index_search:
+                        self._postings.extend(posting_rows(message_id, content, (user1_id, user2_id)))
+                    message_id += 1
+                summaries.append({'conversation_id': conversation_id, 'new_last_message_id': message_id - 1,
+                                  'new_last_message_preview': content[:PREVIEW_LENGTH], 'new_last_sender_id': sender_id,
+                                  'new_last_message_at': at, 'new_updated_at': at,
+                                  'new_user1_unread_count': unread[user1_id], 'new_user2_unread_count': unread[user2_id]})
+                for user_id, n in unread.items():
+                    if n:
+                        unread_totals[user_id] = unread_totals.get(user_id, 0) + n
+
+        self._postings = []
+        self._table('conversations', Conversation, conversation_rows())
+        stats = SweepStats('messages')
+        postings_stats = SweepStats('message_search_terms')
+        table = Message.__table__
+        batch = []
+        for row in message_rows():
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                self._insert(table, batch, stats)
+                self._insert(MessageSearchTerm.__table__, self._postings, postings_stats)
+                batch, self._postings = [], []
+        self._insert(table, batch, stats)
+        self._insert(MessageSearchTerm.__table__, self._postings, postings_stats)
+        self.stats.append(stats)
+        if self.index_search:
+            self.stats.append(postings_stats)
+
+        # executemany UPDATE; bind names must differ from the column names they set
+        summary_stats = SweepStats('conversation summaries')
+        update = (Conversation.__table__.update()
+                  .where(Conversation.__table__.c.id == bindparam('conversation_id'))
+                  .values({name: bindparam(f'new_{name}') for name in SUMMARY_COLUMNS}))
+        for start in range(0, len(summaries), self.batch_size):
+            batch = summaries[start:start + self.batch_size]
+            db.session.execute(update, batch)
+            db.session.commit()
+            summary_stats.add_batch(len(batch))
+        self.stats.append(summary_stats)
+
+        self._table('user_unread_counts', UserUnreadCount,
+                    ({'user_id': user_id, 'total': total} for user_id, total in sorted(unread_totals.items())))
+
+    def generate(self, users, posts, comments, likes, jobs, applications, conversations, messages):
+        """Create every table in foreign-key order; returns the per-table stats"""
+        self.users(users)
+        self.profiles()
+        self.posts(posts, comments, likes)
+        self.jobs(jobs, applications)
+        self.conversations(conversations, messages)
+        self._sync_sequences(User, Post, Job, Conversation, Message)
+        return self.stats
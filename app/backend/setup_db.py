@@ -18,8 +18,8 @@ from models import db
 from models.user import User
 from models.profile import Profile, Skill, Experience, Education
 from models.post import Post
-from models.job import Job, JobApplication
-from models.message import Conversation, Message
+from models.job import Job, JobApplication, JobApplicationCount, JobArchive, JobApplicationArchive
+from models.message import Conversation, Message, UserUnreadCount, MessageSearchTerm, MessageArchiveBlock
 
 # Initialize database
 db.init_app(app)
@@ -46,8 +46,14 @@ def setup_database():
         print("- posts")
         print("- jobs")
         print("- job_applications")
+        print("- job_application_counts")
+        print("- jobs_archive")
+        print("- job_applications_archive")
         print("- conversations")
         print("- messages")
+        print("- user_unread_counts")
+        print("- message_search_terms")
+        print("- message_archive_blocks")
 
 if __name__ == '__main__':
     setup_database() 
\ No newline at end of file
@@ -0,0 +1,83 @@
+"""
+Fixtures shared by the backend tests. Run them from app/backend:
+
+    python -m pytest tests
+
+Config is read from the environment when config.py is first imported, so
+DATABASE_URL and UPLOAD_FOLDER are pointed at a scratch directory here,
+before any test imports the app, and the directory is removed when the
+session ends. Each test module that needs data asks for ``db`` to start
+from empty tables.
+"""
+import os
+import shutil
+import sys
+import tempfile
+from contextlib import contextmanager
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+SCRATCH = tempfile.mkdtemp(prefix='prok_tests_')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(SCRATCH, 'tests.db')
+os.environ['UPLOAD_FOLDER'] = os.path.join(SCRATCH, 'uploads')
+os.environ['MESSAGE_BROKER_URL'] = 'memory://'
+os.environ['CACHE_SHARED_URL'] = ''
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(SCRATCH, ignore_errors=True)
+
+
+@pytest.fixture(scope='session')
+def app():
+    from main import app, create_app
+    create_app()
+    return app
+
+
+@pytest.fixture(scope='module')
+def db(app):
+    """Empty tables, and no cached responses or indexes left from another module"""
+    from models import db
+    from services.cache import get_cache
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        # Data versions restart at 0, so ETag-keyed cache entries of earlier data could match again
+        get_cache().clear()
+    yield db
+    with app.app_context():
+        db.session.remove()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture(scope='session')
+def auth_headers(app):
+    """Authorization headers for the user with the given email"""
+    from flask_jwt_extended import create_access_token
+
+    def headers(email):
+        with app.app_context():
+            return {'Authorization': f'Bearer {create_access_token(identity=email)}'}
+    return headers
+
+
+@pytest.fixture
+def query_budget():
+    """utils.metrics.query_budget that fails the test, with the SQL it ran, when the block goes over"""
+    from utils.metrics import QueryBudgetExceeded, query_budget as budget
+
+    @contextmanager
+    def within(max_queries, label='block'):
+        try:
+            with budget(max_queries, label) as counter:
+                yield counter
+        except QueryBudgetExceeded as exc:
+            pytest.fail(str(exc), pytrace=False)
+    return within
@@ -0,0 +1,47 @@
+"""One application per user and job, enforced by the database under concurrent applies."""
+import threading
+
+import pytest
+
+THREADS = 16
+
+
+@pytest.fixture(scope='module')
+def job_id(app, db, auth_headers):
+    from models.user import User
+    with app.app_context():
+        db.session.add_all([
+            User(email='poster@example.com', username='poster', name='Poster', password_hash='-'),
+            User(email='applicant@example.com', username='applicant', name='Applicant', password_hash='-'),
+        ])
+        db.session.commit()
+    response = app.test_client().post('/jobs', headers=auth_headers('poster@example.com'), json={
+        'title': 'Backend engineer', 'company': 'Prok', 'description': 'Python, Flask and SQL'
+    })
+    assert response.status_code == 201
+    return response.get_json()['job_id']
+
+
+def test_concurrent_applies_create_one_application(app, db, job_id, auth_headers):
+    from models.job import JobApplication, JobApplicationCount
+    headers = auth_headers('applicant@example.com')
+    barrier = threading.Barrier(THREADS)
+    statuses = []
+
+    def apply():
+        client = app.test_client()
+        barrier.wait()
+        statuses.append(client.post(f'/jobs/{job_id}/apply', headers=headers, json={'cover_letter': 'Hello'}).status_code)
+
+    threads = [threading.Thread(target=apply) for _ in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(statuses) == [201] + [400] * (THREADS - 1)
+    with app.app_context():
+        assert JobApplication.query.filter_by(job_id=job_id).count() == 1
+        counts = {row.status: row.total for row in JobApplicationCount.query.filter_by(job_id=job_id)}
+    assert counts['applied'] == 1
+    assert sum(counts.values()) == 1
@@ -0,0 +1,185 @@
+"""
+SQL query budgets for every route in the feed, posts, jobs, messaging and
+profile blueprints.
+
+The module seeds enough rows that per-item queries would show up (list
+endpoints are called with large pages), then runs each request through the
+test client inside the ``query_budget`` fixture, which fails the test with
+the statements it issued when the route goes over. The routes run in table
+order against the same data:
+
+    python -m pytest tests/test_query_budgets.py
+
+Budgets are per request and must not depend on the page size; when a route
+legitimately needs another query, raise its budget here in the same change.
+"""
+import io
+from datetime import date
+
+import pytest
+
+# (method, url template, request kwargs, max queries); templates are filled from the seeded ids.
+# Conditional GETs include their ETag stamp query; a 304 skips the rest. Writes to posts, jobs, users and
+# profiles include the UPDATE that bumps their data version (models/data_version.py).
+BUDGETS = [
+    # api/feed.py
+    ('GET', '/feed?per_page=50', {}, 4),
+    ('GET', '/feed/user/{author_id}?per_page=50', {}, 4),
+    # api/posts.py
+    ('POST', '/posts', {'json': {'content': 'Budgeted post'}}, 6),
+    ('GET', '/posts?per_page=50', {}, 4),
+    ('GET', '/posts/{post_id}', {}, 4),
+    ('POST', '/posts/{post_id}/like', {}, 5),
+    ('GET', '/posts/{post_id}/comments', {}, 3),
+    ('POST', '/posts/{post_id}/comments', {'json': {'content': 'Budgeted comment'}}, 5),
+    ('PUT', '/posts/{post_id}/comments/{comment_id}', {'json': {'content': 'Edited comment'}}, 4),
+    ('DELETE', '/posts/{post_id}/comments/{comment_id}', {}, 3),
+    ('GET', '/api/uploads/missing.png', {}, 0),
+    # api/jobs.py
+    ('GET', '/jobs?per_page=50', {}, 4),
+    ('GET', '/jobs/{job_id}', {}, 3),
+    ('GET', '/jobs/recommended?limit=50', {}, 8),
+    ('POST', '/jobs', {'json': {'title': 'Budget engineer', 'company': 'Prok', 'description': 'Keeps query counts flat'}}, 6),
+    ('POST', '/jobs/{apply_job_id}/apply', {'json': {'cover_letter': 'Hello'}}, 5),
+    ('GET', '/jobs/{own_job_id}/applications?limit=100', {}, 4),
+    ('PATCH', '/jobs/{own_job_id}/applications', {'json': {'application_ids': '{application_ids}', 'status': 'reviewed'}}, 7),
+    ('GET', '/jobs/{own_job_id}/applications/counts', {}, 3),
+    # api/messaging.py
+    ('GET', '/messages/conversations?limit=100', {}, 4),
+    ('POST', '/messages/conversations', {'json': {'user_id': '{new_contact_id}'}}, 5),
+    ('GET', '/messages/{conversation_id}?limit=200', {}, 5),
+    ('POST', '/messages/{conversation_id}', {'json': {'content': 'Budgeted message'}}, 9),
+    ('POST', '/messages/{conversation_id}/read', {'json': {}}, 7),
+    ('GET', '/messages/unread', {}, 2),
+    ('GET', '/messages/search?q=budget&limit=100', {}, 6),
+    ('GET', '/messages/stream', {'buffered': False}, 1),
+    ('GET', '/messages/events?last_event_id=0&timeout=0', {}, 1),
+    # api/profile.py
+    ('GET', '/profile/{author_id}', {}, 2),
+    ('PUT', '/profile/{other_id}', {'json': {'bio': 'Budgeted bio'}}, 3),
+    ('DELETE', '/profile/{spare_id}', {}, 3),
+    ('GET', '/api/profile', {}, 5),
+    ('PUT', '/api/profile', {'json': {
+        'bio': 'Updated', 'skills': ['python', 'sql'],
+        'experience': [{'title': 'Engineer', 'company': 'Prok', 'start_date': '2020-01-01'}],
+        'education': [{'school': 'Uni', 'degree': 'BSc', 'start_date': '2015-09-01'}],
+    }}, 16),
+    ('POST', '/api/profile/image', {'image': True}, 5),
+    ('POST', '/api/profile/cover', {'image': True}, 5),
+    ('DELETE', '/api/profile/cover', {}, 4),
+    ('GET', '/api/profile_images/missing.png', {}, 0),
+]
+
+
+def seed(db, models, rows=60):
+    """Deterministic fixture data; returns the ids the URL templates refer to"""
+    User, Profile, Skill, Experience, Post, Comment, Job, JobApplication, JobApplicationCount, \
+        Conversation, Message, APPLICATION_STATUSES, index_message = models
+    users = [User(email=f'user{i}@example.com', username=f'user{i}', name=f'User {i}', password_hash='-')
+             for i in range(rows + 3)]
+    db.session.add_all(users)
+    db.session.flush()
+    author, spare, new_contact = users[0], users[-3], users[-1]
+    for user in users[:-1]:
+        profile = Profile(user_id=user.id)
+        profile.title = 'Engineer'
+        db.session.add(profile)
+    db.session.add_all([Skill(user_id=author.id, name=name) for name in ('python', 'flask', 'sql')])
+    db.session.add(Experience(user_id=author.id, title='Backend engineer', company='Prok', start_date=date(2020, 1, 1)))
+
+    posts = [Post(user_id=users[i % rows].id, content=f'Post {i}') for i in range(rows)]
+    db.session.add_all(posts)
+    db.session.flush()
+    comments = [Comment(post_id=posts[0].id, user_id=users[i].id, content=f'Comment {i}') for i in range(rows)]
+    comments.append(Comment(post_id=posts[0].id, user_id=author.id, content='Editable'))
+    db.session.add_all(comments)
+
+    jobs = [Job(title=f'Python engineer {i}', company='Prok', description=f'Python flask sql role {i}',
+                posted_by=users[i % rows].id) for i in range(rows)]
+    db.session.add_all(jobs)
+    db.session.flush()
+    own_job = next(job for job in jobs if job.posted_by == author.id)
+    apply_job = next(job for job in jobs if job.posted_by != author.id)
+    for job in jobs:
+        db.session.add_all([JobApplicationCount(job_id=job.id, status=status) for status in APPLICATION_STATUSES])
+    applications = [JobApplication(job_id=own_job.id, user_id=users[i].id) for i in range(1, rows)]
+    db.session.add_all(applications)
+    db.session.flush()
+    db.session.query(JobApplicationCount).filter_by(job_id=own_job.id, status='applied').update({'total': len(applications)})
+
+    conversations = [Conversation(author.id, users[i].id) for i in range(1, rows)]
+    db.session.add_all(conversations)
+    db.session.flush()
+    conversation = conversations[0]
+    for i in range(rows * 4):
+        message = Message(conversation_id=conversation.id, sender_id=conversation.user1_id if i % 2 else conversation.user2_id,
+                          content=f'budget message {i}')
+        db.session.add(message)
+        db.session.flush()
+        index_message(message, (conversation.user1_id, conversation.user2_id))
+    db.session.commit()
+    return {
+        'author_id': author.id, 'other_id': users[1].id, 'spare_id': spare.id, 'new_contact_id': new_contact.id,
+        'post_id': posts[0].id, 'comment_id': comments[-1].id,
+        'job_id': jobs[0].id, 'own_job_id': own_job.id, 'apply_job_id': apply_job.id,
+        'application_ids': [application.id for application in applications],
+        'conversation_id': conversation.id,
+    }
+
+
+def fill(value, ids):
+    """Substitute {name} placeholders in URL templates and JSON bodies"""
+    if isinstance(value, str):
+        if value.startswith('{') and value.endswith('}') and value[1:-1] in ids:
+            return ids[value[1:-1]]
+        return value.format(**ids)
+    if isinstance(value, dict):
+        return {key: fill(item, ids) for key, item in value.items()}
+    if isinstance(value, list):
+        return [fill(item, ids) for item in value]
+    return value
+
+
+def png():
+    from PIL import Image
+    buffer = io.BytesIO()
+    Image.new('RGB', (32, 32), 'white').save(buffer, 'PNG')
+    buffer.seek(0)
+    return buffer
+
+
+@pytest.fixture(scope='module')
+def seeded(app, db):
+    from models.user import User
+    from models.profile import Profile, Skill, Experience
+    from models.post import Post, Comment
+    from models.job import Job, JobApplication, JobApplicationCount, APPLICATION_STATUSES
+    from models.message import Conversation, Message
+    from services.job_dedup import duplicate_index
+    from services.job_recommender import job_index
+    from services.message_search import index_message
+
+    with app.app_context():
+        ids = seed(db, (User, Profile, Skill, Experience, Post, Comment, Job, JobApplication, JobApplicationCount,
+                        Conversation, Message, APPLICATION_STATUSES, index_message))
+        # In-process indexes are built on first use; budgets cover the steady state
+        job_index.build()
+        duplicate_index.build()
+    return ids
+
+
+@pytest.mark.parametrize('method, template, options, budget', BUDGETS,
+                         ids=[f'{method} {template}' for method, template, _, _ in BUDGETS])
+def test_route_within_budget(seeded, client, auth_headers, query_budget, method, template, options, budget):
+    kwargs = {'headers': auth_headers('user0@example.com')}
+    if 'json' in options:
+        kwargs['json'] = fill(options['json'], seeded)
+    if options.get('image'):
+        kwargs['data'] = {'image': (png(), 'budget.png')}
+        kwargs['content_type'] = 'multipart/form-data'
+    if 'buffered' in options:
+        kwargs['buffered'] = options['buffered']
+    with query_budget(budget, f'{method} {template}'):
+        response = client.open(fill(template, seeded), method=method, **kwargs)
+    response.close()
+    assert response.status_code < 500
@@ -0,0 +1,86 @@
+"""
+Streamed endpoints run in bounded memory.
+
+Loads one post per size with that many comments and measures the peak
+Python heap (tracemalloc) of GET /posts/<id>/comments while the body is
+consumed chunk by chunk, next to the old approach of building the whole
+list and calling jsonify. The streamed peak must stay flat as the result
+grows, and stay under the buffered peak:
+
+    python -m pytest tests/test_streaming_memory.py
+"""
+import tracemalloc
+from datetime import datetime, timedelta
+
+import pytest
+
+SIZES = (2000, 20000)
+MAX_GROWTH = 2.0
+LOAD_BATCH_SIZE = 20000
+
+
+@pytest.fixture(scope='module')
+def posts(app, db):
+    """post id -> comment count, one post per size"""
+    from models.post import Comment, Post
+    from models.user import User
+    base = datetime(2026, 1, 1)
+    with app.app_context():
+        db.session.execute(User.__table__.insert(), [
+            {'id': i, 'username': f'bench{i}', 'name': f'Bench {i}', 'email': f'bench{i}@example.com',
+             'password_hash': '-'}
+            for i in range(1, 101)
+        ])
+        for post_id, size in enumerate(SIZES, start=1):
+            db.session.execute(Post.__table__.insert(), [{'id': post_id, 'user_id': 1, 'content': 'Busy post'}])
+            for start in range(0, size, LOAD_BATCH_SIZE):
+                db.session.execute(Comment.__table__.insert(), [
+                    {'post_id': post_id, 'user_id': i % 100 + 1, 'created_at': base + timedelta(seconds=i),
+                     'content': f'Comment {i} ' + 'lorem ipsum dolor sit amet ' * 4}
+                    for i in range(start, min(start + LOAD_BATCH_SIZE, size))
+                ])
+        db.session.commit()
+    return dict(enumerate(SIZES, start=1))
+
+
+def streamed_peak(client, headers, post_id):
+    """Peak heap while the comments body is read chunk by chunk, and the number of comments in it"""
+    tracemalloc.start()
+    try:
+        response = client.get(f'/posts/{post_id}/comments?format=ndjson', headers=headers, buffered=False)
+        lines = sum(chunk.count(b'\n') for chunk in response.response)
+        response.close()
+        return tracemalloc.get_traced_memory()[1], lines
+    finally:
+        tracemalloc.stop()
+
+
+def buffered_peak(app, post_id):
+    """Peak heap of what get_comments did before streaming: every row and dict in memory, then one body"""
+    from flask import jsonify
+    from api.serializers import serialize_comment
+    from models import db
+    from models.post import Comment
+    from models.user import User
+    with app.test_request_context():
+        tracemalloc.start()
+        try:
+            comments = Comment.query.filter_by(post_id=post_id).order_by(Comment.created_at.asc()).all()
+            users = {u.id: u for u in User.query.filter(User.id.in_({c.user_id for c in comments}))}
+            jsonify({'comments': [serialize_comment(c, users.get(c.user_id)) for c in comments]}).get_data()
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+            db.session.remove()
+
+
+def test_streamed_comments_peak_stays_flat(app, posts, client, auth_headers):
+    headers = auth_headers('bench1@example.com')
+    peaks = []
+    for post_id, size in posts.items():
+        peak, count = streamed_peak(client, headers, post_id)
+        assert count == size
+        peaks.append(peak)
+    growth = peaks[-1] / peaks[0]
+    assert growth <= MAX_GROWTH, f'streamed peak grew {growth:.2f}x from {SIZES[0]} to {SIZES[-1]} comments'
+    assert peaks[-1] < buffered_peak(app, max(posts))
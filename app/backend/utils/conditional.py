@@ -0,0 +1,76 @@
+"""
+Conditional GET: weak ETags derived from cheap version stamps.
+
+``@conditional(stamp)`` calls ``stamp(*args, **kwargs)`` with the view's
+arguments before the view runs. The stamp is a small tuple that changes
+whenever the response would: for lists, the version counters of the data
+they show (``versions_stamp``, models/data_version.py; writers bump them in
+their own transaction), and for details, a row's ``updated_at`` and counters
+and the author's name. Either way it is primary-key or index lookups, never
+a scan. The ETag hashes it with the endpoint and its arguments, the host
+and the query string. When ``If-None-Match`` already holds that ETag the
+answer is an empty 304 and the view, with its queries and serialisation,
+never runs; otherwise the view's 200 carries the ETag. A stamp of None (the
+row does not exist) skips the check and lets the view answer.
+
+The stamp is read before the body, so a write landing in between only
+makes the next request miss; a 304 is never sent for data the client has
+not seen. Views that cache their payload put ``current_etag()`` in the
+cache key, so an entry cached before a change is never served under the
+ETag of that change, in any worker. ``updated_at`` has one-second
+resolution on MySQL, so detail stamps also include counters that change
+within the same second (likes).
+
+Put it under ``@jwt_required()`` so a 304 is only given to authenticated
+callers, and above ``@single_flight`` so revalidations skip coalescing.
+"""
+import hashlib
+from functools import wraps
+
+from flask import current_app, g, make_response, request
+from sqlalchemy import select
+
+from models import db
+from models.data_version import DataVersion
+
+
+def data_version(name):
+    """The version counter of a data set as a scalar subquery, to select alongside a row lookup"""
+    return select(DataVersion.version).where(DataVersion.name == name).scalar_subquery()
+
+
+def versions_stamp(*names, extra=()):
+    """The counters of names, and any extra column expressions, in one query"""
+    return tuple(db.session.query(*(data_version(name) for name in names), *extra).one())
+
+
+def make_etag(stamp):
+    parts = (request.endpoint, request.host_url, sorted((request.view_args or {}).items()),
+             sorted(request.args.items(multi=True)), stamp)
+    return hashlib.blake2b(repr(parts).encode(), digest_size=12).hexdigest()
+
+
+def current_etag():
+    """ETag of the request being served by a @conditional view ('' outside one)"""
+    return g.get('etag', '')
+
+
+def conditional(stamp):
+    """Answer 304 when If-None-Match matches the ETag of stamp(...), else tag the view's 200 with it"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            version = stamp(*args, **kwargs)
+            if version is None:
+                return view(*args, **kwargs)
+            etag = g.etag = make_etag(version)
+            if request.if_none_match.contains_weak(etag):
+                response = current_app.response_class(status=304)
+                response.set_etag(etag, weak=True)
+                return response
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                response.set_etag(etag, weak=True)
+            return response
+        return wrapper
+    return decorator
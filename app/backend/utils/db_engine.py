@@ -0,0 +1,57 @@
+"""
+Connection setup shared by every engine (primary and replica binds).
+
+SQLite connections get ``Config.SQLITE_PRAGMAS`` as soon as they are opened:
+WAL so readers are not blocked by the writer, ``synchronous=NORMAL`` (safe
+with WAL, one fsync per checkpoint instead of per commit), a busy timeout so
+concurrent writers wait for the lock instead of failing, and a memory-mapped
+read path. Pool sizing for the server databases is plain engine options,
+see ``engine_options`` in config.py.
+
+``DB_STATEMENT_TIMEOUT_MS`` is applied per request rather than per
+connection, so CLI commands (exports, index builds, archive sweeps) and
+background threads are never cut off. When a session begins a transaction
+inside a request, the connection gets the timeout; outside one, it gets
+none. The value last set is remembered on the pooled connection, so the
+``SET`` is only sent when a connection switches between the two, not on
+every request.
+"""
+import sqlite3
+
+from flask import current_app, has_app_context, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from config import Config
+
+# Session-level statement timeout per dialect, in milliseconds; max_execution_time only covers SELECTs
+STATEMENT_TIMEOUT_SQL = {
+    'mysql': 'SET SESSION max_execution_time={}',
+    'postgresql': 'SET SESSION statement_timeout={}',
+}
+
+
+@event.listens_for(Engine, 'connect')
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    pragmas = current_app.config.get('SQLITE_PRAGMAS', Config.SQLITE_PRAGMAS) if has_app_context() else Config.SQLITE_PRAGMAS
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+    finally:
+        cursor.close()
+
+
+@event.listens_for(Session, 'after_begin')
+def _apply_statement_timeout(session, transaction, connection):
+    template = STATEMENT_TIMEOUT_SQL.get(connection.dialect.name)
+    if template is None:
+        return
+    timeout = int(current_app.config.get('DB_STATEMENT_TIMEOUT_MS', 0)) if has_request_context() else 0
+    info = connection.connection.info  # kept with the pooled connection across checkouts
+    if info.get('statement_timeout_ms', 0) != timeout:
+        connection.exec_driver_sql(template.format(timeout))
+        info['statement_timeout_ms'] = timeout
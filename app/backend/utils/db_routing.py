@@ -0,0 +1,212 @@
+"""
+Primary/replica routing for ``db.session``.
+
+Replicas are ordinary Flask-SQLAlchemy binds named ``replica_0``,
+``replica_1``, ... (built from ``DATABASE_REPLICA_URLS``). ``RoutingSession``
+sends a statement to a replica only when all of these hold:
+
+- it is a SELECT issued outside a flush, in a GET/HEAD request handled by a
+  blueprint in ``REPLICA_READ_BLUEPRINTS``;
+- the request has not written anything yet (once it has, it stays on the
+  primary so it sees its own rows);
+- the caller has not written in the last ``REPLICA_READ_YOUR_WRITES_SECONDS``
+  (tracked per JWT identity in this process and, across workers, in a
+  cookie);
+- some replica's lag is within the endpoint's tolerance:
+  ``REPLICA_ROUTE_MAX_LAG[endpoint]``, else ``REPLICA_MAX_LAG_SECONDS``.
+  A tolerance of ``None`` keeps the endpoint on the primary.
+
+Everything else, including CLI commands, uses the primary.
+``read_from(db.session, 'primary' | 'replica')`` overrides the decision for
+a block of code. The choice is made once per request, so every read in a
+response comes from the same database.
+
+For local testing point ``DATABASE_REPLICA_URLS`` at a second SQLite file
+and refresh it with ``flask replica sync``; a SQLite replica's lag is the
+time since that file was last written.
+"""
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import current_app, g, has_request_context, request
+from flask_jwt_extended import get_jwt_identity
+from flask_sqlalchemy.session import Session
+
+logger = logging.getLogger(__name__)
+
+REPLICA_BIND_PREFIX = 'replica_'
+PRIMARY = 'primary'
+REPLICA = 'replica'
+READ_METHODS = ('GET', 'HEAD')
+# Cookie carrying the end of the caller's read-your-writes window, so any worker can honour it
+WRITE_WINDOW_COOKIE = 'db_primary_until'
+MAX_TRACKED_WRITERS = 10000
+
+_lag_lock = threading.Lock()
+_lag_cache = {}  # bind key -> (checked at, lag seconds or None)
+_writers_lock = threading.Lock()
+_recent_writers = {}  # JWT identity -> primary-only until (epoch seconds)
+
+
+def replica_keys(engines):
+    return sorted(key for key in engines if key and key.startswith(REPLICA_BIND_PREFIX))
+
+
+def measure_lag(engine):
+    """Seconds the replica is behind its primary, or None if it is not replicating"""
+    dialect = engine.dialect.name
+    if dialect == 'sqlite':
+        return max(0.0, time.time() - os.path.getmtime(engine.url.database))
+    with engine.connect() as conn:
+        if dialect == 'mysql':
+            try:
+                row = conn.exec_driver_sql('SHOW REPLICA STATUS').mappings().first()
+                column = 'Seconds_Behind_Source'
+            except Exception:
+                row = conn.exec_driver_sql('SHOW SLAVE STATUS').mappings().first()
+                column = 'Seconds_Behind_Master'
+            if row is None:
+                return 0.0  # not configured as a replica (e.g. a copy used for testing)
+            return None if row[column] is None else float(row[column])
+        if dialect == 'postgresql':
+            lag = conn.exec_driver_sql(
+                'SELECT CASE WHEN pg_is_in_recovery() '
+                'THEN EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) ELSE 0 END'
+            ).scalar()
+            return None if lag is None else max(0.0, float(lag))
+    return 0.0
+
+
+def replica_lag(key, engine, max_age):
+    """measure_lag(engine), cached for max_age seconds per replica"""
+    now = time.monotonic()
+    with _lag_lock:
+        cached = _lag_cache.get(key)
+        if cached and now - cached[0] < max_age:
+            return cached[1]
+    try:
+        lag = measure_lag(engine)
+    except Exception:
+        logger.warning('Could not measure lag of %s; treating it as unavailable', key, exc_info=True)
+        lag = None
+    with _lag_lock:
+        _lag_cache[key] = (now, lag)
+    return lag
+
+
+def _identity():
+    try:
+        return get_jwt_identity()
+    except Exception:  # no JWT verified in this request
+        return None
+
+
+def _in_write_window():
+    now = time.time()
+    try:
+        if float(request.cookies.get(WRITE_WINDOW_COOKIE, 0)) > now:
+            return True
+    except ValueError:
+        pass
+    identity = _identity()
+    if identity is None:
+        return False
+    with _writers_lock:
+        return _recent_writers.get(identity, 0) > now
+
+
+def _record_write(identity, until):
+    with _writers_lock:
+        if len(_recent_writers) >= MAX_TRACKED_WRITERS:
+            now = time.time()
+            for key in [key for key, expires in _recent_writers.items() if expires <= now]:
+                del _recent_writers[key]
+        _recent_writers[identity] = until
+
+
+def _pick_replica(engines, config, tolerance):
+    candidates = []
+    for key in replica_keys(engines):
+        lag = replica_lag(key, engines[key], config['REPLICA_LAG_CHECK_SECONDS'])
+        if lag is not None and lag <= tolerance:
+            candidates.append(key)
+    return random.choice(candidates) if candidates else PRIMARY
+
+
+def _request_route(engines):
+    """Bind key for this request's reads (PRIMARY for the default engine), decided once per request"""
+    if 'db_route' in g:
+        return g.db_route
+    config = current_app.config
+    route = PRIMARY
+    if (replica_keys(engines) and request.method in READ_METHODS
+            and request.blueprint in config['REPLICA_READ_BLUEPRINTS']):
+        tolerance = config['REPLICA_ROUTE_MAX_LAG'].get(request.endpoint, config['REPLICA_MAX_LAG_SECONDS'])
+        if tolerance is not None and not _in_write_window():
+            route = _pick_replica(engines, config, tolerance)
+    g.db_route = route
+    return route
+
+
+class RoutingSession(Session):
+    """Flask-SQLAlchemy session that sends eligible reads to a replica bind"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        engine = super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+        engines = self._db.engines
+        if bind is not None or engine is not engines.get(None):
+            return engine
+        is_read = clause is not None and getattr(clause, 'is_select', False) and not self._flushing
+        override = self.info.get('db_route')
+        if not is_read:
+            if has_request_context():
+                g.db_route = PRIMARY  # read our own writes for the rest of the request
+            return engine
+        if override == PRIMARY:
+            return engine
+        if override == REPLICA:
+            keys = replica_keys(engines)
+            return engines[random.choice(keys)] if keys else engine
+        if not has_request_context():
+            return engine
+        route = _request_route(engines)
+        return engine if route == PRIMARY else engines[route]
+
+
+@contextmanager
+def read_from(session, target):
+    """Send reads in the block to 'primary' or 'replica' regardless of the request"""
+    if target not in (PRIMARY, REPLICA):
+        raise ValueError(f'unknown database route {target!r}')
+    previous = session.info.get('db_route')
+    session.info['db_route'] = target
+    try:
+        yield
+    finally:
+        if previous is None:
+            session.info.pop('db_route', None)
+        else:
+            session.info['db_route'] = previous
+
+
+def init_db_routing(app):
+    """Open a read-your-writes window after successful writes and expose the route in debug headers"""
+
+    @app.after_request
+    def record_db_route(response):
+        if request.method not in READ_METHODS + ('OPTIONS',) and response.status_code < 400:
+            window = app.config['REPLICA_READ_YOUR_WRITES_SECONDS']
+            if window > 0 and replica_keys(app.extensions['sqlalchemy'].engines):
+                until = time.time() + window
+                identity = _identity()
+                if identity is not None:
+                    _record_write(identity, until)
+                response.set_cookie(WRITE_WINDOW_COOKIE, f'{until:.3f}', max_age=int(window) + 1,
+                                    httponly=True, samesite='Lax')
+        if app.config['METRICS_DEBUG_HEADERS'] or app.debug:
+            response.headers['X-DB-Route'] = g.get('db_route', PRIMARY)
+        return response
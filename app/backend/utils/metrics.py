@@ -0,0 +1,187 @@
+"""
+Per-route request instrumentation, exposed at ``/metrics`` in the Prometheus
+text format.
+
+For every request we record wall time, time spent in SQL, the number of SQL
+statements (counted from SQLAlchemy's cursor events) and the response size,
+labelled by route template (``/messages/<int:conversation_id>``, not the
+concrete URL) so the number of series stays bounded. Histograms are fixed
+bucket arrays updated under a lock, which costs a bisect and a few integer
+increments per observation.
+
+Metrics are per process; with several gunicorn workers each one exposes
+its own numbers and Prometheus scrapes (or sums) them per instance.
+
+With ``METRICS_DEBUG_HEADERS`` set (or in debug mode) every response
+carries ``X-Query-Count`` and ``X-SQL-Time-Ms`` so N+1 patterns show up
+while clicking through the app. ``count_queries`` / ``query_budget`` give
+scripts and tests the same numbers for a block of code (see
+tests/test_query_budgets.py).
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from flask import Response, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 4, 8, 16, 32, 64, 128, 256)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus sense"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # the last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """Histograms keyed by metric name and label values"""
+
+    METRICS = {
+        'http_request_duration_seconds': ('Wall time spent handling the request.', DURATION_BUCKETS),
+        'http_request_sql_duration_seconds': ('Time spent executing SQL statements.', DURATION_BUCKETS),
+        'http_request_sql_queries': ('SQL statements executed by the request.', QUERY_COUNT_BUCKETS),
+        'http_response_size_bytes': ('Response body size.', SIZE_BUCKETS),
+    }
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._series = {name: {} for name in self.METRICS}
+        self._collectors = []
+
+    def add_collector(self, render):
+        """Append render()'s Prometheus text (other subsystems' counters) to every scrape"""
+        self._collectors.append(render)
+
+    def observe(self, name, labels, value):
+        series = self._series[name]
+        with self._lock:
+            histogram = series.get(labels)
+            if histogram is None:
+                histogram = series[labels] = Histogram(self.METRICS[name][1])
+            histogram.observe(value)
+
+    def render(self):
+        """Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            for name, (help_text, _) in self.METRICS.items():
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} histogram')
+                for labels, histogram in sorted(self._series[name].items()):
+                    label_text = ','.join(f'{key}="{_escape(value)}"' for key, value in labels)
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets + ('+Inf',), histogram.counts):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{{{label_text},le="{bound}"}} {cumulative}')
+                    lines.append(f'{name}_sum{{{label_text}}} {histogram.sum:.6f}')
+                    lines.append(f'{name}_count{{{label_text}}} {histogram.count}')
+        return '\n'.join(lines) + '\n' + ''.join(render() for render in self._collectors)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class QueryCounter:
+    """SQL statements executed by the current thread inside a count_queries() block"""
+
+    def __init__(self):
+        self.count = 0
+        self.statements = []
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+_active_counters = threading.local()
+
+
+@contextmanager
+def count_queries():
+    """Count the SQL statements run by this thread (including Flask test client requests) in the block"""
+    counters = _active_counters.__dict__.setdefault('stack', [])
+    counter = QueryCounter()
+    counters.append(counter)
+    try:
+        yield counter
+    finally:
+        counters.remove(counter)
+
+
+@contextmanager
+def query_budget(max_queries, label='block'):
+    """Raise QueryBudgetExceeded if the block runs more than max_queries SQL statements"""
+    with count_queries() as counter:
+        yield counter
+    if counter.count > max_queries:
+        raise QueryBudgetExceeded(
+            f'{label} ran {counter.count} queries (budget {max_queries}):\n' + '\n'.join(counter.statements)
+        )
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and 'sql_queries' in g:
+        context._metrics_started = time.perf_counter()
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    for counter in getattr(_active_counters, 'stack', ()):
+        counter.count += 1
+        counter.statements.append(statement)
+    started = getattr(context, '_metrics_started', None)
+    if started is not None and has_request_context() and 'sql_queries' in g:
+        g.sql_queries += 1
+        g.sql_seconds += time.perf_counter() - started
+
+
+def init_metrics(app):
+    """Install the request hooks and the /metrics endpoint on app"""
+    if 'metrics' in app.extensions:
+        return app.extensions['metrics']
+    registry = app.extensions['metrics'] = MetricsRegistry()
+
+    @app.before_request
+    def start_request_metrics():
+        g.request_started = time.perf_counter()
+        g.sql_queries = 0
+        g.sql_seconds = 0.0
+
+    @app.after_request
+    def record_request_metrics(response):
+        if 'request_started' not in g:
+            return response
+        elapsed = time.perf_counter() - g.request_started
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        labels = (('method', request.method), ('route', route))
+        registry.observe('http_request_duration_seconds', labels + (('status', str(response.status_code)),), elapsed)
+        registry.observe('http_request_sql_duration_seconds', labels, g.sql_seconds)
+        registry.observe('http_request_sql_queries', labels, g.sql_queries)
+        if not response.is_streamed:
+            registry.observe('http_response_size_bytes', labels, response.calculate_content_length() or 0)
+        if app.config['METRICS_DEBUG_HEADERS'] or app.debug:
+            response.headers['X-Query-Count'] = str(g.sql_queries)
+            response.headers['X-SQL-Time-Ms'] = f'{g.sql_seconds * 1000:.1f}'
+        return response
+
+    @app.route('/metrics')
+    def metrics():
+        return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+    return registry
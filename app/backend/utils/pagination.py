@@ -0,0 +1,46 @@
+"""
+Opaque keyset (cursor) pagination helpers.
+
+A cursor is the sort key of the last row a client has seen, JSON encoded
+and base64url wrapped so clients treat it as an opaque token. Handlers
+decode it and continue with a ``WHERE (sort_key) < (cursor)`` clause, which
+stays an index range scan however deep the client pages, unlike OFFSET.
+"""
+import base64
+import binascii
+import json
+from datetime import datetime
+
+
+def encode_cursor(*values):
+    """Encode the sort key values of the last returned row"""
+    payload = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor, *types):
+    """
+    Decode a cursor produced by encode_cursor, converting each value with the
+    matching type (``datetime`` values are parsed from ISO format).
+    Raises ValueError for malformed or tampered cursors.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (binascii.Error, UnicodeDecodeError, json.JSONDecodeError) as exc:
+        raise ValueError('Invalid cursor') from exc
+    if not isinstance(values, list) or len(values) != len(types):
+        raise ValueError('Invalid cursor')
+    try:
+        return [datetime.fromisoformat(value) if type_ is datetime else type_(value)
+                for value, type_ in zip(values, types)]
+    except (TypeError, ValueError) as exc:
+        raise ValueError('Invalid cursor') from exc
+
+
+def page_limit(value, default=20, maximum=100):
+    """Clamp a client supplied page size"""
+    if value is None:
+        return default
+    return max(1, min(value, maximum))
@@ -0,0 +1,156 @@
+"""
+Request coalescing: concurrent callers asking for the same thing share one
+computation.
+
+``SingleFlight.do(key, fn)`` runs fn in the first caller (the leader) while
+later callers with the same key wait for its result instead of running fn
+themselves. Nothing is kept once the call finishes, so this only removes
+duplicate work for requests that overlap in time; pair it with the read
+cache (``Cache.get_or_set`` goes through a SingleFlight per key) so a burst
+arriving as an entry expires rebuilds it once instead of once per request.
+
+``@single_flight(...)`` applies it to a view. Requests are identical when
+their endpoint, URL arguments and query arguments (after filling in
+``defaults``, so ``/feed`` and ``/feed?page=1`` match) are equal within a
+visibility scope: ``'public'`` for responses that are the same for every
+caller and ``'user'`` to coalesce only requests of the same JWT identity.
+Put it under ``@jwt_required()`` so every request is still authenticated.
+Each caller gets its own Response built from the leader's body, status and
+headers. Only successful responses are shared: when the leader's ends in
+an error status, its followers run the view themselves, so one caller's
+404 never reaches another. Streamed responses are not coalesced either:
+the leader keeps its one-shot body and followers run the view themselves.
+"""
+import threading
+from functools import wraps
+
+from flask import Response, current_app, make_response, request
+from flask_jwt_extended import get_jwt_identity
+
+from utils.conditional import current_etag
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """In-flight calls by key, shared by the threads of one process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.counts = {}  # (name, 'leader' | 'follower') -> calls
+
+    def _count(self, name, role):
+        with self._lock:
+            self.counts[(name, role)] = self.counts.get((name, role), 0) + 1
+
+    def do(self, key, fn, timeout=None, name=None):
+        """
+        fn() for the first caller of key, its result for callers arriving
+        while it runs. A follower that waits longer than timeout seconds
+        runs fn itself. Exceptions from the leader are raised in every
+        caller.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        name = name or str(key)
+        if not leader:
+            self._count(name, 'follower')
+            if call.done.wait(timeout):
+                if call.error is not None:
+                    raise call.error
+                return call.result
+            return fn()
+        self._count(name, 'leader')
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def render_metrics(self):
+        lines = ['# HELP single_flight_calls_total Coalesced calls by name and role (followers reused a leader\'s result).',
+                 '# TYPE single_flight_calls_total counter']
+        with self._lock:
+            for (name, role), count in sorted(self.counts.items()):
+                lines.append(f'single_flight_calls_total{{name="{name}",role="{role}"}} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+_flights_lock = threading.Lock()
+
+
+def get_single_flight():
+    """The current app's SingleFlight for views, created on first use"""
+    app = current_app._get_current_object()
+    flights = app.extensions.get('single_flight')
+    if flights is None:
+        with _flights_lock:
+            flights = app.extensions.get('single_flight')
+            if flights is None:
+                flights = SingleFlight()
+                metrics = app.extensions.get('metrics')
+                if metrics is not None:
+                    metrics.add_collector(flights.render_metrics)
+                app.extensions['single_flight'] = flights
+    return flights
+
+
+def request_key(scope, defaults):
+    """Normalised identity of the current request within scope"""
+    args = {name: [str(value)] for name, value in (defaults or {}).items()}
+    for name in request.args:
+        values = [value for value in request.args.getlist(name) if value != '']
+        if values:
+            args[name] = values
+    owner = get_jwt_identity() if scope == 'user' else None
+    # Under @conditional the ETag is part of the identity: a follower must not get a body older than its ETag
+    return (request.endpoint, request.host_url, owner, current_etag(), tuple(sorted((request.view_args or {}).items())),
+            tuple(sorted((name, tuple(values)) for name, values in args.items())))
+
+
+def single_flight(scope='public', defaults=None):
+    """Coalesce concurrent identical requests to the decorated view (see module docstring)"""
+    if scope not in ('public', 'user'):
+        raise ValueError(f'unknown single_flight scope {scope!r}')
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            led = []
+
+            def run():
+                led.append(True)
+                response = make_response(view(*args, **kwargs))
+                if response.is_streamed:
+                    return response
+                return response.get_data(), response.status_code, response.headers.to_wsgi_list()
+
+            result = get_single_flight().do(
+                request_key(scope, defaults), run,
+                timeout=current_app.config['SINGLE_FLIGHT_WAIT_SECONDS'], name=request.endpoint
+            )
+            if isinstance(result, Response):
+                # A streamed body can only be read once: it belongs to the leader, followers run the view
+                return result if led else view(*args, **kwargs)
+            body, status, headers = result
+            if status >= 400 and not led:
+                return view(*args, **kwargs)
+            return Response(body, status=status, headers=headers)
+        return wrapper
+    return decorator
@@ -0,0 +1,11 @@
+"""Text helpers shared by the search and matching indexes."""
+import re
+
+_TOKEN_RE = re.compile(r'[a-z0-9][a-z0-9+#]*')
+
+
+def tokenize(text):
+    """Lowercase word tokens (keeps things like c++ and c#)"""
+    if not text:
+        return []
+    return _TOKEN_RE.findall(text.lower())